@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Agent-Modus für Ping Monitor
+Spiegelt die Schreiboperationen des Monitors (Pings, Statistiken und
+Loss-Events) und sendet sie gebündelt und gzip-komprimiert an einen
+zentralen Collector. Jede Batch wird zuerst in ein Spool-Verzeichnis
+geschrieben und erst nach Bestätigung gelöscht; ist der Collector nicht
+erreichbar, werden die Batches später in ihrer Reihenfolge nachgeliefert
+"""
+
+import gzip
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from alerts import DeliveryError, WebhookSink
+import metrics
+
+# Ende-Markierung für den Agent-Thread
+_STOP = object()
+
+SPOOL_SUFFIX = '.json.gz'
+STATE_FILE = 'state.json'
+REJECTED_DIR = 'rejected'
+
+# Höchstens so viele Batches pro Durchgang nachliefern, danach wieder die Queue leeren
+DRAIN_LIMIT = 50
+
+def event_key(host, event_type, start_time):
+    """Schlüssel eines Loss-Events über Agent und Collector hinweg"""
+    return f'{host}|{event_type}|{start_time}'
+
+class AgentShipper:
+    """Sammelt Schreiboperationen in Batches und liefert sie an den Collector aus
+    
+    submit() wird als Spiegel des DatabaseWriter aufgerufen und blockiert nie;
+    Spool, Komprimierung und HTTP laufen in einem eigenen Thread.
+    """
+    
+    def __init__(self, url, node, spool_dir, token='', batch_size=2000, flush_interval=5.0,
+                 queue_size=100000, spool_max_bytes=500 * 1024 * 1024, timeout=10,
+                 retry_backoff=1.0, max_backoff=60.0, default_host=None, logger=None):
+        headers = {'Content-Encoding': 'gzip'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        self.transport = WebhookSink(url, timeout=timeout, headers=headers)
+        self.url = url
+        self.node = node
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_max_bytes = spool_max_bytes
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.default_host = default_host
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        
+        # Letzte Statistiken pro Ziel, werden mit der nächsten Batch verschickt
+        self.stats = {}
+        self.stats_due = {}
+        
+        os.makedirs(spool_dir, exist_ok=True)
+        self.boot, self.seq = self.load_state()
+        self.spool_bytes = sum(os.path.getsize(path) for path in self.pending())
+        self.backoff = 0.0
+        self.next_attempt = 0.0
+        
+        # Kennzahlen
+        self.sent = 0
+        self.spooled = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_sent_time = None
+    
+    @classmethod
+    def create(cls, default_host=None, logger=None):
+        """Agent aus der Konfiguration (None, wenn kein Collector eingetragen ist)"""
+        from config import Config
+        if not Config.AGENT_COLLECTOR_URL:
+            return None
+        return cls(
+            Config.AGENT_COLLECTOR_URL, Config.AGENT_NODE or socket.gethostname(), Config.AGENT_SPOOL_DIR,
+            token=Config.AGENT_TOKEN,
+            batch_size=Config.AGENT_BATCH_SIZE,
+            flush_interval=Config.AGENT_FLUSH_INTERVAL,
+            queue_size=Config.AGENT_QUEUE_SIZE,
+            spool_max_bytes=Config.AGENT_SPOOL_MAX_MB * 1024 * 1024,
+            default_host=default_host,
+            logger=logger
+        )
+    
+    def load_state(self):
+        """Startkennung und letzte Sequenznummer; eine neue Startkennung, wenn der Spool leer angelegt wird"""
+        try:
+            with open(os.path.join(self.spool_dir, STATE_FILE), encoding='utf-8') as f:
+                state = json.load(f)
+            boot, seq = state['boot'], state['seq']
+        except (OSError, ValueError, KeyError):
+            boot, seq = uuid.uuid4().hex, 0
+        # Auch ohne Zustandsdatei nie hinter bereits gespoolte Batches zurückfallen
+        for path in self.pending():
+            seq = max(seq, int(os.path.basename(path)[:-len(SPOOL_SUFFIX)]))
+        return boot, seq
+    
+    def save_state(self):
+        path = os.path.join(self.spool_dir, STATE_FILE)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'boot': self.boot, 'seq': self.seq}, f)
+        os.replace(f'{path}.tmp', path)
+    
+    def pending(self):
+        """Gespoolte, noch nicht bestätigte Batches in Sendereihenfolge"""
+        names = sorted(name for name in os.listdir(self.spool_dir) if name.endswith(SPOOL_SUFFIX))
+        return [os.path.join(self.spool_dir, name) for name in names]
+    
+    def start(self):
+        """Startet den Agent-Thread"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='agent', daemon=True)
+            self.thread.start()
+    
+    def submit(self, operation, args):
+        """Spiegelt eine Schreiboperation des DatabaseWriter (verwirft bei voller Queue)"""
+        try:
+            self.queue.put_nowait((operation, args))
+        except queue.Full:
+            self.dropped += 1
+            metrics.AGENT_DROPPED.inc()
+            if self.dropped % 1000 == 1:
+                self.logger.warning(f"Agent-Queue voll, {self.dropped} Einträge verworfen")
+    
+    def due(self, host):
+        """Prüft, ob die Statistiken eines Ziels wieder mitgeschickt werden sollen"""
+        now = time.monotonic()
+        if now < self.stats_due.get(host, 0.0):
+            return False
+        self.stats_due[host] = now + self.flush_interval
+        return True
+    
+    def publish_stats(self, host, stats):
+        """Übernimmt die aktuellen Statistiken eines Ziels für die nächste Batch"""
+        self.stats[host] = stats
+    
+    def run(self):
+        """Hauptschleife: Batches bilden, spoolen und in Reihenfolge ausliefern"""
+        batch = self.new_batch()
+        size = 0
+        deadline = None
+        stopping = False
+        
+        while not stopping:
+            now = time.monotonic()
+            waits = [deadline - now] if deadline is not None else []
+            if self.spool_bytes:
+                waits.append(self.next_attempt - now)
+            timeout = max(0.0, min(waits)) if waits else None
+            try:
+                item = self.queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    size += self.add(batch, *item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+            except queue.Empty:
+                pass
+            
+            if size and (stopping or size >= self.batch_size or time.monotonic() >= deadline):
+                self.spool(batch)
+                batch = self.new_batch()
+                size = 0
+                deadline = None
+            
+            if self.spool_bytes and (stopping or time.monotonic() >= self.next_attempt):
+                self.drain()
+        
+        self.transport.close()
+    
+    def new_batch(self):
+        return {'pings': [], 'statistics': [], 'events': []}
+    
+    def add(self, batch, operation, args):
+        """Übernimmt eine Schreiboperation in die Batch; liefert die Anzahl Einträge"""
+        if operation == 'ping':
+            timestamp, host, success, response_time, packet_loss = args
+            batch['pings'].append([timestamp, host, bool(success), response_time, packet_loss])
+            return 1
+        if operation == 'statistics':
+            batch['statistics'].extend(list(row) for row in args[0])
+            return len(args[0])
+        if operation in ('event_start', 'event_update', 'event_end'):
+            event, fields = args[:2]
+            start_time = str(event['start_time'])
+            entry = {
+                'op': operation[6:],
+                'key': event_key(event['host'], event.get('type', 'outage'), start_time),
+                'host': event['host'],
+                'type': event.get('type', 'outage'),
+                'start_time': start_time,
+                'fields': list(fields)
+            }
+            if operation == 'event_end':
+                entry['end_time'] = str(args[2])
+                entry['duration'] = args[3]
+            batch['events'].append(entry)
+            return 1
+        return 0
+    
+    def spool(self, batch):
+        """Schreibt eine abgeschlossene Batch als nächste Sequenznummer in den Spool"""
+        self.seq += 1
+        batch.update({
+            'node': self.node,
+            'boot': self.boot,
+            'seq': self.seq,
+            'created': time.time(),
+            'default_host': self.default_host,
+            'stats': self.stats
+        })
+        self.stats = {}
+        body = gzip.compress(json.dumps(batch, separators=(',', ':')).encode('utf-8'), 6)
+        path = os.path.join(self.spool_dir, f'{self.seq:012d}{SPOOL_SUFFIX}')
+        try:
+            with open(f'{path}.tmp', 'wb') as f:
+                f.write(body)
+            os.replace(f'{path}.tmp', path)
+            self.save_state()
+        except OSError as e:
+            self.dropped += 1
+            metrics.AGENT_BATCHES.inc(1, ('dropped',))
+            self.logger.error(f"Agent-Batch {self.seq} konnte nicht gespoolt werden: {e}")
+            return
+        self.spooled += 1
+        self.spool_bytes += len(body)
+        metrics.AGENT_BATCHES.inc(1, ('spooled',))
+        self.trim_spool()
+        metrics.AGENT_SPOOL_BYTES.set(self.spool_bytes)
+    
+    def trim_spool(self):
+        """Verwirft die ältesten Batches, solange der Spool über der Obergrenze liegt"""
+        if self.spool_bytes <= self.spool_max_bytes:
+            return
+        for path in self.pending():
+            if self.spool_bytes <= self.spool_max_bytes:
+                break
+            size = os.path.getsize(path)
+            os.unlink(path)
+            self.spool_bytes -= size
+            self.dropped += 1
+            metrics.AGENT_BATCHES.inc(1, ('dropped',))
+            self.logger.warning(f"Agent-Spool voll, älteste Batch verworfen: {os.path.basename(path)}")
+    
+    def drain(self):
+        """Liefert gespoolte Batches der Reihe nach aus, bis einer fehlschlägt"""
+        for path in self.pending()[:DRAIN_LIMIT]:
+            with open(path, 'rb') as f:
+                body = f.read()
+            try:
+                self.transport.send_body(body)
+            except DeliveryError as e:
+                if e.status is not None and 400 <= e.status < 500 and e.status not in (408, 429):
+                    # Vom Collector abgelehnt: durch Wiederholen nicht zu beheben, zur Analyse aufheben
+                    self.reject(path, str(e))
+                    continue
+                self.retry_later(e)
+                return
+            except (OSError, ValueError) as e:
+                self.retry_later(e)
+                return
+            os.unlink(path)
+            self.spool_bytes -= len(body)
+            self.sent += 1
+            self.backoff = 0.0
+            self.last_sent_time = time.time()
+            metrics.AGENT_BATCHES.inc(1, ('sent',))
+        metrics.AGENT_SPOOL_BYTES.set(self.spool_bytes)
+    
+    def retry_later(self, error):
+        """Exponentielles Backoff bis zum nächsten Zustellversuch"""
+        self.failures += 1
+        if self.backoff == 0.0:
+            self.logger.warning(f"Collector {self.url} nicht erreichbar, Batches werden gespoolt: {error}")
+        self.backoff = min(self.max_backoff, self.backoff * 2 or self.retry_backoff)
+        self.next_attempt = time.monotonic() + self.backoff
+        self.last_error = str(error)
+        metrics.AGENT_BATCHES.inc(1, ('failed',))
+        metrics.AGENT_SPOOL_BYTES.set(self.spool_bytes)
+    
+    def reject(self, path, error):
+        rejected = os.path.join(self.spool_dir, REJECTED_DIR)
+        os.makedirs(rejected, exist_ok=True)
+        self.spool_bytes -= os.path.getsize(path)
+        os.replace(path, os.path.join(rejected, os.path.basename(path)))
+        self.rejected += 1
+        self.last_error = error
+        metrics.AGENT_BATCHES.inc(1, ('rejected',))
+        self.logger.error(f"Collector lehnt Batch {os.path.basename(path)} ab: {error}")
+    
+    def close(self, timeout=10):
+        """Spoolt die offene Batch, versucht eine letzte Auslieferung und beendet den Thread"""
+        if self.thread is None:
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            # Ohne Ende-Markierung endet der Thread nicht; als Daemon-Thread nicht weiter warten
+            self.logger.warning(f"Agent-Queue voll, Agent ohne Abschluss beendet, {self.queue.qsize()} Einträge offen")
+            self.thread = None
+            return
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            self.logger.warning(f"Agent nicht rechtzeitig beendet, {self.queue.qsize()} Einträge offen")
+        self.thread = None
+    
+    def get_stats(self):
+        """Kennzahlen für /api/stats"""
+        return {
+            'collector': self.url,
+            'node': self.node,
+            'seq': self.seq,
+            'queue_depth': self.queue.qsize(),
+            'spooled_batches': len(self.pending()),
+            'spool_bytes': self.spool_bytes,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'rejected': self.rejected,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'last_sent_time': self.last_sent_time
+        }
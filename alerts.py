@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Benachrichtigungen für Ping Monitor
+Der Monitor reicht Loss-Events und Fensterwerte über eine begrenzte Queue
+ein; ein Worker-Thread wertet die Regeln aus, unterdrückt Duplikate,
+begrenzt die Anzahl der Benachrichtigungen und versendet sie per SMTP oder
+Webhook mit wiederverwendeten Verbindungen und Wiederholungen
+"""
+
+import http.client
+import json
+import logging
+import queue
+import smtplib
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+from email.message import EmailMessage
+from call_quality import assess
+import metrics
+
+# Ende-Markierung für den Worker-Thread
+_STOP = object()
+
+SEVERITIES = ('minor', 'major', 'critical')
+
+class DeliveryError(Exception):
+    """Eine Benachrichtigung konnte nicht zugestellt werden"""
+    
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        # HTTP-Status der Antwort (None bei anderen Fehlern)
+        self.status = status
+
+class ThresholdRule:
+    """Schwellwert auf eine Fenster-Metrik mit Hysterese
+    
+    Löst aus, sobald der Wert threshold erreicht, und wird aufgehoben, sobald
+    er clear wieder unterschreitet. Ist clear größer als threshold, gilt das
+    umgekehrt (Auslösen bei niedrigen Werten).
+    """
+    
+    def __init__(self, name, metric, threshold, clear=None, severity='major'):
+        self.name = name
+        self.metric = metric
+        self.threshold = threshold
+        self.clear = threshold if clear is None else clear
+        self.severity = severity
+    
+    def evaluate(self, value, firing):
+        """Neuer Zustand (True = ausgelöst) für einen Messwert"""
+        if value is None:
+            return firing
+        if self.clear <= self.threshold:
+            return value > self.clear if firing else value >= self.threshold
+        return value < self.clear if firing else value <= self.threshold
+
+class RateLimiter:
+    """Token-Bucket: höchstens per_hour Benachrichtigungen pro Stunde, Bursts bis per_hour"""
+    
+    def __init__(self, per_hour, clock=time.monotonic):
+        self.capacity = per_hour
+        self.tokens = float(per_hour)
+        self.rate = per_hour / 3600.0
+        self.clock = clock
+        self.updated = clock()
+    
+    def allow(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+def format_text(alerts, suppressed=0):
+    """Klartext einer Sammel-Benachrichtigung"""
+    lines = []
+    for alert in alerts:
+        state = 'AUSGELÖST' if alert['state'] == 'firing' else 'AUFGEHOBEN'
+        lines.append(f"[{state}] {alert['time']} {alert['host']}: {alert['message']}")
+    if suppressed:
+        lines.append(f"({suppressed} weitere Benachrichtigungen wegen Ratenbegrenzung unterdrückt)")
+    return '\n'.join(lines) + '\n'
+
+class SmtpSink:
+    """Versand per E-Mail über eine offen gehaltene SMTP-Verbindung"""
+    
+    name = 'smtp'
+    
+    def __init__(self, server, port, username, password, sender, recipients, use_tls=True,
+                 timeout=10, idle_timeout=60, clock=time.monotonic):
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.recipients = recipients
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.conn = None
+        self.last_used = 0.0
+    
+    def connect(self):
+        conn = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                conn.starttls(context=ssl.create_default_context())
+            if self.username:
+                conn.login(self.username, self.password)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+    
+    def send(self, alerts, suppressed=0):
+        message = EmailMessage()
+        firing = sum(1 for alert in alerts if alert['state'] == 'firing')
+        message['Subject'] = f"[Ping Monitor] {firing} ausgelöst, {len(alerts) - firing} aufgehoben"
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content(format_text(alerts, suppressed))
+        
+        # Eine länger ungenutzte Verbindung hat der Server vermutlich geschlossen
+        if self.conn is not None and self.clock() - self.last_used > self.idle_timeout:
+            self.close()
+        reused = self.conn is not None
+        if self.conn is None:
+            self.conn = self.connect()
+        try:
+            self.conn.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            if not reused:
+                raise
+            self.conn = self.connect()
+            self.conn.send_message(message)
+        except Exception:
+            self.close()
+            raise
+        self.last_used = self.clock()
+    
+    def close(self):
+        if self.conn is None:
+            return
+        try:
+            self.conn.quit()
+        except Exception:
+            self.conn.close()
+        self.conn = None
+
+class WebhookSink:
+    """Versand als JSON-POST über eine Keep-Alive-HTTP-Verbindung"""
+    
+    name = 'webhook'
+    
+    def __init__(self, url, timeout=10, headers=None):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Ungültige Webhook-URL: {url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.conn = None
+    
+    def connect(self):
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+    
+    def post(self, body):
+        self.conn.request('POST', self.path, body, self.headers)
+        response = self.conn.getresponse()
+        response.read()
+        if response.will_close:
+            self.close()
+        return response.status
+    
+    def send(self, alerts, suppressed=0):
+        self.send_body(json.dumps({'alerts': alerts, 'suppressed': suppressed}).encode('utf-8'))
+    
+    def send_body(self, body):
+        """Sendet einen fertigen Request-Body (DeliveryError bei HTTP-Status ab 300)"""
+        reused = self.conn is not None
+        if self.conn is None:
+            self.conn = self.connect()
+        try:
+            status = self.post(body)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # Keep-Alive-Verbindung vom Server geschlossen: einmal neu verbinden
+            self.close()
+            if not reused:
+                raise
+            self.conn = self.connect()
+            status = self.post(body)
+        except Exception:
+            self.close()
+            raise
+        if status >= 300:
+            raise DeliveryError(f"{self.host} antwortet mit HTTP {status}", status)
+    
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+class AlertDispatcher:
+    """Wertet Regeln in einem eigenen Thread aus und verschickt Benachrichtigungen
+    
+    Der Monitor blockiert nie: Einträge landen in einer begrenzten Queue
+    und werden bei voller Queue verworfen.
+    """
+    
+    def __init__(self, sinks, rules, min_severity='critical', window='5m', min_pings=10, eval_interval=10.0,
+                 max_per_hour=20, retries=3, backoff=1.0, max_backoff=30.0, queue_size=1000, logger=None,
+                 clock=time.monotonic):
+        self.sinks = sinks
+        self.rules = rules
+        self.min_severity = min_severity
+        self.window = window
+        self.min_pings = min_pings
+        self.eval_interval = eval_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = RateLimiter(max_per_hour, clock)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.logger = logger or logging.getLogger(__name__)
+        self.clock = clock
+        self.thread = None
+        self.stopping = threading.Event()
+        
+        # Nächste Auswertung der Fenster pro Ziel (Aufrufer-Thread)
+        self.next_eval = {}
+        # Ausgelöste Alarme: Schlüssel -> Benachrichtigung (nur im Worker-Thread)
+        self.firing = {}
+        
+        # Kennzahlen
+        self.sent = 0
+        self.failed = 0
+        self.suppressed = 0
+        self.pending_suppressed = 0
+        self.dropped = 0
+    
+    @classmethod
+    def create(cls, logger=None):
+        """Dispatcher aus der Konfiguration (None, wenn kein Kanal eingerichtet ist)"""
+        from config import Config
+        
+        sinks = []
+        if Config.ENABLE_EMAIL_ALERTS and Config.EMAIL_TO:
+            sinks.append(SmtpSink(
+                Config.EMAIL_SMTP_SERVER, Config.EMAIL_SMTP_PORT, Config.EMAIL_USERNAME, Config.EMAIL_PASSWORD,
+                Config.EMAIL_FROM or Config.EMAIL_USERNAME,
+                [address.strip() for address in Config.EMAIL_TO.split(',') if address.strip()],
+                use_tls=Config.EMAIL_USE_TLS
+            ))
+        if Config.ALERT_WEBHOOK_URL:
+            sinks.append(WebhookSink(Config.ALERT_WEBHOOK_URL))
+        if not sinks:
+            return None
+        
+        rules = [ThresholdRule('loss', 'packet_loss_percent', Config.ALERT_THRESHOLD, Config.ALERT_THRESHOLD / 2)]
+        if Config.ALERT_LATENCY_THRESHOLD > 0:
+            rules.append(ThresholdRule(
+                'latency', 'avg_response_time', Config.ALERT_LATENCY_THRESHOLD, Config.ALERT_LATENCY_THRESHOLD * 0.8
+            ))
+        if Config.ALERT_JITTER_THRESHOLD > 0:
+            rules.append(ThresholdRule(
+                'jitter', 'jitter_ms', Config.ALERT_JITTER_THRESHOLD, Config.ALERT_JITTER_THRESHOLD * 0.8
+            ))
+        if Config.ALERT_MOS_THRESHOLD > 0:
+            # Niedriger MOS ist schlecht: auslösen darunter, aufheben 0.2 darüber
+            rules.append(ThresholdRule('mos', 'mos', Config.ALERT_MOS_THRESHOLD, Config.ALERT_MOS_THRESHOLD + 0.2))
+        return cls(
+            sinks, rules, min_severity=Config.ALERT_MIN_SEVERITY, window=Config.ALERT_WINDOW,
+            min_pings=Config.ALERT_MIN_PINGS, eval_interval=Config.ALERT_EVAL_INTERVAL,
+            max_per_hour=Config.ALERT_MAX_PER_HOUR, retries=Config.ALERT_RETRIES,
+            queue_size=Config.ALERT_QUEUE_SIZE, logger=logger
+        )
+    
+    def start(self):
+        """Startet den Worker-Thread"""
+        if self.thread is None:
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name='alert-dispatcher', daemon=True)
+            self.thread.start()
+    
+    def submit(self, operation, *args):
+        """Legt einen Eintrag in die Queue (verwirft bei voller Queue)"""
+        try:
+            self.queue.put_nowait((operation, args))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                self.logger.warning(f"Alarm-Queue voll, {self.dropped} Einträge verworfen")
+            return False
+    
+    def due(self, host):
+        """Prüft, ob die Fenster eines Ziels wieder ausgewertet werden sollen (höchstens alle eval_interval s)"""
+        now = self.clock()
+        if now < self.next_eval.get(host, 0.0):
+            return False
+        self.next_eval[host] = now + self.eval_interval
+        return True
+    
+    def observe(self, host, windows, jitter=None):
+        """Reicht die Fensterwerte eines Ziels ein (Ausgabe von RollingStats.snapshot, dazu der Jitter)"""
+        summary = windows.get(self.window)
+        if summary is not None:
+            summary = dict(summary, **assess(jitter, summary))
+        return self.submit('window', host, summary)
+    
+    def event(self, host, event, phase):
+        """Reicht Start ('start'), Änderung ('update') oder Ende ('end') eines Loss-Events ein"""
+        return self.submit('event', host, {
+            'type': event.get('type', 'outage'),
+            'start_time': event['start_time'].isoformat(),
+            'current_host': event['host'],
+            'severity': event.get('severity'),
+            'loss_percent': event.get('loss_percent'),
+            'consecutive_failures': event['consecutive_failures'],
+            'scope': event.get('scope')
+        }, phase)
+    
+    def run(self):
+        """Worker-Thread: wertet Einträge aus und verschickt gesammelt"""
+        while True:
+            item = self.queue.get()
+            stop = item is _STOP
+            notifications = [] if stop else self.evaluate(*item)
+            # Weitere wartende Einträge in dieselbe Benachrichtigung aufnehmen
+            while not stop:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    notifications.extend(self.evaluate(*item))
+            if notifications:
+                self.deliver(notifications)
+            if stop:
+                break
+        for sink in self.sinks:
+            sink.close()
+    
+    def evaluate(self, operation, args):
+        """Liefert die Zustandswechsel, die ein Eintrag auslöst"""
+        try:
+            if operation == 'window':
+                return self.evaluate_window(*args)
+            if operation == 'event':
+                return self.evaluate_event(*args)
+        except Exception as e:
+            self.logger.error(f"Fehler beim Auswerten der Alarmregeln: {e}")
+        return []
+    
+    def evaluate_window(self, host, summary):
+        if summary is None or summary['total_pings'] < self.min_pings:
+            return []
+        notifications = []
+        for rule in self.rules:
+            key = (host, rule.name)
+            value = summary.get(rule.metric)
+            firing = key in self.firing
+            if rule.evaluate(value, firing) == firing:
+                continue
+            if firing:
+                del self.firing[key]
+                direction = 'unter' if rule.clear <= rule.threshold else 'über'
+                message = f"{rule.metric} {value} wieder {direction} {rule.clear} ({self.window})"
+            else:
+                message = f"{rule.metric} {value} erreicht Schwelle {rule.threshold} ({self.window})"
+            notification = self.notification(host, rule.name, not firing, rule.severity, message, value)
+            if not firing:
+                self.firing[key] = notification
+            notifications.append(notification)
+        return notifications
+    
+    def evaluate_event(self, host, event, phase):
+        key = (host, event['type'], event['start_time'])
+        scope = f", Zuordnung: {event['scope']}" if event['scope'] else ''
+        if phase == 'end':
+            if key not in self.firing:
+                return []
+            del self.firing[key]
+            message = f"{event['type']}-Event auf {event['current_host']} beendet ({event['consecutive_failures']} Fehlschläge{scope})"
+            return [self.notification(host, event['type'], False, event['severity'], message, event['loss_percent'])]
+        
+        if key in self.firing or not self.severe(event['severity']):
+            return []
+        message = (f"{event['type']}-Event auf {event['current_host']} seit {event['start_time']}: "
+                   f"{event['loss_percent']}% Verlust, {event['consecutive_failures']} Fehlschläge{scope}")
+        notification = self.notification(host, event['type'], True, event['severity'], message, event['loss_percent'])
+        self.firing[key] = notification
+        return [notification]
+    
+    def severe(self, severity):
+        """Erreicht ein Schweregrad die Mindeststufe für Benachrichtigungen?"""
+        if severity not in SEVERITIES:
+            return False
+        return SEVERITIES.index(severity) >= SEVERITIES.index(self.min_severity)
+    
+    @staticmethod
+    def notification(host, rule, firing, severity, message, value=None):
+        return {
+            'host': host,
+            'rule': rule,
+            'state': 'firing' if firing else 'resolved',
+            'severity': severity,
+            'value': value,
+            'message': message,
+            'time': datetime.now().isoformat(timespec='seconds')
+        }
+    
+    def deliver(self, notifications):
+        """Ratenbegrenzung und Versand an alle Kanäle"""
+        allowed = []
+        for notification in notifications:
+            if self.limiter.allow():
+                allowed.append(notification)
+            else:
+                self.suppressed += 1
+                self.pending_suppressed += 1
+                metrics.ALERTS.inc(1, ('all', 'suppressed'))
+        if not allowed:
+            return
+        suppressed, self.pending_suppressed = self.pending_suppressed, 0
+        for sink in self.sinks:
+            self.send(sink, allowed, suppressed)
+    
+    def send(self, sink, alerts, suppressed):
+        """Versendet über einen Kanal mit exponentiellem Backoff zwischen den Versuchen"""
+        for attempt in range(self.retries + 1):
+            try:
+                sink.send(alerts, suppressed)
+                self.sent += len(alerts)
+                metrics.ALERTS.inc(len(alerts), (sink.name, 'sent'))
+                return True
+            except Exception as e:
+                if attempt == self.retries:
+                    self.failed += len(alerts)
+                    metrics.ALERTS.inc(len(alerts), (sink.name, 'failed'))
+                    self.logger.error(f"Benachrichtigung per {sink.name} fehlgeschlagen: {e}")
+                    return False
+                delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+                self.logger.warning(f"Benachrichtigung per {sink.name} fehlgeschlagen ({e}), neuer Versuch in {delay:.0f}s")
+                # Beim Beenden ohne Wartezeit erneut versuchen
+                self.stopping.wait(delay)
+    
+    def close(self, timeout=30):
+        """Verschickt ausstehende Benachrichtigungen und beendet den Thread"""
+        if self.thread is None:
+            return
+        self.stopping.set()
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            # Ohne Ende-Markierung endet der Thread nicht; als Daemon-Thread nicht weiter warten
+            self.logger.warning(f"Alarm-Queue voll, Dispatcher ohne Abschluss beendet, {self.queue.qsize()} Einträge offen")
+            self.thread = None
+            return
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            self.logger.warning("Alarm-Dispatcher nicht rechtzeitig beendet")
+        self.thread = None
+    
+    def get_stats(self):
+        """Gibt Kennzahlen des Dispatchers zurück"""
+        return {
+            'sinks': [sink.name for sink in self.sinks],
+            'queue_depth': self.queue.qsize(),
+            'firing': len(self.firing),
+            'sent': self.sent,
+            'failed': self.failed,
+            'suppressed': self.suppressed,
+            'dropped': self.dropped
+        }
+
+if __name__ == "__main__":
+    # Aufruf: python3 alerts.py test - schickt eine Test-Benachrichtigung über alle eingerichteten Kanäle
+    if len(sys.argv) < 2 or sys.argv[1] != 'test':
+        print("Verwendung: python3 alerts.py test")
+        sys.exit(1)
+    
+    from config import Config
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    dispatcher = AlertDispatcher.create()
+    if dispatcher is None:
+        print("❌ Kein Kanal eingerichtet (ENABLE_EMAIL_ALERTS mit EMAIL_TO oder ALERT_WEBHOOK_URL)")
+        sys.exit(1)
+    dispatcher.retries = 0
+    dispatcher.deliver([AlertDispatcher.notification(
+        Config.PRIMARY_HOST, 'test', True, 'minor', 'Test-Benachrichtigung von Ping Monitor'
+    )])
+    for sink in dispatcher.sinks:
+        sink.close()
+    if dispatcher.failed:
+        sys.exit(1)
+    print(f"✅ Test-Benachrichtigung verschickt über: {', '.join(sink.name for sink in dispatcher.sinks)}")
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Langzeitarchiv für Ping Monitor
+Versiegelt abgeschlossene Tagespartitionen in kompakte Blöcke pro Host und
+Tag: Zeitstempel als Delta-of-Delta, Antwortzeit und Packet Loss per
+XOR-Kompression (Gorilla), Erfolg als Lauflängen. Blöcke werden per mmap
+gelesen und erst beim Iterieren dekodiert
+"""
+
+import heapq
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+from datetime import datetime, timezone
+import partitions
+
+MAGIC = b'PMAR'
+VERSION = 1
+BLOCK_SUFFIX = '.pma'
+MANIFEST = 'manifest.json'
+DAY = partitions.DAY
+
+# Magic, Version, Zeilen, erster/letzter Zeitstempel (ms), Erfolge, Längen der vier Abschnitte, CRC32
+_HEADER = struct.Struct('<4sBxxxIqqIIIIII')
+
+_NAN = float('nan')
+
+class BitWriter:
+    """Schreibt Bitfolgen (MSB zuerst) in einen Puffer"""
+    
+    __slots__ = ('out', 'acc', 'bits')
+    
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.bits = 0
+    
+    def write(self, value, count):
+        self.acc = (self.acc << count) | value
+        self.bits += count
+        if self.bits >= 64:
+            whole = self.bits & ~7
+            rest = self.bits - whole
+            self.out += (self.acc >> rest).to_bytes(whole >> 3, 'big')
+            self.acc &= (1 << rest) - 1
+            self.bits = rest
+    
+    def getvalue(self):
+        if self.bits:
+            pad = -self.bits % 8
+            self.out += (self.acc << pad).to_bytes((self.bits + pad) >> 3, 'big')
+            self.acc = 0
+            self.bits = 0
+        return bytes(self.out)
+
+class BitReader:
+    """Liest Bitfolgen aus einem Puffer (auch memoryview auf eine mmap)"""
+    
+    __slots__ = ('data', 'pos', 'acc', 'bits')
+    
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.acc = 0
+        self.bits = 0
+    
+    def read(self, count):
+        while self.bits < count:
+            chunk = self.data[self.pos:self.pos + 8]
+            if not chunk:
+                raise ValueError("Block zu kurz")
+            self.acc = (self.acc << (len(chunk) * 8)) | int.from_bytes(chunk, 'big')
+            self.bits += len(chunk) * 8
+            self.pos += len(chunk)
+        self.bits -= count
+        value = self.acc >> self.bits
+        self.acc &= (1 << self.bits) - 1
+        return value
+
+def _signed(value, count):
+    return value - (1 << count) if value >= 1 << (count - 1) else value
+
+# Delta-of-Delta-Klassen: (Präfix, Präfix-Bits, Wert-Bits)
+_DOD_CLASSES = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12), (0b1111, 4, 64))
+
+def encode_timestamps(values):
+    """Zeitstempel (ganze ms, aufsteigend) ab dem zweiten als Delta-of-Delta"""
+    writer = BitWriter()
+    previous = values[0]
+    previous_delta = 0
+    for value in values[1:]:
+        delta = value - previous
+        dod = delta - previous_delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for prefix, prefix_bits, value_bits in _DOD_CLASSES:
+                if -(1 << (value_bits - 1)) <= dod < 1 << (value_bits - 1):
+                    writer.write(prefix, prefix_bits)
+                    writer.write(dod & ((1 << value_bits) - 1), value_bits)
+                    break
+        previous, previous_delta = value, delta
+    return writer.getvalue()
+
+def decode_timestamps(data, first, count):
+    reader = BitReader(data)
+    value = first
+    delta = 0
+    yield value
+    for _ in range(count - 1):
+        if reader.read(1):
+            if not reader.read(1):
+                value_bits = 7
+            elif not reader.read(1):
+                value_bits = 9
+            elif not reader.read(1):
+                value_bits = 12
+            else:
+                value_bits = 64
+            delta += _signed(reader.read(value_bits), value_bits)
+        value += delta
+        yield value
+
+def encode_floats(values):
+    """Gleitkommazahlen (None als NaN) mit XOR gegen den Vorgänger"""
+    bits = struct.unpack(f'<{len(values)}Q', struct.pack(
+        f'<{len(values)}d', *(_NAN if value is None else value for value in values)))
+    writer = BitWriter()
+    writer.write(bits[0], 64)
+    previous = bits[0]
+    leading = trailing = -1
+    for current in bits[1:]:
+        xor = current ^ previous
+        previous = current
+        if xor == 0:
+            writer.write(0, 1)
+            continue
+        lead = min(64 - xor.bit_length(), 31)
+        trail = (xor & -xor).bit_length() - 1
+        if leading >= 0 and lead >= leading and trail >= trailing:
+            # Signifikante Bits passen in das Fenster des Vorgängers
+            writer.write(0b10, 2)
+            writer.write(xor >> trailing, 64 - leading - trailing)
+        else:
+            significant = 64 - lead - trail
+            writer.write(0b11, 2)
+            writer.write(lead, 5)
+            writer.write(significant & 63, 6)
+            writer.write(xor >> trail, significant)
+            leading, trailing = lead, trail
+    return writer.getvalue()
+
+def decode_floats(data, count):
+    reader = BitReader(data)
+    unpack = struct.Struct('<d').unpack
+    pack = struct.Struct('<Q').pack
+    current = reader.read(64)
+    leading = trailing = 0
+    value = unpack(pack(current))[0]
+    yield None if value != value else value
+    for _ in range(count - 1):
+        if reader.read(1):
+            if reader.read(1):
+                leading = reader.read(5)
+                significant = reader.read(6) or 64
+                trailing = 64 - leading - significant
+            current ^= reader.read(64 - leading - trailing) << trailing
+            value = unpack(pack(current))[0]
+        yield None if value != value else value
+
+def _varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def encode_runs(flags):
+    """Erfolgs-Bits als Startwert und Lauflängen (LEB128)"""
+    out = bytearray([1 if flags[0] else 0])
+    current = flags[0]
+    run = 0
+    for flag in flags:
+        if flag == current:
+            run += 1
+        else:
+            _varint(run, out)
+            current = flag
+            run = 1
+    _varint(run, out)
+    return bytes(out)
+
+def decode_runs(data):
+    value = bool(data[0])
+    run = shift = 0
+    for byte in data[1:]:
+        run |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            for _ in range(run):
+                yield value
+            value = not value
+            run = shift = 0
+
+def encode_block(rows):
+    """Kodiert Zeilen (Zeit in ms, Erfolg, Antwortzeit, Packet Loss) eines Hosts in zeitlicher Reihenfolge"""
+    timestamps = [row[0] for row in rows]
+    flags = [bool(row[1]) for row in rows]
+    sections = (
+        encode_timestamps(timestamps),
+        encode_runs(flags),
+        encode_floats([row[2] for row in rows]),
+        encode_floats([row[3] for row in rows]),
+    )
+    payload = b''.join(sections)
+    header = _HEADER.pack(
+        MAGIC, VERSION, len(rows), timestamps[0], timestamps[-1], sum(flags),
+        *(len(section) for section in sections), zlib.crc32(payload)
+    )
+    return header + payload
+
+class ArchiveBlock:
+    """Ein Block-File, per mmap geöffnet; Zeilen werden erst beim Iterieren dekodiert"""
+    
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.count, self.first_ms, self.last_ms, self.successes,
+         *self.lengths, self.crc) = _HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError(f"Kein Archivblock (Version {VERSION}): {path}")
+    
+    @property
+    def first(self):
+        return self.first_ms / 1000
+    
+    @property
+    def last(self):
+        return self.last_ms / 1000
+    
+    def sections(self):
+        view = memoryview(self.mm)
+        offset = _HEADER.size
+        result = []
+        for length in self.lengths:
+            result.append(view[offset:offset + length])
+            offset += length
+        return result
+    
+    def check(self):
+        """Prüft die Prüfsumme der Nutzdaten"""
+        return zlib.crc32(self.mm[_HEADER.size:]) == self.crc
+    
+    def rows(self, start=None, end=None):
+        """Zeilen (Unix-Zeit, Erfolg, Antwortzeit, Packet Loss) im Zeitraum [start, end)"""
+        if (end is not None and self.first >= end) or (start is not None and self.last < start):
+            return
+        times, flags, responses, losses = self.sections()
+        for timestamp, success, response_time, loss in zip(
+            decode_timestamps(times, self.first_ms, self.count), decode_runs(flags),
+            decode_floats(responses, self.count), decode_floats(losses, self.count)
+        ):
+            timestamp /= 1000
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp >= end:
+                return
+            yield timestamp, success, response_time, loss
+    
+    def close(self):
+        try:
+            self.mm.close()
+        except BufferError:
+            # Noch laufende Iteratoren halten Ansichten auf die mmap; die GC räumt auf
+            pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def day_name(day):
+    return datetime.fromtimestamp(day, timezone.utc).strftime('%Y%m%d')
+
+def block_path(archive_dir, day, host):
+    """Pfad des Blocks eines Hosts für den Tag (Unix-Zeit des Tagesbeginns)"""
+    return os.path.join(archive_dir, day_name(day), urllib.parse.quote(host, safe='') + BLOCK_SUFFIX)
+
+def read_manifest(archive_dir, day):
+    """Inhaltsverzeichnis eines versiegelten Tages (None, wenn nicht versiegelt)"""
+    try:
+        with open(os.path.join(archive_dir, day_name(day), MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_sealed(archive_dir, day):
+    return read_manifest(archive_dir, day) is not None
+
+def list_days(archive_dir):
+    """Versiegelte Tage als sortierte Liste von Unix-Zeitstempeln"""
+    try:
+        names = os.listdir(archive_dir)
+    except FileNotFoundError:
+        return []
+    days = []
+    for name in names:
+        day = partitions.partition_day(partitions.PARTITION_PREFIX + name)
+        if day is not None and os.path.exists(os.path.join(archive_dir, name, MANIFEST)):
+            days.append(day)
+    return sorted(days)
+
+def _write_atomic(path, data):
+    temp = f'{path}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+def _source_rows(conn, table, host):
+    cursor = conn.execute(f'''
+        SELECT {partitions.EPOCH_COLUMN}, success, response_time, packet_loss_percent
+        FROM {table} WHERE host = ? ORDER BY timestamp, id
+    ''', (host,))
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        for timestamp, success, response_time, loss in rows:
+            yield round(timestamp * 1000), bool(success), response_time, loss
+
+def _same(a, b):
+    return a == b or (a is None and b is None)
+
+def compare_block(block, source_rows):
+    """Vergleicht einen Block Zeile für Zeile mit den Quellzeilen; liefert die Anzahl Abweichungen"""
+    mismatches = 0
+    archived = block.rows()
+    count = 0
+    for expected in source_rows:
+        count += 1
+        actual = next(archived, None)
+        if actual is None or round(actual[0] * 1000) != expected[0] or actual[1] != expected[1] \
+                or not _same(actual[2], expected[2]) or not _same(actual[3], expected[3]):
+            mismatches += 1
+    return mismatches + abs(block.count - count)
+
+def seal_partition(conn, day, archive_dir, stopping=None):
+    """Schreibt die Tagespartition als Blöcke pro Host und prüft sie gegen die Quelle
+    
+    Das Manifest wird zuletzt geschrieben und markiert den Tag als versiegelt.
+    Liefert das Manifest oder None, wenn abgebrochen wurde.
+    """
+    table = partitions.partition_name(day)
+    os.makedirs(os.path.join(archive_dir, day_name(day)), exist_ok=True)
+    manifest = {'day': day_name(day), 'sealed_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'hosts': {}}
+    hosts = [row[0] for row in conn.execute(f'SELECT DISTINCT host FROM {table}')]
+    for host in hosts:
+        if stopping is not None and stopping.is_set():
+            return None
+        rows = list(_source_rows(conn, table, host))
+        if not rows:
+            continue
+        path = block_path(archive_dir, day, host)
+        data = encode_block(rows)
+        _write_atomic(path, data)
+        with ArchiveBlock(path) as block:
+            if compare_block(block, iter(rows)):
+                raise ValueError(f"Archivblock {path} stimmt nicht mit der Quelle überein")
+        manifest['hosts'][host] = {'rows': len(rows), 'bytes': len(data)}
+    _write_atomic(os.path.join(archive_dir, day_name(day), MANIFEST), json.dumps(manifest, indent=2).encode('utf-8'))
+    return manifest
+
+def seal_partitions(conn, archive_dir, after_days=1, now=None, stopping=None):
+    """Versiegelt alle abgeschlossenen Tage, die mindestens after_days zurückliegen"""
+    now = time.time() if now is None else now
+    sealed = []
+    for day, name in partitions.list_partitions(conn):
+        if day + DAY > now - after_days * DAY or is_sealed(archive_dir, day):
+            continue
+        if seal_partition(conn, day, archive_dir, stopping) is None:
+            break
+        sealed.append(name)
+    return sealed
+
+def archive_cutoff(conn):
+    """Beginn der ältesten Rohdaten in der Datenbank (davor liefert das Archiv, None: keine Rohdaten)"""
+    if partitions.has_legacy_rows(conn):
+        row = conn.execute(
+            f'SELECT MIN({partitions.EPOCH_COLUMN}) FROM {partitions.LEGACY_TABLE}'
+        ).fetchone()
+        return row[0]
+    tables = partitions.list_partitions(conn)
+    return tables[0][0] if tables else None
+
+def _with_host(rows, host):
+    for timestamp, success, response_time, loss in rows:
+        yield timestamp, host, success, response_time, loss
+
+def iter_rows(archive_dir, start=None, end=None, host=None):
+    """Archivierte Zeilen (Unix-Zeit, Host, Erfolg, Antwortzeit, Packet Loss) in zeitlicher Reihenfolge"""
+    for day in list_days(archive_dir):
+        if (start is not None and day + DAY <= start) or (end is not None and day >= end):
+            continue
+        manifest = read_manifest(archive_dir, day)
+        hosts = [host] if host else sorted(manifest['hosts'])
+        streams = []
+        blocks = []
+        for name in hosts:
+            if name not in manifest['hosts']:
+                continue
+            block = ArchiveBlock(block_path(archive_dir, day, name))
+            blocks.append(block)
+            streams.append(_with_host(block.rows(start, end), name))
+        try:
+            yield from heapq.merge(*streams, key=lambda row: row[0])
+        finally:
+            streams.clear()
+            for block in blocks:
+                block.close()
+
+def iter_before_database(conn, archive_dir, start=None, end=None, host=None):
+    """Archivierte Zeilen, die vor den Rohdaten der Datenbank liegen (ergänzt partitions.iter_rows)"""
+    cutoff = archive_cutoff(conn)
+    if cutoff is not None:
+        end = cutoff if end is None else min(end, cutoff)
+    if start is not None and end is not None and start >= end:
+        return
+    yield from iter_rows(archive_dir, start, end, host)
+
+class Archiver:
+    """Versiegelt regelmäßig abgeschlossene Tage in einem eigenen Thread mit eigener Verbindung"""
+    
+    def __init__(self, db_path, archive_dir, after_days=1, interval=3600, logger=None):
+        self.db_path = db_path
+        self.archive_dir = archive_dir
+        self.after_days = after_days
+        self.interval = interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.stopping = threading.Event()
+        self.thread = None
+        self.sealed = 0
+    
+    def start(self):
+        """Startet den Archiv-Thread"""
+        if self.thread is None:
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name='archiver', daemon=True)
+            self.thread.start()
+    
+    def run(self):
+        # Erster Lauf kurz nach dem Start, danach alle interval Sekunden
+        delay = 30
+        while not self.stopping.wait(delay):
+            delay = self.interval
+            try:
+                conn = sqlite3.connect(self.db_path, timeout=30)
+                try:
+                    sealed = seal_partitions(conn, self.archive_dir, self.after_days, stopping=self.stopping)
+                finally:
+                    conn.close()
+                if sealed:
+                    self.sealed += len(sealed)
+                    self.logger.info(f"Archiv: {len(sealed)} Tage versiegelt ({', '.join(sealed)})")
+            except Exception as e:
+                self.logger.error(f"Fehler beim Archivieren: {e}")
+    
+    def close(self, timeout=30):
+        """Beendet den Thread (ein laufender Tag wird nach dem aktuellen Host abgebrochen)"""
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join(timeout)
+        self.thread = None
+
+def verify(conn, archive_dir):
+    """Prüft alle versiegelten Tage: Prüfsumme und, solange die Partition existiert, Zeile für Zeile"""
+    present = {day for day, _ in partitions.list_partitions(conn)}
+    results = []
+    for day in list_days(archive_dir):
+        manifest = read_manifest(archive_dir, day)
+        for host, info in sorted(manifest['hosts'].items()):
+            with ArchiveBlock(block_path(archive_dir, day, host)) as block:
+                problems = []
+                if not block.check():
+                    problems.append('Prüfsumme')
+                if block.count != info['rows']:
+                    problems.append('Zeilenzahl')
+                if day in present:
+                    mismatches = compare_block(block, _source_rows(conn, partitions.partition_name(day), host))
+                    if mismatches:
+                        problems.append(f'{mismatches} abweichende Zeilen')
+                results.append((day_name(day), host, block.count, day in present, problems))
+    return results
+
+if __name__ == "__main__":
+    # Aufruf: python3 archive.py list|seal|verify [datenbank] [verzeichnis]
+    if len(sys.argv) < 2 or sys.argv[1] not in ('list', 'seal', 'verify'):
+        print("Verwendung: python3 archive.py list|seal|verify [datenbank] [verzeichnis]")
+        sys.exit(1)
+    
+    from config import Config
+    db_path = sys.argv[2] if len(sys.argv) > 2 else Config.DATABASE_PATH
+    archive_dir = sys.argv[3] if len(sys.argv) > 3 else Config.ARCHIVE_DIR
+    conn = sqlite3.connect(db_path)
+    
+    if sys.argv[1] == 'list':
+        for day in list_days(archive_dir):
+            manifest = read_manifest(archive_dir, day)
+            for host, info in sorted(manifest['hosts'].items()):
+                print(f"   {manifest['day']} {host}: {info['rows']} Zeilen, {info['bytes']} Bytes "
+                      f"({info['bytes'] / max(info['rows'], 1):.1f} Bytes/Zeile)")
+    elif sys.argv[1] == 'seal':
+        sealed = seal_partitions(conn, archive_dir, Config.ARCHIVE_AFTER_DAYS)
+        print(f"✅ {len(sealed)} Tage versiegelt")
+    else:
+        failed = 0
+        for day, host, count, compared, problems in verify(conn, archive_dir):
+            status = '❌ ' + ', '.join(problems) if problems else '✅'
+            print(f"   {day} {host}: {count} Zeilen{' (mit Quelle verglichen)' if compared else ''} {status}")
+            failed += bool(problems)
+        conn.close()
+        sys.exit(1 if failed else 0)
+    conn.close()
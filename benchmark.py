@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Benchmark-Suite für Ping Monitor
+Misst ohne Netzwerkzugriff (FakeProber) den Ping-Durchsatz, die CPU-Last
+der Monitor-Schleife, den Datenbank-Durchsatz, API-Latenzen auf großen
+Datenbanken und den Speicherbedarf pro Host. Ergebnisse werden als JSON
+geschrieben und können mit einem früheren Lauf verglichen werden
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from config import Config
+from fake_prober import FakeProber
+
+# Kennzahlen, bei denen größere Werte besser sind (alle anderen: kleiner ist besser)
+HIGHER_IS_BETTER = ('probes_per_second', 'rows_per_second')
+
+def percentile(values, q):
+    """Quantil einer Liste (nächster Rang)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def configure(workdir):
+    """Leitet Datenbank und Log in das Arbeitsverzeichnis um und reduziert das Logging"""
+    Config.LOG_FILE = os.path.join(workdir, 'benchmark.log')
+    Config.LOG_LEVEL = 'WARNING'
+    Config.ENABLE_DATABASE_CLEANUP = False
+    Config.SHARED_STATE_PATH = os.path.join(workdir, 'ping-monitor.state')
+    Config.SSE_BUFFER_SIZE = 1000
+
+def bench_probes(workdir, hosts, duration, interval, seed):
+    """Ping-Durchsatz und CPU-Zeit der Monitor-Schleife mit hosts Zielen"""
+    from ping_monitor import PingMonitor
+    
+    Config.PRIMARY_HOST = '10.0.0.1'
+    Config.SECONDARY_HOST = '10.0.0.2'
+    Config.PING_INTERVAL = interval
+    Config.TARGETS = [(f'10.1.{index // 250}.{index % 250 + 1}', interval) for index in range(hosts - 1)]
+    
+    prober = FakeProber('lognormal', rtt_mean=20.0, rtt_spread=8.0, loss_rate=0.01, seed=seed)
+    monitor = PingMonitor(os.path.join(workdir, 'probes.db'), prober=prober)
+    loop_cpu = {}
+    
+    def run():
+        started = time.thread_time()
+        monitor.start()
+        loop_cpu['seconds'] = time.thread_time() - started
+    
+    cpu_started = time.process_time()
+    thread = threading.Thread(target=run, name='benchmark-monitor')
+    thread.start()
+    time.sleep(duration)
+    monitor.running = False
+    thread.join()
+    process_cpu = time.process_time() - cpu_started
+    monitor.stop()
+    
+    probes = sum(target.total_pings for target in monitor.targets.values())
+    return {
+        'hosts': len(monitor.targets),
+        'interval': interval,
+        'duration_seconds': duration,
+        'probes': probes,
+        'probes_per_second': round(probes / duration, 1),
+        'loop_cpu_seconds': round(loop_cpu.get('seconds', 0.0), 3),
+        'loop_cpu_percent_per_host': round(loop_cpu.get('seconds', 0.0) / duration / len(monitor.targets) * 100, 4),
+        'process_cpu_seconds': round(process_cpu, 3),
+        'writer_rows': monitor.writer.rows_written,
+        'writer_dropped': monitor.writer.dropped
+    }
+
+def bench_writer(workdir, rows, hosts):
+    """Schreibdurchsatz des Datenbank-Writers inklusive Rollups"""
+    from db_writer import DatabaseWriter
+    
+    db_path = os.path.join(workdir, 'writer.db')
+    _init_database(db_path)
+    writer = DatabaseWriter(db_path, batch_size=Config.DB_BATCH_SIZE,
+                            flush_interval_ms=Config.DB_FLUSH_INTERVAL_MS, queue_size=rows + 1)
+    writer.start()
+    
+    now = time.time()
+    started = time.perf_counter()
+    for index in range(rows):
+        writer.submit_ping(now + index / hosts, f'host-{index % hosts}', index % 50 != 0, 20.0 + index % 7, 0.0)
+    writer.close(timeout=600)
+    elapsed = time.perf_counter() - started
+    
+    stats = writer.get_stats()
+    return {
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed, 1),
+        'avg_flush_ms': stats['avg_flush_ms'],
+        'max_flush_ms': stats['max_flush_ms'],
+        'dropped': stats['dropped']
+    }
+
+def _init_database(db_path):
+    """Legt das Schema an, ohne Writer, Logging oder Signal-Handler zu starten"""
+    from ping_monitor import PingMonitor
+    import logging
+    
+    monitor = PingMonitor.__new__(PingMonitor)
+    monitor.db_path = db_path
+    monitor.logger = logging.getLogger('benchmark')
+    monitor.init_database()
+
+def generate_fixture(db_path, hosts, days, interval, seed):
+    """Erzeugt eine Datenbank mit days Tagen Rohdaten für hosts Hosts"""
+    from db_writer import DatabaseWriter, open_connection
+    import random
+    
+    _init_database(db_path)
+    rng = random.Random(seed)
+    writer = DatabaseWriter(db_path)
+    conn = open_connection(db_path)
+    
+    end = time.time()
+    start = end - days * 86400
+    steps = int(days * 86400 / interval)
+    batch = []
+    rows = 0
+    for step in range(steps):
+        timestamp = start + step * interval
+        for host_index in range(hosts):
+            success = rng.random() >= 0.01
+            batch.append(('ping', (timestamp, f'host-{host_index}', success,
+                                   round(rng.lognormvariate(3, 0.3), 3) if success else None, 0.0)))
+        if len(batch) >= 20000:
+            writer.flush(conn, batch)
+            rows += len(batch)
+            batch = []
+    if batch:
+        writer.flush(conn, batch)
+        rows += len(batch)
+    
+    # Einige abgeschlossene Loss-Events
+    with conn:
+        conn.executemany('''
+            INSERT INTO packet_loss_events (start_time, end_time, host, consecutive_failures, duration_seconds, is_active)
+            VALUES (?, ?, ?, ?, ?, 0)
+        ''', [
+            (datetime.fromtimestamp(start + offset).isoformat(sep=' '),
+             datetime.fromtimestamp(start + offset + 30).isoformat(sep=' '),
+             f'host-{index % hosts}', 5, 30)
+            for index, offset in enumerate(range(0, int(days * 86400), 600))
+        ])
+    conn.close()
+    return rows
+
+def bench_api(db_path, iterations):
+    """Latenz der Lese-API mit und ohne Antwort-Cache"""
+    Config.DATABASE_PATH = db_path
+    import web_interface
+    web_interface.monitor = None
+    client = web_interface.app.test_client()
+    
+    endpoints = [
+        '/api/summary?hours=24',
+        '/api/summary?hours=24&host=host-0',
+        '/api/history?hours=0.25',
+        '/api/history?hours=24',
+        '/api/history?hours=24&points=500',
+        '/api/history?hours=24&points=500&resolution=raw&host=host-0',
+        '/api/packet-loss-events?hours=24',
+    ]
+    results = {}
+    for url in endpoints:
+        uncached = []
+        cached = []
+        status = None
+        for _ in range(iterations):
+            web_interface.response_cache.clear()
+            started = time.perf_counter()
+            response = client.get(url)
+            uncached.append((time.perf_counter() - started) * 1000)
+            status = response.status_code
+            started = time.perf_counter()
+            client.get(url)
+            cached.append((time.perf_counter() - started) * 1000)
+        results[url] = {
+            'status': status,
+            'p50_ms': round(percentile(uncached, 0.5), 3),
+            'p95_ms': round(percentile(uncached, 0.95), 3),
+            'max_ms': round(max(uncached), 3),
+            'cached_p50_ms': round(percentile(cached, 0.5), 3)
+        }
+    return results
+
+def bench_memory(hosts, samples):
+    """Speicherbedarf pro Host mit vollem Ringpuffer, Sketch und gleitenden Fenstern"""
+    from ping_monitor import HostState
+    
+    Config.MAX_RECENT_PINGS = samples
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    states = []
+    now = time.time()
+    for index in range(hosts):
+        state = HostState(f'host-{index}', f'host-{index}')
+        for step in range(samples):
+            response_time = 20.0 + (step * 7919 % 1000) / 100
+            state.add_recent(now + step, state.key, step % 100 != 0, response_time, 1.0)
+            state.rolling.add(step % 100 != 0, response_time, now=step)
+        states.append(state)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {
+        'hosts': hosts,
+        'samples_per_host': samples,
+        'bytes_per_host': used // hosts,
+        'bytes_per_sample': round(used / hosts / samples, 2)
+    }
+
+def flatten(results, prefix=''):
+    """Flacht verschachtelte Ergebnisse zu {pfad: zahl} ab"""
+    values = {}
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            values.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+def compare(previous, current, threshold):
+    """Vergleicht zwei Läufe und liefert die Verschlechterungen über threshold Prozent"""
+    old = flatten(previous['results'])
+    new = flatten(current['results'])
+    regressions = []
+    for path, value in new.items():
+        reference = old.get(path)
+        if not reference or not path.endswith(('_ms', '_per_second', '_per_host', 'bytes_per_sample', '_cpu_seconds')):
+            continue
+        change = (value - reference) / reference * 100
+        if path.endswith(HIGHER_IS_BETTER):
+            change = -change
+        if change > threshold:
+            regressions.append((path, reference, value, change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark-Suite für Ping Monitor (ohne Netzwerk)')
+    parser.add_argument('--output', default='benchmark_results.json', help='Ergebnisdatei (JSON)')
+    parser.add_argument('--compare', help='Früheres Ergebnis zum Vergleich')
+    parser.add_argument('--threshold', type=float, default=20.0, help='Erlaubte Verschlechterung in Prozent')
+    parser.add_argument('--quick', action='store_true', help='Kleine Datenmengen für einen schnellen Lauf')
+    parser.add_argument('--hosts', type=int, default=200, help='Ziele für den Ping-Durchsatz')
+    parser.add_argument('--duration', type=float, default=10.0, help='Laufzeit des Ping-Durchsatz-Tests (s)')
+    parser.add_argument('--fixture-days', type=float, default=2.0, help='Tage Rohdaten in der API-Datenbank')
+    parser.add_argument('--fixture-hosts', type=int, default=5, help='Hosts in der API-Datenbank')
+    parser.add_argument('--seed', type=int, default=42, help='Startwert für Zufallszahlen')
+    parser.add_argument('--keep', action='store_true', help='Arbeitsverzeichnis nicht löschen')
+    args = parser.parse_args()
+    
+    if args.quick:
+        args.hosts = min(args.hosts, 50)
+        args.duration = min(args.duration, 3.0)
+        args.fixture_days = min(args.fixture_days, 0.25)
+    
+    workdir = tempfile.mkdtemp(prefix='ping-monitor-bench-')
+    configure(workdir)
+    results = {}
+    try:
+        print(f"⏱️  Ping-Durchsatz ({args.hosts} Ziele, {args.duration:.0f}s)...")
+        results['probes'] = bench_probes(workdir, args.hosts, args.duration, 0.1, args.seed)
+        
+        print("⏱️  Datenbank-Writer...")
+        results['writer'] = bench_writer(workdir, 20000 if args.quick else 200000, 10)
+        
+        print(f"⏱️  Testdaten ({args.fixture_days} Tage, {args.fixture_hosts} Hosts)...")
+        fixture = os.path.join(workdir, 'fixture.db')
+        started = time.perf_counter()
+        rows = generate_fixture(fixture, args.fixture_hosts, args.fixture_days, 1.0, args.seed)
+        results['fixture'] = {
+            'rows': rows,
+            'seconds': round(time.perf_counter() - started, 1),
+            'size_mb': round(sum(os.path.getsize(fixture + suffix) for suffix in ('', '-wal')
+                                 if os.path.exists(fixture + suffix)) / 1024 / 1024, 1)
+        }
+        
+        print("⏱️  API-Latenzen...")
+        results['api'] = bench_api(fixture, 5 if args.quick else 20)
+        
+        print("⏱️  Speicher pro Host...")
+        results['memory'] = bench_memory(20, Config.MAX_RECENT_PINGS)
+    finally:
+        if args.keep:
+            print(f"📁 Arbeitsverzeichnis: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    report = {
+        'version': 1,
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlite': sqlite3.sqlite_version,
+        'parameters': vars(args),
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"✅ Ergebnisse gespeichert in {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(previous, report, args.threshold)
+        for path, reference, value, change in regressions:
+            print(f"❌ {path}: {reference} -> {value} ({change:+.1f}% schlechter)")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ Keine Verschlechterung über {args.threshold:.0f}% gegenüber {args.compare}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Sprachqualität für Ping Monitor
+Jitter nach RFC 3550 und eine MOS-Schätzung über das vereinfachte E-Modell
+(ITU-T G.107), beides pro Ping in konstanter Zeit fortgeschrieben
+"""
+
+# Gewicht eines neuen Laufzeitunterschieds im Jitter (RFC 3550, Abschnitt 6.4.1)
+JITTER_GAIN = 1 / 16
+
+# Pauschale Verzögerung durch Codec und Paketierung im E-Modell (ms)
+CODEC_DELAY_MS = 10.0
+
+class JitterEstimator:
+    """Geglätteter Jitter J += (|D| - J) / 16 über aufeinanderfolgende Antwortzeiten
+    
+    Pings werden im festen Takt gesendet, daher entspricht die Differenz zweier
+    Antwortzeiten dem Laufzeitunterschied D aus RFC 3550. Fehlgeschlagene Pings
+    werden übersprungen.
+    """
+    
+    def __init__(self):
+        self.last = None
+        self.value = None
+    
+    def add(self, success, response_time):
+        """Nimmt ein Ping-Ergebnis auf und liefert den aktuellen Jitter (ms)"""
+        if not success or response_time is None:
+            return self.value
+        if self.last is not None:
+            delta = abs(response_time - self.last)
+            self.value = delta if self.value is None else self.value + (delta - self.value) * JITTER_GAIN
+        self.last = response_time
+        return self.value
+    
+    def reset(self):
+        """Verwirft den Verlauf (z.B. nach einem Hostwechsel)"""
+        self.last = None
+        self.value = None
+
+def r_factor(response_time, jitter, loss_percent):
+    """R-Faktor (0-100) aus mittlerer Antwortzeit, Jitter und Packet Loss
+    
+    Die Einweg-Verzögerung wird als halbe Antwortzeit angenommen; Jitter zählt
+    doppelt (Jitter-Puffer), dazu kommt die Codec-Verzögerung.
+    """
+    latency = response_time / 2 + 2 * (jitter or 0.0) + CODEC_DELAY_MS
+    if latency < 160:
+        r = 93.2 - latency / 40
+    else:
+        r = 93.2 - (latency - 120) / 10
+    r -= 2.5 * loss_percent
+    return max(0.0, min(100.0, r))
+
+def mos(r):
+    """Mean Opinion Score (1-4.5) zu einem R-Faktor"""
+    if r <= 0:
+        return 1.0
+    if r >= 100:
+        return 4.5
+    return max(1.0, 1 + 0.035 * r + 7e-6 * r * (r - 60) * (100 - r))
+
+def assess(jitter, summary):
+    """Qualitätskennzahlen zu einem Fenster (Ausgabe von RollingWindow.summary)
+    
+    Ohne Pings im Fenster gibt es keine Bewertung; ohne Jitter-Wert (weniger
+    als zwei erfolgreiche Pings) zählt der Jitter als 0.
+    """
+    result = {'jitter_ms': None if jitter is None else round(jitter, 3), 'r_factor': None, 'mos': None}
+    if not summary or not summary['total_pings']:
+        return result
+    if summary['min_response_time'] is None:
+        # Kein einziger erfolgreicher Ping: keine Verständigung möglich
+        r = 0.0
+    else:
+        r = r_factor(summary['avg_response_time'], jitter, summary['packet_loss_percent'])
+    result.update(r_factor=round(r, 1), mos=round(mos(r), 2))
+    return result
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Collector-Modus für Ping Monitor
+Nimmt die Batches der Agents entgegen und schreibt sie über einen eigenen
+DatabaseWriter pro Knoten in eine eigene Datenbank (mit Tagespartitionen
+und Rollups wie lokal). Doppelt zugestellte Batches werden anhand von
+Startkennung und Sequenznummer des Agents erkannt
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from db_writer import DatabaseWriter
+import metrics
+
+NODE_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+# Pflichtfelder eines Loss-Events in der Batch (Ende zusätzlich end_time und duration)
+EVENT_OPS = ('start', 'update', 'end')
+EVENT_KEYS = ('op', 'key', 'host', 'type', 'start_time', 'fields')
+
+# Spalten einer Statistik-Zeile (total, failed, loss, current_host, host, jitter_ms, mos)
+STATISTICS_COLUMNS = 7
+
+class IngestError(Exception):
+    """Batch kann nicht übernommen werden; status ist der HTTP-Status für den Agent"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def _finite(value, optional=False):
+    """Wandelt einen Messwert in float um (ValueError bei NaN/inf, None nur mit optional)"""
+    if value is None and optional:
+        return None
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"Ungültiger Messwert: {value!r}")
+    return number
+
+def _init_database(db_path):
+    """Legt das Schema an, ohne Writer, Logging oder Signal-Handler zu starten"""
+    from ping_monitor import PingMonitor
+    
+    monitor = PingMonitor.__new__(PingMonitor)
+    monitor.db_path = db_path
+    monitor.logger = logging.getLogger('collector')
+    monitor.init_database()
+
+class NodeStore:
+    """Datenbank, Writer und Empfangszustand eines Agent-Knotens"""
+    
+    def __init__(self, name, directory, batch_size=500, flush_interval_ms=1000, queue_size=100000, logger=None):
+        self.name = name
+        self.db_path = os.path.join(directory, f'{name}.db')
+        self.state_path = os.path.join(directory, f'{name}.state.json')
+        self.logger = logger or logging.getLogger(__name__)
+        _init_database(self.db_path)
+        self.writer = DatabaseWriter(self.db_path, batch_size=batch_size, flush_interval_ms=flush_interval_ms,
+                                     queue_size=queue_size, logger=self.logger)
+        self.writer.start()
+        # Hält die Reihenfolge der Batches eines Knotens ein
+        self.lock = threading.Lock()
+        
+        # Offene Loss-Events: Schlüssel -> Event (erhält die ID beim Schreiben)
+        self.events = {}
+        
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        self.boot = state.get('boot')
+        self.seq = state.get('seq', 0)
+        
+        # Zuletzt gemeldete Statistiken pro Ziel (für /api/stats)
+        self.stats = {}
+        self.default_host = state.get('default_host')
+        
+        # Kennzahlen
+        self.last_seen = None
+        self.batches = 0
+        self.duplicates = 0
+        self.busy = 0
+        self.rows = 0
+    
+    def ingest(self, batch):
+        """Übernimmt eine Batch; liefert False für eine bereits übernommene Batch"""
+        # Erst vollständig prüfen, damit eine ungültige Batch nichts teilweise schreibt
+        try:
+            boot, seq = str(batch['boot']), int(batch['seq'])
+            pings = [(_finite(timestamp), str(host), bool(success), _finite(response_time, optional=True),
+                      _finite(packet_loss))
+                     for timestamp, host, success, response_time, packet_loss in batch.get('pings', [])]
+            # Ältere Agents senden Statistiken noch ohne Jitter und MOS
+            statistics = [(tuple(row) + (None, None))[:STATISTICS_COLUMNS] for row in batch.get('statistics', [])]
+            if any(len(row) != STATISTICS_COLUMNS for row in statistics):
+                raise ValueError("Statistik-Zeile mit falscher Spaltenzahl")
+            events = batch.get('events', [])
+            for entry in events:
+                required = EVENT_KEYS + (('end_time', 'duration') if entry.get('op') == 'end' else ())
+                if entry.get('op') not in EVENT_OPS or any(name not in entry for name in required):
+                    raise ValueError(f"Ungültiges Event: {entry}")
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise IngestError(f"Ungültige Batch: {e}")
+        
+        with self.lock:
+            if boot == self.boot and seq <= self.seq:
+                self.duplicates += 1
+                metrics.COLLECTOR_BATCHES.inc(1, (self.name, 'duplicate'))
+                return False
+            
+            # Alles oder nichts: ohne Platz in der Queue liefert der Agent später erneut
+            needed = len(pings) + len(events) + (1 if statistics else 0)
+            if needed > self.writer.queue.maxsize:
+                raise IngestError(f"Batch mit {needed} Einträgen größer als die Queue ({self.writer.queue.maxsize})", 413)
+            free = self.writer.queue.maxsize - self.writer.queue.qsize()
+            if needed > free:
+                self.busy += 1
+                metrics.COLLECTOR_BATCHES.inc(1, (self.name, 'busy'))
+                raise IngestError(f"Queue für Knoten {self.name} voll", 503)
+            
+            for row in pings:
+                self.writer.submit('ping', *row)
+            if statistics:
+                self.writer.submit_statistics(statistics)
+            for entry in events:
+                self.apply_event(entry)
+            
+            self.boot, self.seq = boot, seq
+            if batch.get('default_host'):
+                self.default_host = batch['default_host']
+            self.stats.update(batch.get('stats') or {})
+            self.save_state()
+            self.last_seen = time.time()
+            self.batches += 1
+            self.rows += needed
+            metrics.COLLECTOR_BATCHES.inc(1, (self.name, 'accepted'))
+            metrics.COLLECTOR_ROWS.inc(needed, (self.name,))
+            return True
+    
+    def apply_event(self, entry):
+        """Start, Aktualisierung oder Ende eines Loss-Events an den Writer weitergeben"""
+        key, fields = entry['key'], tuple(entry['fields'])
+        if entry['op'] == 'start':
+            event = {'start_time': entry['start_time'], 'host': entry['host'], 'type': entry['type']}
+            self.events[key] = event
+            self.writer.submit('event_start', event, fields)
+            return
+        
+        event = self.events.get(key) or self.find_event(entry)
+        if entry['op'] == 'update':
+            self.writer.submit('event_update', event, fields)
+        elif entry['op'] == 'end':
+            self.writer.submit('event_end', event, fields, entry['end_time'], int(entry['duration']))
+            self.events.pop(key, None)
+    
+    def find_event(self, entry):
+        """Event aus einem früheren Lauf des Collectors in der Datenbank suchen"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute('''
+                SELECT id FROM packet_loss_events WHERE host = ? AND event_type = ? AND start_time = ?
+                ORDER BY id DESC LIMIT 1
+            ''', (entry['host'], entry['type'], entry['start_time'])).fetchone()
+        finally:
+            conn.close()
+        event = {'id': row[0] if row else None, 'start_time': entry['start_time'],
+                 'host': entry['host'], 'type': entry['type']}
+        self.events[entry['key']] = event
+        return event
+    
+    def save_state(self):
+        with open(f'{self.state_path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'boot': self.boot, 'seq': self.seq, 'default_host': self.default_host}, f)
+        os.replace(f'{self.state_path}.tmp', self.state_path)
+    
+    def close(self, timeout=10):
+        self.writer.close(timeout)
+    
+    def get_stats(self):
+        """Kennzahlen für /api/nodes"""
+        return {
+            'node': self.name,
+            'last_seen': self.last_seen,
+            'seq': self.seq,
+            'batches': self.batches,
+            'duplicates': self.duplicates,
+            'busy': self.busy,
+            'rows': self.rows,
+            'targets': sorted(self.stats),
+            'database': self.writer.get_stats()
+        }
+
+class Collector:
+    """Verwaltet die Knoten; Datenbanken werden beim ersten Zugriff geöffnet"""
+    
+    def __init__(self, directory, batch_size=500, flush_interval_ms=1000, queue_size=100000, logger=None):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.queue_size = queue_size
+        self.logger = logger or logging.getLogger(__name__)
+        self.nodes = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    @classmethod
+    def create(cls, logger=None):
+        """Collector aus der Konfiguration"""
+        from config import Config
+        return cls(Config.COLLECTOR_DIR, batch_size=Config.DB_BATCH_SIZE,
+                   flush_interval_ms=Config.DB_FLUSH_INTERVAL_MS, queue_size=Config.DB_QUEUE_SIZE, logger=logger)
+    
+    def node_names(self):
+        """Alle bekannten Knoten (auch solche, die seit dem Start noch nichts geschickt haben)"""
+        names = {name[:-3] for name in os.listdir(self.directory) if name.endswith('.db')}
+        return sorted(names | set(self.nodes))
+    
+    def node(self, name, create=False):
+        """NodeStore eines Knotens (None, wenn unbekannt und create nicht gesetzt)"""
+        if not name or not NODE_PATTERN.match(name):
+            if create:
+                raise IngestError(f"Ungültiger Knotenname: {name!r}")
+            return None
+        with self.lock:
+            store = self.nodes.get(name)
+            if store is None:
+                if not create and not os.path.exists(os.path.join(self.directory, f'{name}.db')):
+                    return None
+                store = NodeStore(name, self.directory, self.batch_size, self.flush_interval_ms,
+                                  self.queue_size, self.logger)
+                self.nodes[name] = store
+                self.logger.info(f"Collector: Knoten {name} geöffnet")
+            return store
+    
+    def ingest(self, batch):
+        """Übernimmt eine Batch eines Agents (IngestError bei ungültigen Daten oder voller Queue)"""
+        if not isinstance(batch, dict):
+            raise IngestError("Batch muss ein JSON-Objekt sein")
+        store = self.node(batch.get('node'), create=True)
+        try:
+            return store.ingest(batch)
+        except IngestError as e:
+            if e.status != 503:
+                metrics.COLLECTOR_BATCHES.inc(1, (store.name, 'rejected'))
+                self.logger.warning(f"Collector: Batch von {store.name} abgelehnt: {e}")
+            raise
+    
+    def close(self):
+        """Schreibt alle ausstehenden Einträge und beendet die Writer"""
+        with self.lock:
+            nodes, self.nodes = list(self.nodes.values()), {}
+        for store in nodes:
+            store.close()
+    
+    def get_stats(self):
+        with self.lock:
+            nodes = dict(self.nodes)
+        result = []
+        for name in self.node_names():
+            store = nodes.get(name)
+            result.append(store.get_stats() if store is not None else {'node': name, 'last_seen': None})
+        return result
@@ -5,6 +5,7 @@ Zentrale Stelle für alle Einstellungen
 """
 
 import os
+import socket
 
 class Config:
     """Konfigurationsklasse für Ping Monitor"""
@@ -12,10 +13,28 @@ class Config:
     # Ping-Einstellungen
     PRIMARY_HOST = "8.8.8.8"           # Primärer Ping-Host (Google DNS)
     SECONDARY_HOST = "8.8.4.4"         # Sekundärer Ping-Host (Google DNS)
-    PING_INTERVAL = 1.0                 # Ping-Intervall in Sekunden
+    PING_INTERVAL = 1.0                 # Ping-Intervall in Sekunden (mindestens MIN_PING_INTERVAL)
     PING_TIMEOUT = 3                    # Ping-Timeout in Sekunden
     FAILOVER_THRESHOLD = 3              # Anzahl Fehlschläge vor Failover
     
+    # Hedged Probing für primären/sekundären Host: off, parallel (beide Hosts pro Tick)
+    # oder delayed (anderer Host erst, wenn der aktuelle nicht innerhalb des Perzentils antwortet)
+    HEDGE_MODE = "off"
+    HEDGE_QUANTILE = 0.95              # Wartezeit im delayed-Modus: Latenz-Perzentil des Ziels ...
+    HEDGE_MIN_DELAY_MS = 20            # ... mindestens X ms
+    HEDGE_MAX_DELAY_MS = 1000          # ... höchstens X ms (auch ohne Messwerte)
+    HEALTH_ALPHA = 0.5                 # Gewicht des neuesten Pings im Gesundheitswert (0..1)
+    HEALTH_FAILOVER_MARGIN = 0.4       # Failover, sobald der andere Host um X gesünder ist
+    USE_NATIVE_ICMP = True              # ICMP-Sockets statt ping-Befehl verwenden
+    
+    # Zusätzliche Ziele als (Host, Intervall in Sekunden) - Intervall None = PING_INTERVAL
+    # Per Umgebung: PING_TARGETS="1.1.1.1,9.9.9.9@5"
+    TARGETS = []
+    MAX_CONCURRENT_PROBES = 256         # Maximale Anzahl gleichzeitig laufender Pings
+    MIN_PING_INTERVAL = 0.01            # Kleinstes erlaubtes Intervall (10 ms)
+    PROBE_BURST = 1                     # Pings pro Intervall (Burst-Modus ab 2)
+    BURST_SPACING_MS = 0                # Abstand der Pings innerhalb eines Bursts in ms
+    
     # Web-Interface Einstellungen
     WEB_HOST = "0.0.0.0"               # Web-Server Host (0.0.0.0 = alle Interfaces)
     WEB_PORT = 4000                     # Web-Server Port
@@ -23,31 +42,101 @@ class Config:
     
     # Datenbank-Einstellungen
     DATABASE_PATH = "ping_data.db"      # Pfad zur SQLite-Datenbank
-    MAX_RECENT_PINGS = 3600            # Maximale Anzahl recent pings im Speicher (1 Stunde)
+    MAX_RECENT_PINGS = 3600            # Maximale Anzahl recent pings im Speicher (1 Stunde, ca. 27 Bytes pro Ping)
     STATS_SAVE_INTERVAL = 60           # Statistiken alle X Pings speichern
+    DB_BATCH_SIZE = 500                # Maximale Anzahl Einträge pro Schreib-Transaktion
+    DB_FLUSH_INTERVAL_MS = 1000        # Spätestens nach X ms in die Datenbank schreiben
+    DB_QUEUE_SIZE = 100000             # Maximale Länge der Schreib-Queue
+    ROLLING_WINDOWS = {'1m': 60, '5m': 300, '1h': 3600}  # Gleitende Statistik-Fenster (Sekunden)
+    STATS_WINDOW = '1h'                # Fenster für avg_response_time in /api/stats
+    QUALITY_WINDOW = '5m'              # Fenster für Antwortzeit und Loss in der MOS-Schätzung
+    HISTORY_RAW_SECONDS = 900          # Verläufe bis X Sekunden aus Rohdaten, darüber aus Rollups
+    HISTORY_MAX_POINTS = 5000          # Obergrenze für /api/history?points=N
+    RESPONSE_CACHE_ENTRIES = 256       # Zwischengespeicherte API-Antworten (LRU)
+    RESPONSE_CACHE_MAX_BYTES = 16 * 1024 * 1024  # Speicherobergrenze des Antwort-Caches
+    READ_POOL_SIZE = 8                 # Freie Lese-Verbindungen pro Datenbank, die offen bleiben
+    READ_CACHE_SIZE_KB = 8192          # Seiten-Cache pro Lese-Verbindung (PRAGMA cache_size)
+    READ_MMAP_SIZE_MB = 256            # Per mmap gelesener Teil der Datenbank (PRAGMA mmap_size, 0 = aus)
+    READ_CACHED_STATEMENTS = 256       # Vorbereitete Statements pro Lese-Verbindung
+    ENABLE_METRICS = True              # Interne Metriken unter /metrics (Prometheus-Format)
+    
+    # Loss-Raten-Erkennung: Fenster -> (Sekunden, Event öffnen ab %, schließen bei höchstens %)
+    ENABLE_LOSS_DETECTOR = True        # Events auch bei verstreutem Packet Loss (Typ 'rate')
+    LOSS_DETECTOR_WINDOWS = {'10s': (10, 20.0, 5.0), '1m': (60, 5.0, 1.0), '5m': (300, 2.0, 0.5)}
+    LOSS_DETECTOR_MIN_SAMPLES = 5      # Fenster erst ab X Pings bewerten
+    LOSS_SEVERITY_LEVELS = {'minor': 0.0, 'major': 5.0, 'critical': 20.0}  # Schweregrad ab Loss-Rate (%)
     
     # Logging-Einstellungen
     LOG_LEVEL = "INFO"                 # Log-Level (DEBUG, INFO, WARNING, ERROR)
     LOG_FILE = "ping_monitor.log"      # Log-Datei
     LOG_MAX_SIZE = 10 * 1024 * 1024   # Maximale Log-Dateigröße (10MB)
     LOG_BACKUP_COUNT = 5               # Anzahl Log-Backup-Dateien
+    LOG_QUEUE_SIZE = 10000             # Log-Einträge in der Queue zum Schreib-Thread (darüber verworfen)
+    LOG_SUMMARY_INTERVAL = 60          # Erfolgreiche Pings alle X Sekunden zusammengefasst loggen (0 = jeden einzeln)
     
     # Chart-Einstellungen
     CHART_MAX_POINTS = 50              # Maximale Punkte in Charts
     CHART_UPDATE_INTERVAL = 2000       # Chart-Update-Intervall in ms
     
+    # Live-Stream (Server-Sent Events)
+    SSE_BUFFER_SIZE = 5000             # Letzte X Ereignisse für Last-Event-ID-Fortsetzung
+    SSE_MAX_SUBSCRIBERS = 200          # Maximale Anzahl gleichzeitiger Stream-Verbindungen
+    SSE_HEARTBEAT = 15                 # Heartbeat-Intervall in Sekunden
+    
+    # Geteilter Live-Zustand für mehrere Web-Worker-Prozesse
+    ENABLE_SHARED_STATE = True         # Monitor veröffentlicht Live-Zustand per mmap
+    SHARED_STATE_PATH = "/dev/shm/ping-monitor.state"  # Segment (tmpfs, von Monitor und Workern erreichbar)
+    SHARED_RECENT_PINGS = 100          # Letzte X Pings pro Ziel im Segment
+    SHARED_STATE_REFRESH = 0.5         # Fenster und Perzentile höchstens alle X Sekunden aktualisieren
+    WEB_ROLE = "combined"              # combined: Monitor im Web-Prozess, reader: nur lesender Worker, collector: zentrale Sammelstelle
+    
     # Erweiterte Einstellungen
     ENABLE_EMAIL_ALERTS = False        # E-Mail-Benachrichtigungen aktivieren
     EMAIL_SMTP_SERVER = "smtp.gmail.com"
     EMAIL_SMTP_PORT = 587
     EMAIL_USERNAME = ""
     EMAIL_PASSWORD = ""
-    EMAIL_TO = ""
-    ALERT_THRESHOLD = 10.0             # Packet Loss Schwellwert für Alerts (%)
+    EMAIL_TO = ""                      # Empfänger, mehrere durch Komma getrennt
+    EMAIL_FROM = ""                    # Absender (Standard: EMAIL_USERNAME)
+    EMAIL_USE_TLS = True               # STARTTLS vor der Anmeldung
+    ALERT_WEBHOOK_URL = ""             # Benachrichtigungen zusätzlich als JSON-POST an diese URL
+    ALERT_THRESHOLD = 10.0             # Packet Loss Schwellwert für Alerts (%), aufgehoben unter der Hälfte
+    ALERT_LATENCY_THRESHOLD = 0.0      # Mittlere Antwortzeit für Alerts (ms), 0 = aus
+    ALERT_JITTER_THRESHOLD = 0.0       # Jitter nach RFC 3550 für Alerts (ms), 0 = aus
+    ALERT_MOS_THRESHOLD = 0.0          # Alert, sobald der MOS darauf fällt (z.B. 3.6), 0 = aus
+    ALERT_WINDOW = '5m'                # Ausgewertetes Fenster aus ROLLING_WINDOWS
+    ALERT_MIN_PINGS = 10               # Fenster erst ab X Pings auswerten
+    ALERT_EVAL_INTERVAL = 10           # Fenster höchstens alle X Sekunden pro Ziel auswerten
+    ALERT_MIN_SEVERITY = 'critical'    # Loss-Events ab diesem Schweregrad melden (minor, major, critical)
+    ALERT_MAX_PER_HOUR = 20            # Höchstens X Benachrichtigungen pro Stunde
+    ALERT_RETRIES = 3                  # Wiederholungen pro Kanal mit exponentiellem Backoff
+    ALERT_QUEUE_SIZE = 1000            # Maximale Länge der Alarm-Queue
     
     # Performance-Einstellungen
     DATABASE_CLEANUP_DAYS = 30         # Alte Daten nach X Tagen löschen
     ENABLE_DATABASE_CLEANUP = True     # Automatische Datenbankbereinigung
+    DATABASE_CLEANUP_INTERVAL = 3600   # Aufbewahrung alle X Sekunden prüfen (löscht ganze Tagespartitionen)
+    
+    # Agent-Modus: Ergebnisse zusätzlich an einen zentralen Collector senden
+    AGENT_COLLECTOR_URL = ""           # z.B. http://zentrale:4000/api/ingest (leer = aus)
+    AGENT_NODE = ""                    # Name dieses Standorts beim Collector (leer = Rechnername)
+    AGENT_TOKEN = ""                   # Gemeinsames Token mit COLLECTOR_TOKEN
+    AGENT_SPOOL_DIR = "agent_spool"    # Noch nicht bestätigte Batches (überstehen Neustarts)
+    AGENT_SPOOL_MAX_MB = 500           # Älteste Batches verwerfen, wenn der Spool größer wird
+    AGENT_BATCH_SIZE = 2000            # Maximale Einträge pro Batch
+    AGENT_FLUSH_INTERVAL = 5           # Batch spätestens nach X Sekunden abschließen
+    AGENT_QUEUE_SIZE = 100000          # Maximale Länge der Agent-Queue
+    
+    # Collector-Modus (WEB_ROLE=collector): eine Datenbank pro Knoten
+    COLLECTOR_DIR = "nodes"            # Verzeichnis der Knoten-Datenbanken
+    COLLECTOR_TOKEN = ""               # Erwartetes Token der Agents (leer = keine Prüfung)
+    COLLECTOR_MAX_BATCH_MB = 16        # Maximale Größe einer Batch (entpackt)
+    
+    # Langzeitarchiv (komprimierte Blöcke pro Host und Tag)
+    ENABLE_ARCHIVE = False             # Abgeschlossene Tage archivieren; die Bereinigung löscht dann nur archivierte Tage
+    ARCHIVE_DIR = "archive"            # Verzeichnis der Archivblöcke
+    ARCHIVE_AFTER_DAYS = 1             # Tage archivieren, sobald sie X Tage zurückliegen
+    ARCHIVE_INTERVAL = 3600            # Alle X Sekunden nach neuen Tagen suchen
     
     @classmethod
     def load_from_env(cls):
@@ -55,19 +144,67 @@ class Config:
         cls.PRIMARY_HOST = os.getenv('PING_PRIMARY_HOST', cls.PRIMARY_HOST)
         cls.SECONDARY_HOST = os.getenv('PING_SECONDARY_HOST', cls.SECONDARY_HOST)
         cls.PING_INTERVAL = float(os.getenv('PING_INTERVAL', cls.PING_INTERVAL))
+        cls.HEDGE_MODE = os.getenv('HEDGE_MODE', cls.HEDGE_MODE).lower()
+        cls.USE_NATIVE_ICMP = os.getenv('USE_NATIVE_ICMP', str(cls.USE_NATIVE_ICMP)).lower() == 'true'
+        cls.TARGETS = cls.parse_targets(os.getenv('PING_TARGETS', '')) or cls.TARGETS
+        cls.MAX_CONCURRENT_PROBES = int(os.getenv('MAX_CONCURRENT_PROBES', cls.MAX_CONCURRENT_PROBES))
+        cls.PROBE_BURST = int(os.getenv('PROBE_BURST', cls.PROBE_BURST))
+        cls.BURST_SPACING_MS = float(os.getenv('BURST_SPACING_MS', cls.BURST_SPACING_MS))
         cls.WEB_PORT = int(os.getenv('WEB_PORT', cls.WEB_PORT))
         cls.WEB_HOST = os.getenv('WEB_HOST', cls.WEB_HOST)
         cls.DATABASE_PATH = os.getenv('DATABASE_PATH', cls.DATABASE_PATH)
+        cls.DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', cls.DB_BATCH_SIZE))
+        cls.DB_FLUSH_INTERVAL_MS = int(os.getenv('DB_FLUSH_INTERVAL_MS', cls.DB_FLUSH_INTERVAL_MS))
+        cls.DATABASE_CLEANUP_DAYS = int(os.getenv('DATABASE_CLEANUP_DAYS', cls.DATABASE_CLEANUP_DAYS))
+        cls.ENABLE_DATABASE_CLEANUP = os.getenv('ENABLE_DATABASE_CLEANUP', str(cls.ENABLE_DATABASE_CLEANUP)).lower() == 'true'
+        cls.AGENT_COLLECTOR_URL = os.getenv('AGENT_COLLECTOR_URL', cls.AGENT_COLLECTOR_URL)
+        cls.AGENT_NODE = os.getenv('AGENT_NODE', cls.AGENT_NODE)
+        cls.AGENT_TOKEN = os.getenv('AGENT_TOKEN', cls.AGENT_TOKEN)
+        cls.AGENT_SPOOL_DIR = os.getenv('AGENT_SPOOL_DIR', cls.AGENT_SPOOL_DIR)
+        cls.COLLECTOR_DIR = os.getenv('COLLECTOR_DIR', cls.COLLECTOR_DIR)
+        cls.COLLECTOR_TOKEN = os.getenv('COLLECTOR_TOKEN', cls.COLLECTOR_TOKEN)
+        cls.ENABLE_ARCHIVE = os.getenv('ENABLE_ARCHIVE', str(cls.ENABLE_ARCHIVE)).lower() == 'true'
+        cls.ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', cls.ARCHIVE_DIR)
+        cls.ENABLE_LOSS_DETECTOR = os.getenv('ENABLE_LOSS_DETECTOR', str(cls.ENABLE_LOSS_DETECTOR)).lower() == 'true'
+        cls.ENABLE_SHARED_STATE = os.getenv('ENABLE_SHARED_STATE', str(cls.ENABLE_SHARED_STATE)).lower() == 'true'
+        cls.SHARED_STATE_PATH = os.getenv('SHARED_STATE_PATH', cls.SHARED_STATE_PATH)
+        cls.WEB_ROLE = os.getenv('WEB_ROLE', cls.WEB_ROLE)
+        cls.ENABLE_EMAIL_ALERTS = os.getenv('ENABLE_EMAIL_ALERTS', str(cls.ENABLE_EMAIL_ALERTS)).lower() == 'true'
+        cls.EMAIL_SMTP_SERVER = os.getenv('EMAIL_SMTP_SERVER', cls.EMAIL_SMTP_SERVER)
+        cls.EMAIL_SMTP_PORT = int(os.getenv('EMAIL_SMTP_PORT', cls.EMAIL_SMTP_PORT))
+        cls.EMAIL_USERNAME = os.getenv('EMAIL_USERNAME', cls.EMAIL_USERNAME)
+        cls.EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD', cls.EMAIL_PASSWORD)
+        cls.EMAIL_TO = os.getenv('EMAIL_TO', cls.EMAIL_TO)
+        cls.EMAIL_FROM = os.getenv('EMAIL_FROM', cls.EMAIL_FROM)
+        cls.EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', str(cls.EMAIL_USE_TLS)).lower() == 'true'
+        cls.ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL', cls.ALERT_WEBHOOK_URL)
+        cls.ALERT_THRESHOLD = float(os.getenv('ALERT_THRESHOLD', cls.ALERT_THRESHOLD))
         cls.LOG_LEVEL = os.getenv('LOG_LEVEL', cls.LOG_LEVEL)
+        cls.LOG_SUMMARY_INTERVAL = float(os.getenv('LOG_SUMMARY_INTERVAL', cls.LOG_SUMMARY_INTERVAL))
         cls.DEBUG_MODE = os.getenv('DEBUG_MODE', 'False').lower() == 'true'
     
+    @staticmethod
+    def parse_targets(value):
+        """Liest eine Zielliste im Format "host[@intervall],host[@intervall]" """
+        targets = []
+        for entry in value.split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            host, _, interval = entry.partition('@')
+            targets.append((host.strip(), float(interval) if interval else None))
+        return targets
+    
     @classmethod
     def validate(cls):
         """Validiert die Konfiguration"""
         errors = []
         
-        if cls.PING_INTERVAL <= 0:
-            errors.append("PING_INTERVAL muss größer als 0 sein")
+        if cls.PING_INTERVAL < cls.MIN_PING_INTERVAL:
+            errors.append(f"PING_INTERVAL muss mindestens {cls.MIN_PING_INTERVAL} sein")
+        
+        if cls.PROBE_BURST < 1 or cls.BURST_SPACING_MS < 0:
+            errors.append("PROBE_BURST muss mindestens 1 und BURST_SPACING_MS nicht negativ sein")
         
         if cls.WEB_PORT < 1 or cls.WEB_PORT > 65535:
             errors.append("WEB_PORT muss zwischen 1 und 65535 liegen")
@@ -78,6 +215,65 @@ class Config:
         if cls.FAILOVER_THRESHOLD <= 0:
             errors.append("FAILOVER_THRESHOLD muss größer als 0 sein")
         
+        if cls.HEDGE_MODE not in ('off', 'parallel', 'delayed'):
+            errors.append("HEDGE_MODE muss 'off', 'parallel' oder 'delayed' sein")
+        
+        if not 0 < cls.HEDGE_QUANTILE < 1 or not 0 <= cls.HEDGE_MIN_DELAY_MS <= cls.HEDGE_MAX_DELAY_MS:
+            errors.append("HEDGE_QUANTILE muss zwischen 0 und 1 und HEDGE_MIN_DELAY_MS <= HEDGE_MAX_DELAY_MS sein")
+        
+        if not 0 < cls.HEALTH_ALPHA <= 1 or not 0 < cls.HEALTH_FAILOVER_MARGIN <= 1:
+            errors.append("HEALTH_ALPHA und HEALTH_FAILOVER_MARGIN müssen zwischen 0 und 1 liegen")
+        
+        if cls.DB_BATCH_SIZE <= 0 or cls.DB_FLUSH_INTERVAL_MS <= 0:
+            errors.append("DB_BATCH_SIZE und DB_FLUSH_INTERVAL_MS müssen größer als 0 sein")
+        
+        if cls.MAX_CONCURRENT_PROBES <= 0:
+            errors.append("MAX_CONCURRENT_PROBES muss größer als 0 sein")
+        
+        if cls.ENABLE_DATABASE_CLEANUP and cls.DATABASE_CLEANUP_DAYS < 1:
+            errors.append("DATABASE_CLEANUP_DAYS muss mindestens 1 sein")
+        
+        if cls.ENABLE_ARCHIVE and (cls.ARCHIVE_AFTER_DAYS < 0 or cls.ARCHIVE_INTERVAL <= 0):
+            errors.append("ARCHIVE_AFTER_DAYS darf nicht negativ und ARCHIVE_INTERVAL muss größer als 0 sein")
+        
+        for name, (duration, open_percent, close_percent) in cls.LOSS_DETECTOR_WINDOWS.items():
+            if duration <= 0 or not 0 <= close_percent < open_percent <= 100:
+                errors.append(f"Loss-Fenster {name}: Dauer > 0 und 0 <= Schließen < Öffnen <= 100 erforderlich")
+        
+        if cls.QUALITY_WINDOW not in cls.ROLLING_WINDOWS:
+            errors.append(f"QUALITY_WINDOW muss eines von {', '.join(cls.ROLLING_WINDOWS)} sein")
+        
+        if not 0 <= cls.ALERT_MOS_THRESHOLD <= 4.5 or cls.ALERT_JITTER_THRESHOLD < 0:
+            errors.append("ALERT_MOS_THRESHOLD muss zwischen 0 und 4.5 liegen, ALERT_JITTER_THRESHOLD darf nicht negativ sein")
+        
+        if cls.ALERT_WINDOW not in cls.ROLLING_WINDOWS:
+            errors.append(f"ALERT_WINDOW muss eines von {', '.join(cls.ROLLING_WINDOWS)} sein")
+        
+        if cls.ALERT_MIN_SEVERITY not in ('minor', 'major', 'critical'):
+            errors.append("ALERT_MIN_SEVERITY muss 'minor', 'major' oder 'critical' sein")
+        
+        if cls.ALERT_MAX_PER_HOUR < 1 or cls.ALERT_RETRIES < 0 or cls.ALERT_QUEUE_SIZE < 1:
+            errors.append("ALERT_MAX_PER_HOUR und ALERT_QUEUE_SIZE müssen mindestens 1, ALERT_RETRIES nicht negativ sein")
+        
+        if cls.WEB_ROLE not in ('combined', 'reader', 'collector'):
+            errors.append("WEB_ROLE muss 'combined', 'reader' oder 'collector' sein")
+        
+        if cls.AGENT_COLLECTOR_URL and not cls.AGENT_COLLECTOR_URL.startswith(('http://', 'https://')):
+            errors.append("AGENT_COLLECTOR_URL muss mit http:// oder https:// beginnen")
+        
+        if cls.AGENT_BATCH_SIZE < 1 or cls.AGENT_FLUSH_INTERVAL <= 0 or cls.AGENT_QUEUE_SIZE < 1:
+            errors.append("AGENT_BATCH_SIZE und AGENT_QUEUE_SIZE müssen mindestens 1, AGENT_FLUSH_INTERVAL größer als 0 sein")
+        
+        if cls.READ_POOL_SIZE < 0 or cls.READ_CACHE_SIZE_KB < 0 or cls.READ_MMAP_SIZE_MB < 0:
+            errors.append("READ_POOL_SIZE, READ_CACHE_SIZE_KB und READ_MMAP_SIZE_MB dürfen nicht negativ sein")
+        
+        if cls.SHARED_RECENT_PINGS < 1 or cls.SHARED_STATE_REFRESH <= 0:
+            errors.append("SHARED_RECENT_PINGS muss mindestens 1 und SHARED_STATE_REFRESH größer als 0 sein")
+        
+        for host, interval in cls.TARGETS:
+            if interval is not None and interval < cls.MIN_PING_INTERVAL:
+                errors.append(f"Intervall für Ziel {host} muss mindestens {cls.MIN_PING_INTERVAL} sein")
+        
         if errors:
             raise ValueError("Konfigurationsfehler: " + ", ".join(errors))
         
@@ -91,9 +287,23 @@ class Config:
         print(f"   Sekundärer Host: {cls.SECONDARY_HOST}")
         print(f"   Ping-Intervall: {cls.PING_INTERVAL}s")
         print(f"   Ping-Timeout: {cls.PING_TIMEOUT}s")
+        if cls.PROBE_BURST > 1:
+            print(f"   Burst: {cls.PROBE_BURST} Pings pro Intervall")
         print(f"   Failover-Schwellwert: {cls.FAILOVER_THRESHOLD}")
+        print(f"   Hedged Probing: {cls.HEDGE_MODE}")
+        print(f"   Zusätzliche Ziele: {len(cls.TARGETS)}")
         print(f"   Web-Server: {cls.WEB_HOST}:{cls.WEB_PORT}")
+        if cls.WEB_ROLE == 'reader':
+            print(f"   Web-Rolle: nur lesend ({cls.SHARED_STATE_PATH})")
+        elif cls.WEB_ROLE == 'collector':
+            print(f"   Web-Rolle: Collector ({cls.COLLECTOR_DIR})")
+        if cls.AGENT_COLLECTOR_URL:
+            print(f"   Agent: {cls.AGENT_NODE or socket.gethostname()} -> {cls.AGENT_COLLECTOR_URL}")
         print(f"   Datenbank: {cls.DATABASE_PATH}")
+        if cls.ENABLE_ARCHIVE:
+            print(f"   Archiv: {cls.ARCHIVE_DIR} (nach {cls.ARCHIVE_AFTER_DAYS} Tagen)")
+        channels = [name for name, enabled in (('E-Mail', cls.ENABLE_EMAIL_ALERTS), ('Webhook', cls.ALERT_WEBHOOK_URL)) if enabled]
+        print(f"   Benachrichtigungen: {', '.join(channels) or 'aus'}")
         print(f"   Log-Level: {cls.LOG_LEVEL}")
         print(f"   Debug-Modus: {cls.DEBUG_MODE}")
 
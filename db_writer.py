@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Gebündelte Datenbank-Schreibzugriffe für Ping Monitor
+Ein einzelner Writer-Thread sammelt Ping-Ergebnisse, Statistiken und
+Packet Loss Events in einer Queue und schreibt sie in einer Transaktion
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+import archive
+from partitions import ensure_partition, enforce_retention, list_partitions, partition_name
+from rollups import aggregate_rows, apply_rollups, SketchCache
+import metrics
+
+# Ende-Markierung für den Writer-Thread
+_STOP = object()
+
+def format_timestamp(ts):
+    """Formatiert einen Unix-Zeitstempel wie SQLite CURRENT_TIMESTAMP (UTC, mit ms)"""
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+def open_connection(db_path, timeout=30):
+    """Öffnet eine Schreibverbindung im WAL-Modus"""
+    conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+class DatabaseWriter:
+    """Write-Behind-Writer mit begrenzter Queue und Batch-Commits"""
+    
+    def __init__(self, db_path, batch_size=500, flush_interval_ms=1000, queue_size=100000, logger=None,
+                 retention_days=None, retention_interval=3600, archive_dir=None, mirror=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.logger = logger or logging.getLogger(__name__)
+        self.thread = None
+        self.sketches = SketchCache()
+        # Jitter pro Host über alle Batches fortschreiben (für die Rollups)
+        self.jitter = {}
+        
+        # Tagespartitionen und Aufbewahrung (None = Rohdaten unbegrenzt behalten)
+        self.partitions = set()
+        self.retention_days = retention_days
+        self.retention_interval = retention_interval
+        self.next_retention = 0.0
+        self.partitions_dropped = 0
+        # Mit Archiv werden nur bereits versiegelte Tage gelöscht
+        self.archive_dir = archive_dir
+        # Erhält jede Schreiboperation zusätzlich (z.B. AgentShipper.submit)
+        self.mirror = mirror
+        
+        # Kennzahlen
+        self.rows_written = 0
+        self.flush_count = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.last_flush_time = None
+        # Zählt erfolgreiche Schreibvorgänge; Leser erkennen daran neue Daten
+        self.generation = 0
+    
+    def start(self):
+        """Startet den Writer-Thread"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='db-writer', daemon=True)
+            self.thread.start()
+    
+    def submit(self, operation, *args):
+        """Legt eine Schreiboperation in die Queue (verwirft bei voller Queue)"""
+        if self.mirror is not None:
+            self.mirror(operation, args)
+        try:
+            self.queue.put_nowait((operation, args))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            metrics.DB_DROPPED.inc()
+            if self.dropped % 1000 == 1:
+                self.logger.warning(f"Datenbank-Queue voll, {self.dropped} Einträge verworfen")
+            return False
+    
+    def submit_ping(self, timestamp, host, success, response_time, packet_loss):
+        """Reiht ein Ping-Ergebnis ein"""
+        return self.submit('ping', timestamp, host, success, response_time, packet_loss)
+    
+    def submit_statistics(self, rows):
+        """Reiht Statistik-Zeilen (total, failed, loss, current_host, host, jitter_ms, mos) ein"""
+        return self.submit('statistics', rows)
+    
+    @staticmethod
+    def event_fields(event):
+        """Momentaufnahme der veränderlichen Event-Felder (Fehler, Schweregrad, Loss-Rate, Zuordnung)"""
+        return event['consecutive_failures'], event.get('severity'), event.get('loss_percent'), event.get('scope')
+    
+    def start_event(self, event):
+        """Reiht den Start eines Loss-Events ein; die ID wird beim Schreiben gesetzt"""
+        return self.submit('event_start', event, self.event_fields(event))
+    
+    def update_event(self, event):
+        """Reiht eine Aktualisierung ein (mehrere Updates werden zusammengefasst)"""
+        return self.submit('event_update', event, self.event_fields(event))
+    
+    def end_event(self, event, end_time, duration):
+        """Reiht das Ende eines Loss-Events ein"""
+        return self.submit('event_end', event, self.event_fields(event), end_time, int(duration))
+    
+    def run(self):
+        """Hauptschleife des Writer-Threads"""
+        conn = open_connection(self.db_path)
+        self.partitions = {name for _, name in list_partitions(conn)}
+        batch = []
+        deadline = None
+        stopping = False
+        
+        while not stopping:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+            except queue.Empty:
+                pass
+            
+            # Flush bei voller Batch, abgelaufener Frist oder beim Beenden
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self.flush(conn, batch)
+                batch = []
+                deadline = None
+            
+            # Aufbewahrung zwischen zwei Flushes im Writer-Thread durchsetzen
+            if self.retention_days and time.monotonic() >= self.next_retention and not stopping:
+                self.next_retention = time.monotonic() + self.retention_interval
+                self.apply_retention(conn)
+        
+        conn.close()
+    
+    def apply_retention(self, conn):
+        """Löscht Tagespartitionen außerhalb der Aufbewahrungsfrist"""
+        try:
+            sealed = None
+            if self.archive_dir:
+                sealed = lambda day: archive.is_sealed(self.archive_dir, day)
+            dropped = enforce_retention(conn, self.retention_days, sealed=sealed)
+            self.partitions.difference_update(dropped)
+            self.partitions_dropped += len(dropped)
+            if dropped:
+                self.generation += 1
+                self.logger.info(f"Aufbewahrung: {len(dropped)} Partitionen gelöscht ({', '.join(dropped)})")
+        except Exception as e:
+            self.errors += 1
+            metrics.DB_ERRORS.inc()
+            self.logger.error(f"Fehler bei der Datenbankbereinigung: {e}")
+    
+    def flush(self, conn, batch):
+        """Schreibt eine Batch in einer einzigen Transaktion"""
+        started = time.perf_counter()
+        ping_rows = []
+        statistics_rows = []
+        # Event-Updates pro Event zusammenfassen: id(event) -> (event, fields, end)
+        event_updates = {}
+        started_events = []
+        created_partitions = []
+        
+        try:
+            with conn:
+                cursor = conn.cursor()
+                for operation, args in batch:
+                    if operation == 'ping':
+                        ping_rows.append(args)
+                    elif operation == 'statistics':
+                        statistics_rows.extend(args[0])
+                    elif operation == 'event_start':
+                        event, fields = args
+                        cursor.execute('''
+                            INSERT INTO packet_loss_events
+                                (start_time, host, consecutive_failures, severity, loss_percent, scope, event_type)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ''', (event['start_time'], event['host']) + fields + (event.get('type', 'outage'),))
+                        event['id'] = cursor.lastrowid
+                        started_events.append(event)
+                    elif operation == 'event_update':
+                        event, fields = args
+                        previous = event_updates.get(id(event))
+                        event_updates[id(event)] = (event, fields, previous[2] if previous else None)
+                    elif operation == 'event_end':
+                        event, fields, end_time, duration = args
+                        event_updates[id(event)] = (event, fields, (end_time, duration))
+                
+                if ping_rows:
+                    # Nach UTC-Tag auf die Partitionen verteilen
+                    by_partition = {}
+                    for row in ping_rows:
+                        by_partition.setdefault(partition_name(row[0]), []).append(
+                            (format_timestamp(row[0]),) + row[1:])
+                    for partition, rows in by_partition.items():
+                        if partition not in self.partitions:
+                            ensure_partition(cursor, partition)
+                            created_partitions.append(partition)
+                        cursor.executemany(f'''
+                            INSERT INTO {partition} (timestamp, host, success, response_time, packet_loss_percent)
+                            VALUES (?, ?, ?, ?, ?)
+                        ''', rows)
+                    
+                    # Rollups und Quantil-Sketches in derselben Transaktion fortschreiben
+                    aggregates = aggregate_rows((row[:4] for row in ping_rows), self.jitter)
+                    apply_rollups(cursor, aggregates)
+                    self.sketches.apply(cursor, aggregates)
+                
+                if statistics_rows:
+                    cursor.executemany('''
+                        INSERT INTO statistics
+                            (total_pings, failed_pings, packet_loss_percent, current_host, host, jitter_ms, mos)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', statistics_rows)
+                
+                for event, fields, end in event_updates.values():
+                    if event.get('id') is None:
+                        continue
+                    if end:
+                        cursor.execute('''
+                            UPDATE packet_loss_events
+                            SET consecutive_failures = ?, severity = ?, loss_percent = ?, scope = ?,
+                                end_time = ?, duration_seconds = ?, is_active = 0
+                            WHERE id = ?
+                        ''', fields + (end[0], end[1], event['id']))
+                    else:
+                        cursor.execute('''
+                            UPDATE packet_loss_events
+                            SET consecutive_failures = ?, severity = ?, loss_percent = ?, scope = ?
+                            WHERE id = ?
+                        ''', fields + (event['id'],))
+            
+            self.partitions.update(created_partitions)
+            self.rows_written += len(ping_rows) + len(statistics_rows)
+            self.generation += 1
+            metrics.DB_ROWS.inc(len(ping_rows) + len(statistics_rows))
+        except Exception as e:
+            # Transaktion wurde zurückgerollt - vergebene IDs sind ungültig
+            for event in started_events:
+                event['id'] = None
+            self.sketches.invalidate()
+            self.errors += 1
+            metrics.DB_ERRORS.inc()
+            self.logger.error(f"Fehler beim Schreiben in die Datenbank ({len(batch)} Einträge): {e}")
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.DB_FLUSH_DURATION.observe(elapsed_ms / 1000)
+        self.flush_count += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+        self.last_flush_time = time.time()
+    
+    def close(self, timeout=10):
+        """Schreibt alle ausstehenden Einträge und beendet den Thread"""
+        if self.thread is None:
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            # Ohne Ende-Markierung endet der Thread nicht; als Daemon-Thread nicht weiter warten
+            self.logger.warning(f"Datenbank-Queue voll, Writer ohne Abschluss beendet, {self.queue.qsize()} Einträge offen")
+            self.thread = None
+            return
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            self.logger.warning(f"Datenbank-Writer nicht rechtzeitig beendet, {self.queue.qsize()} Einträge offen")
+        self.thread = None
+    
+    def get_stats(self):
+        """Gibt Kennzahlen des Writers zurück"""
+        return {
+            'queue_depth': self.queue.qsize(),
+            'generation': self.generation,
+            'rows_written': self.rows_written,
+            'flush_count': self.flush_count,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'avg_flush_ms': round(self.total_flush_ms / self.flush_count, 2) if self.flush_count else 0.0,
+            'max_flush_ms': round(self.max_flush_ms, 2),
+            'partitions': len(self.partitions),
+            'partitions_dropped': self.partitions_dropped,
+            'last_flush_time': self.last_flush_time
+        }
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Downsampling von Zeitreihen für Ping Monitor
+Verdichtet beliebig lange Reihen in einem Durchlauf auf höchstens N Punkte,
+gleichmäßig über den Zeitraum verteilt (Largest-Triangle-Three-Buckets oder
+Min/Max pro Bucket). Fehlschläge werden pro Bucket gezählt statt gemittelt,
+damit Loss-Spitzen sichtbar bleiben
+"""
+
+from db_writer import format_timestamp
+
+METHODS = ('lttb', 'minmax')
+
+class _Bucket:
+    """Zwischenstand eines Zeit-Buckets"""
+    
+    __slots__ = ('index', 'total', 'failed', 'rt_sum', 'rt_count', 'rt_min', 'rt_max', 'first', 'last', 'points')
+    
+    def __init__(self, index):
+        self.index = index
+        self.total = 0
+        self.failed = 0
+        self.rt_sum = 0.0
+        self.rt_count = 0
+        self.rt_min = None
+        self.rt_max = None
+        self.first = None
+        self.last = None
+        # Kandidaten (Zeit, Antwortzeit) für LTTB; (Zeit, Wert) von Minimum/Maximum für Min/Max
+        self.points = []
+
+class Downsampler:
+    """Verdichtet einen zeitlich sortierten Datenstrom auf höchstens points Punkte
+    
+    Eingaben sind Rohpings oder bereits verdichtete Rollup-Buckets; sie
+    werden per add() in aufsteigender Zeit übergeben, result() liefert die
+    Punkte im Format von /api/history.
+    """
+    
+    def __init__(self, start, end, points, method='lttb', host=None):
+        if method not in METHODS:
+            raise ValueError(f"Unbekannte Methode: {method}")
+        if points < 3:
+            raise ValueError("points muss mindestens 3 sein")
+        self.start = start
+        self.method = method
+        self.host = host
+        # Min/Max liefert bis zu zwei Punkte pro Bucket
+        self.bucket_count = points if method == 'lttb' else points // 2
+        self.width = max((end - start) / self.bucket_count, 1e-9)
+        self.current = None
+        self.pending = None
+        self.previous = None
+        self.output = []
+    
+    def add(self, timestamp, response_time, total=1, failed=0, rt_count=1, rt_min=None, rt_max=None):
+        """Nimmt einen Messpunkt auf (response_time=None ohne Antwortzeit)"""
+        index = min(max(int((timestamp - self.start) / self.width), 0), self.bucket_count - 1)
+        if self.current is None or index != self.current.index:
+            if self.current is not None:
+                self._close(self.current)
+            self.current = _Bucket(index)
+        
+        bucket = self.current
+        bucket.total += total
+        bucket.failed += failed
+        if bucket.first is None:
+            bucket.first = timestamp
+        bucket.last = timestamp
+        if response_time is None:
+            return
+        
+        bucket.rt_sum += response_time * rt_count
+        bucket.rt_count += rt_count
+        low = response_time if rt_min is None else rt_min
+        high = response_time if rt_max is None else rt_max
+        if self.method == 'lttb':
+            bucket.points.append((timestamp, response_time))
+            if bucket.rt_min is None or low < bucket.rt_min:
+                bucket.rt_min = low
+            if bucket.rt_max is None or high > bucket.rt_max:
+                bucket.rt_max = high
+        else:
+            if bucket.rt_min is None or low < bucket.rt_min:
+                bucket.rt_min = low
+                bucket.points[0:1] = [(timestamp, low)]
+            if bucket.rt_max is None or high > bucket.rt_max:
+                bucket.rt_max = high
+                if len(bucket.points) < 2:
+                    bucket.points.append((timestamp, high))
+                else:
+                    bucket.points[1] = (timestamp, high)
+    
+    def _close(self, bucket):
+        """Bucket ist vollständig - bei LTTB wird der vorherige Bucket ausgewählt"""
+        if self.method == 'minmax':
+            self._emit_minmax(bucket)
+            return
+        if self.pending is not None:
+            self._select(self.pending, bucket)
+        self.pending = bucket
+    
+    def _select(self, bucket, following):
+        """Wählt den Punkt mit der größten Dreiecksfläche zu Vorgänger und Folge-Bucket"""
+        if not bucket.points:
+            self._emit(bucket, (bucket.first + bucket.last) / 2, None)
+            return
+        
+        if following is not None and following.rt_count:
+            next_x = (following.first + following.last) / 2
+            next_y = following.rt_sum / following.rt_count
+        elif following is not None and following.points:
+            next_x, next_y = following.points[-1]
+        else:
+            next_x, next_y = bucket.points[-1]
+        
+        if self.previous is None:
+            # Erster Bucket: ersten Punkt behalten wie beim klassischen LTTB
+            chosen = bucket.points[0]
+        else:
+            prev_x, prev_y = self.previous
+            chosen = None
+            largest = -1.0
+            for x, y in bucket.points:
+                area = abs((prev_x - next_x) * (y - prev_y) - (prev_x - x) * (next_y - prev_y))
+                if area > largest:
+                    largest = area
+                    chosen = (x, y)
+        self.previous = chosen
+        self._emit(bucket, *chosen)
+    
+    def _emit_minmax(self, bucket):
+        if not bucket.points:
+            self._emit(bucket, (bucket.first + bucket.last) / 2, None)
+            return
+        # Minimum und Maximum können derselbe Punkt sein
+        for x, y in sorted(set(bucket.points)):
+            self._emit(bucket, x, y)
+    
+    def _emit(self, bucket, timestamp, response_time):
+        self.output.append({
+            'timestamp': format_timestamp(timestamp),
+            'host': self.host,
+            'success': bucket.failed == 0,
+            'response_time': round(response_time, 3) if response_time is not None else None,
+            'packet_loss_percent': (bucket.failed / bucket.total * 100) if bucket.total else 0,
+            'total_pings': bucket.total,
+            'failed_pings': bucket.failed,
+            'min_response_time': bucket.rt_min,
+            'max_response_time': bucket.rt_max
+        })
+    
+    def result(self):
+        """Schließt den Datenstrom ab und liefert die Punkte (neueste zuerst)"""
+        if self.current is not None:
+            self._close(self.current)
+            self.current = None
+        if self.pending is not None:
+            # Letzter Bucket: letzten Punkt behalten
+            bucket = self.pending
+            self.pending = None
+            if bucket.points:
+                self.previous = bucket.points[-1]
+                self._emit(bucket, *bucket.points[-1])
+            else:
+                self._emit(bucket, (bucket.first + bucket.last) / 2, None)
+        return self.output[::-1]
+
+def choose_source(seconds, points):
+    """Gröbste Rollup-Auflösung mit mindestens einem Bucket pro Ausgabepunkt, sonst 'raw'"""
+    from rollups import RESOLUTIONS
+    for resolution, size in RESOLUTIONS.items():
+        if size <= seconds / points:
+            return resolution
+    return 'raw'
+
+def downsample_raw(rows, start, end, points, method='lttb', host=None):
+    """Verdichtet Rohpings (Zeit, Erfolg, Antwortzeit) in aufsteigender Zeit"""
+    sampler = Downsampler(start, end, points, method, host)
+    for timestamp, success, response_time in rows:
+        if success:
+            sampler.add(timestamp, response_time)
+        else:
+            sampler.add(timestamp, None, failed=1)
+    return sampler.result()
+
+def downsample_buckets(rows, start, end, points, method='lttb', host=None):
+    """Verdichtet Rollup-Buckets (Beginn, Pings, Fehler, Summe, Anzahl, Min, Max)"""
+    sampler = Downsampler(start, end, points, method, host)
+    for bucket_start, total, failed, rt_sum, rt_count, rt_min, rt_max in rows:
+        average = rt_sum / rt_count if rt_count else None
+        sampler.add(bucket_start, average, total, failed, rt_count, rt_min, rt_max)
+    return sampler.result()
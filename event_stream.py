@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events für Ping Monitor
+Ein Publisher nimmt Ereignisse aus der Monitor-Schleife entgegen und hält
+die letzten N in einem Ringpuffer; beliebig viele Abonnenten lesen daraus
+in ihrem eigenen Tempo und können per Last-Event-ID fortsetzen
+"""
+
+import json
+import threading
+from collections import deque
+
+class EventPublisher:
+    """Verteilt Ereignisse an beliebig viele SSE-Abonnenten"""
+    
+    def __init__(self, buffer_size=1000, max_subscribers=100):
+        # Ringpuffer aus (id, typ, host, json) - jedes Ereignis wird nur einmal serialisiert
+        self.events = deque(maxlen=buffer_size)
+        self.next_id = 1
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self.condition = threading.Condition()
+        # Gesetzt, sobald der Monitor stoppt; offene Streams enden dann
+        self.closed = False
+    
+    def publish(self, event_type, data, host=None):
+        """Veröffentlicht ein Ereignis an alle Abonnenten"""
+        payload = json.dumps(data, default=str)
+        with self.condition:
+            self.events.append((self.next_id, event_type, host, payload))
+            self.next_id += 1
+            self.condition.notify_all()
+    
+    def close(self):
+        """Beendet alle offenen Streams (weckt wartende Abonnenten)"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+    
+    def events_after(self, last_id):
+        """Liefert (Ereignisse nach last_id, verpasst) - verpasst=True wenn der Puffer überholt hat"""
+        with self.condition:
+            if not self.events:
+                return [], False
+            oldest = self.events[0][0]
+            newest = self.events[-1][0]
+            # Client ist zu weit zurück oder stammt aus einem früheren Prozess
+            if last_id is not None and (last_id < oldest - 1 or last_id > newest):
+                return [], True
+            if last_id is None or last_id >= newest:
+                return [], False
+            start = len(self.events) - (newest - last_id)
+            return [self.events[i] for i in range(start, len(self.events))], False
+    
+    def try_subscribe(self):
+        """Reserviert einen Abonnenten-Platz"""
+        with self.condition:
+            if self.subscribers >= self.max_subscribers:
+                return False
+            self.subscribers += 1
+            return True
+    
+    def unsubscribe(self):
+        """Gibt einen Abonnenten-Platz wieder frei"""
+        with self.condition:
+            self.subscribers -= 1
+    
+    def stream(self, last_id=None, host=None, heartbeat=15.0, running=lambda: True):
+        """Generator für eine SSE-Verbindung (Platz vorher per try_subscribe reservieren)"""
+        # Neue Verbindungen beginnen beim aktuellen Stand
+        if last_id is None:
+            with self.condition:
+                last_id = self.next_id - 1
+        yield 'retry: 3000\n\n'
+        
+        while running() and not self.closed:
+            events, missed = self.events_after(last_id)
+            if missed:
+                # Langsamer Client: statt zu puffern auf den aktuellen Stand springen
+                with self.condition:
+                    last_id = self.next_id - 1
+                yield f'id: {last_id}\nevent: resync\ndata: {{}}\n\n'
+                continue
+            
+            if not events:
+                with self.condition:
+                    if self.next_id - 1 <= last_id and not self.closed:
+                        notified = self.condition.wait(heartbeat)
+                    else:
+                        notified = True
+                if not notified:
+                    yield ': heartbeat\n\n'
+                continue
+            
+            chunk = []
+            for event_id, event_type, event_host, payload in events:
+                last_id = event_id
+                if host and event_host != host:
+                    continue
+                chunk.append(f'id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n')
+            if chunk:
+                yield ''.join(chunk)
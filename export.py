@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Massenexport für Ping Monitor
+Streamt Rohdaten oder Rollups als CSV oder NDJSON in Blöcken aus einem
+Datenbank-Cursor, optional gzip-komprimiert. Der Speicherbedarf hängt
+nicht von der Länge des Zeitraums ab
+"""
+
+import csv
+import io
+import json
+import sqlite3
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+import archive
+import partitions
+import rollups
+
+FORMATS = ('csv', 'ndjson')
+GRANULARITIES = ('raw', '1m', '1h', '1d')
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+RAW_COLUMNS = ('timestamp', 'host', 'success', 'response_time', 'packet_loss_percent')
+BUCKET_COLUMNS = ('timestamp', 'host', 'total_pings', 'failed_pings', 'packet_loss_percent',
+                  'avg_response_time', 'min_response_time', 'max_response_time')
+
+# Ausgabe in Blöcken dieser Größe (Bytes vor der Komprimierung)
+CHUNK_SIZE = 64 * 1024
+
+def parse_time(value):
+    """Unix-Zeitstempel oder ISO-Datum (ohne Zeitzone als UTC) in Sekunden"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+def iter_records(conn, granularity, start, end, host=None, archive_dir=None):
+    """Liefert die Zeilen des Zeitraums aufsteigend als Tupel passend zu columns(granularity)
+    
+    Mit archive_dir werden Rohdaten vor der ältesten Partition aus dem Archiv gelesen.
+    """
+    if granularity == 'raw':
+        if archive_dir:
+            from db_writer import format_timestamp
+            for timestamp, host_name, success, response_time, loss in archive.iter_before_database(
+                conn, archive_dir, start, end, host
+            ):
+                yield format_timestamp(timestamp), host_name, success, response_time, loss
+        for row in partitions.iter_rows(conn, ', '.join(RAW_COLUMNS), start=start, end=end, host=host):
+            yield row[0], row[1], bool(row[2]), row[3], row[4]
+        return
+    
+    for row in rollups.iter_series(conn, start, end, granularity, host):
+        host_name, bucket_start, total, failed, response_sum, response_count, minimum, maximum = row
+        yield (
+            rollups.format_bucket(bucket_start), host_name, total, failed,
+            round(failed / total * 100, 3) if total else 0.0,
+            round(response_sum / response_count, 3) if response_count else None,
+            minimum, maximum
+        )
+
+def columns(granularity):
+    """Spaltennamen einer Granularität"""
+    return RAW_COLUMNS if granularity == 'raw' else BUCKET_COLUMNS
+
+def encode_csv(names, records, chunk_size=CHUNK_SIZE):
+    """CSV mit Kopfzeile in Blöcken von etwa chunk_size Bytes"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(names)
+    for record in records:
+        writer.writerow(record)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def encode_ndjson(names, records, chunk_size=CHUNK_SIZE):
+    """Ein JSON-Objekt pro Zeile in Blöcken von etwa chunk_size Bytes"""
+    lines = []
+    size = 0
+    for record in records:
+        line = json.dumps(dict(zip(names, record)), separators=(',', ':')) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+            size = 0
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+}
+
+def gzip_chunks(chunks, level=6):
+    """Komprimiert einen Block-Strom fortlaufend im gzip-Format"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_export(db_path, fmt, granularity, start, end, host=None, compress=False, archive_dir=None):
+    """Erzeugt den Export als Block-Strom mit eigener Verbindung (schließt sie am Ende)"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unbekanntes Format: {fmt}")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unbekannte Granularität: {granularity}")
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        chunks = ENCODERS[fmt](columns(granularity), iter_records(conn, granularity, start, end, host, archive_dir))
+        if compress:
+            chunks = gzip_chunks(chunks)
+        yield from chunks
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    # Aufruf: python3 export.py csv|ndjson [datenbank] [stunden] [raw|1m|1h|1d] [host] > datei
+    if len(sys.argv) < 2 or sys.argv[1] not in FORMATS:
+        print("Verwendung: python3 export.py csv|ndjson [datenbank] [stunden] [raw|1m|1h|1d] [host]")
+        sys.exit(1)
+    
+    from config import Config
+    db_path = sys.argv[2] if len(sys.argv) > 2 else Config.DATABASE_PATH
+    hours = float(sys.argv[3]) if len(sys.argv) > 3 else 24
+    granularity = sys.argv[4] if len(sys.argv) > 4 else 'raw'
+    host = sys.argv[5] if len(sys.argv) > 5 else None
+    
+    end = time.time()
+    archive_dir = Config.ARCHIVE_DIR if Config.ENABLE_ARCHIVE else None
+    for chunk in stream_export(db_path, sys.argv[1], granularity, end - hours * 3600, end, host,
+                               archive_dir=archive_dir):
+        sys.stdout.buffer.write(chunk)
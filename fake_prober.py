@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Simulierter Prober für Benchmarks und Tests ohne Netzwerk
+Liefert Antwortzeiten aus einer konfigurierbaren Verteilung, zufällige
+Verluste und geplante Ausfälle; Schnittstelle wie IcmpProber
+"""
+
+import asyncio
+import random
+import time
+
+# Verteilungen der Antwortzeit: Name -> Funktion(rng, Mittelwert, Streuung)
+DISTRIBUTIONS = {
+    'constant': lambda rng, mean, spread: mean,
+    'normal': lambda rng, mean, spread: max(0.01, rng.gauss(mean, spread)),
+    'lognormal': lambda rng, mean, spread: mean * rng.lognormvariate(0, spread / mean),
+    'uniform': lambda rng, mean, spread: max(0.01, rng.uniform(mean - spread, mean + spread)),
+}
+
+class FakeProber:
+    """Prober ohne Netzwerkzugriff mit reproduzierbarem Verhalten (Seed)
+    
+    Ausfälle sind (Beginn, Dauer) in Sekunden relativ zum Start, optional
+    pro Host; outage_every/outage_duration erzeugen periodische Ausfälle.
+    """
+    
+    method = 'fake'
+    
+    def __init__(self, distribution='lognormal', rtt_mean=20.0, rtt_spread=5.0, loss_rate=0.0,
+                 outages=None, outage_every=None, outage_duration=0.0, sleep=True, seed=None, clock=time.monotonic):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unbekannte Verteilung: {distribution}")
+        if rtt_mean <= 0:
+            raise ValueError("rtt_mean muss größer als 0 sein")
+        self.sample = DISTRIBUTIONS[distribution]
+        self.rtt_mean = rtt_mean
+        self.rtt_spread = rtt_spread
+        self.loss_rate = loss_rate
+        # Liste von (Beginn, Dauer) oder Dict Host -> Liste
+        self.outages = outages or []
+        self.outage_every = outage_every
+        self.outage_duration = outage_duration
+        self.sleep = sleep
+        self.timeout = 3
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.started = clock()
+        
+        # Kennzahlen
+        self.probes = 0
+        self.lost = 0
+    
+    def in_outage(self, host, now=None):
+        """Prüft, ob ein Host gerade ausgefallen ist"""
+        elapsed = (self.clock() if now is None else now) - self.started
+        if self.outage_every and elapsed % self.outage_every < self.outage_duration:
+            return True
+        outages = self.outages.get(host, []) if isinstance(self.outages, dict) else self.outages
+        return any(start <= elapsed < start + duration for start, duration in outages)
+    
+    def result(self, host):
+        """Würfelt das Ergebnis eines Pings: (Erfolg, Antwortzeit in ms)"""
+        self.probes += 1
+        if self.in_outage(host) or self.rng.random() < self.loss_rate:
+            self.lost += 1
+            return False, None
+        return True, round(self.sample(self.rng, self.rtt_mean, self.rtt_spread), 3)
+    
+    def ping(self, host, timeout=None):
+        """Simulierter Ping (blockierend)"""
+        success, response_time = self.result(host)
+        if self.sleep:
+            time.sleep(response_time / 1000 if success else (timeout or self.timeout))
+        return success, response_time
+    
+    async def ping_async(self, host, timeout=None):
+        """Simulierter Ping im Event-Loop"""
+        success, response_time = self.result(host)
+        if self.sleep:
+            await asyncio.sleep(response_time / 1000 if success else (timeout or self.timeout))
+        return success, response_time
+    
+    def remove_readers(self):
+        pass
+    
+    def close(self):
+        pass
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Hedged Probing für Ping Monitor
+Gesundheitswerte pro Host (geglättete Erfolgsquote) für einen Failover
+innerhalb eines Intervalls, Wartezeit bis zum Absicherungs-Ping aus dem
+Latenz-Perzentil und Zuordnung von Ausfällen zum Ziel oder zum ganzen Pfad
+"""
+
+# Nur der gepingte Host antwortet nicht / auch der andere Host antwortet nicht
+SCOPE_TARGET = 'target'
+SCOPE_PATH = 'path'
+
+class HealthScores:
+    """Gesundheitswert pro Host zwischen 0 (antwortet nicht) und 1 (antwortet)
+    
+    Jeder Ping verschiebt den Wert um den Anteil alpha in Richtung 0 bzw. 1.
+    """
+    
+    def __init__(self, hosts, alpha=0.5):
+        self.alpha = alpha
+        self.scores = {host: 1.0 for host in hosts}
+    
+    def update(self, host, success):
+        """Nimmt ein Ping-Ergebnis eines Hosts auf und liefert dessen neuen Wert"""
+        score = self.scores.get(host, 1.0)
+        score += self.alpha * ((1.0 if success else 0.0) - score)
+        self.scores[host] = score
+        return score
+    
+    def better(self, current, margin):
+        """Host, der um mindestens margin gesünder ist als current (sonst None)"""
+        best = max(self.scores, key=self.scores.get)
+        if best != current and self.scores[best] - self.scores.get(current, 1.0) >= margin:
+            return best
+        return None
+    
+    def snapshot(self):
+        """Werte für /api/stats"""
+        return {host: round(score, 3) for host, score in self.scores.items()}
+
+def hedge_delay(sketch, quantile, minimum, maximum, min_samples=20):
+    """Wartezeit in Sekunden bis zum Absicherungs-Ping
+    
+    Entspricht dem Latenz-Perzentil des Ziels, begrenzt auf [minimum, maximum];
+    ohne ausreichend Messwerte wird maximum verwendet.
+    """
+    if sketch.count < min_samples:
+        return maximum
+    value = sketch.quantile(quantile)
+    if value is None:
+        return maximum
+    return min(max(value / 1000, minimum), maximum)
+
+def attribute(alternate_success):
+    """Zuordnung eines fehlgeschlagenen Pings anhand des anderen Hosts (None: nicht gepingt)"""
+    if alternate_success is None:
+        return None
+    return SCOPE_TARGET if alternate_success else SCOPE_PATH
+
+def merge_scope(current, scope):
+    """Zuordnung eines Events: 'path', sobald einmal beide Hosts nicht geantwortet haben"""
+    if current == SCOPE_PATH or scope is None:
+        return current
+    return scope
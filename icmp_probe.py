@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+ICMP-Echo-Engine für Ping Monitor
+Sendet Echo-Requests direkt aus dem Prozess über dauerhaft geöffnete Sockets,
+statt für jeden Ping einen `ping`-Prozess zu starten
+"""
+
+import asyncio
+import os
+import select
+import socket
+import struct
+import threading
+import time
+
+# ICMP-Typen
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP6_ECHO_REQUEST = 128
+ICMP6_ECHO_REPLY = 129
+
+# Nutzdaten wie beim Linux-ping (56 Bytes)
+PAYLOAD_SIZE = 56
+
+
+def checksum(data):
+    """Berechnet die Internet-Prüfsumme (RFC 1071)"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(identifier, sequence, family=socket.AF_INET):
+    """Erstellt ein ICMP-Echo-Request-Paket"""
+    icmp_type = ICMP6_ECHO_REQUEST if family == socket.AF_INET6 else ICMP_ECHO_REQUEST
+    payload = struct.pack('!Q', time.monotonic_ns()).ljust(PAYLOAD_SIZE, b'\x00')
+    header = struct.pack('!BBHHH', icmp_type, 0, 0, identifier, sequence)
+    # Bei ICMPv6 berechnet der Kernel die Prüfsumme (Pseudo-Header)
+    if family == socket.AF_INET6:
+        return header + payload
+    header = struct.pack('!BBHHH', icmp_type, 0, checksum(header + payload), identifier, sequence)
+    return header + payload
+
+
+def parse_echo_reply(packet, family=socket.AF_INET, raw=True):
+    """Liest (identifier, sequence) aus einer Echo-Reply, sonst None"""
+    # Raw-IPv4-Sockets liefern den IP-Header mit
+    if raw and family == socket.AF_INET:
+        if len(packet) < 20:
+            return None
+        packet = packet[(packet[0] & 0x0F) * 4:]
+    if len(packet) < 8:
+        return None
+    icmp_type, code, _, identifier, sequence = struct.unpack('!BBHHH', packet[:8])
+    expected = ICMP6_ECHO_REPLY if family == socket.AF_INET6 else ICMP_ECHO_REPLY
+    if icmp_type != expected or code != 0:
+        return None
+    return identifier, sequence
+
+
+class IcmpSocket:
+    """Dauerhaft geöffneter ICMP-Socket für eine Adressfamilie"""
+    
+    def __init__(self, family):
+        self.family = family
+        proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+        try:
+            # Mit CAP_NET_RAW (root) Raw-Socket verwenden
+            self.sock = socket.socket(family, socket.SOCK_RAW, proto)
+            self.raw = True
+        except PermissionError:
+            # Unprivilegierter ICMP-Socket (net.ipv4.ping_group_range)
+            self.sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+            self.raw = False
+        self.sock.setblocking(False)
+        
+        if self.raw:
+            self.identifier = os.getpid() & 0xFFFF
+        else:
+            # Bei Datagram-Sockets setzt der Kernel die ID auf den lokalen Port
+            self.sock.bind(('::', 0) if family == socket.AF_INET6 else ('0.0.0.0', 0))
+            self.identifier = self.sock.getsockname()[1]
+    
+    def fileno(self):
+        return self.sock.fileno()
+    
+    def close(self):
+        self.sock.close()
+
+
+class IcmpProber:
+    """Pingt Hosts über wiederverwendete ICMP-Sockets
+    
+    `ping` blockiert bis zur Antwort, `ping_async` wartet im Event-Loop und
+    erlaubt beliebig viele gleichzeitige Pings. Eine Instanz sollte nur eine
+    der beiden Varianten verwenden, da beide dieselben Sockets lesen.
+    """
+    
+    # Bezeichnung für Metriken
+    method = 'icmp'
+    
+    def __init__(self, timeout=3):
+        self.timeout = timeout
+        self._sockets = {}
+        self._addresses = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+        # Offene asynchrone Pings: (Adresse, Sequenz) -> Future
+        self._pending = {}
+        self._readers = set()
+    
+    @classmethod
+    def create(cls, timeout=3):
+        """Erstellt einen Prober, oder None falls keine ICMP-Sockets erlaubt sind"""
+        prober = cls(timeout)
+        try:
+            prober._get_socket(socket.AF_INET)
+        except OSError:
+            return None
+        return prober
+    
+    def _get_socket(self, family):
+        """Liefert den Socket für eine Adressfamilie (wird einmalig geöffnet)"""
+        icmp_socket = self._sockets.get(family)
+        if icmp_socket is None:
+            icmp_socket = IcmpSocket(family)
+            self._sockets[family] = icmp_socket
+        return icmp_socket
+    
+    def resolve(self, host):
+        """Löst einen Host einmalig auf und merkt sich die Adresse"""
+        address = self._addresses.get(host)
+        if address is None:
+            family, _, _, _, sockaddr = socket.getaddrinfo(host, None, type=socket.SOCK_DGRAM)[0]
+            address = (family, sockaddr[0])
+            self._addresses[host] = address
+        return address
+    
+    async def resolve_async(self, host):
+        """Löst einen Host ohne Blockieren des Event-Loops auf"""
+        address = self._addresses.get(host)
+        if address is None:
+            loop = asyncio.get_running_loop()
+            infos = await loop.getaddrinfo(host, None, type=socket.SOCK_DGRAM)
+            family, _, _, _, sockaddr = infos[0]
+            address = (family, sockaddr[0])
+            self._addresses[host] = address
+        return address
+    
+    def next_sequence(self):
+        """Liefert die nächste 16-Bit-Sequenznummer"""
+        self._sequence = (self._sequence + 1) & 0xFFFF
+        return self._sequence
+    
+    def ping(self, host, timeout=None):
+        """Sendet einen Echo-Request und wartet auf die passende Antwort"""
+        timeout = self.timeout if timeout is None else timeout
+        family, address = self.resolve(host)
+        
+        with self._lock:
+            icmp_socket = self._get_socket(family)
+            sequence = self.next_sequence()
+            packet = build_echo_request(icmp_socket.identifier, sequence, family)
+            
+            sent_ns = time.monotonic_ns()
+            deadline_ns = sent_ns + int(timeout * 1e9)
+            icmp_socket.sock.sendto(packet, (address, 0))
+            
+            while True:
+                remaining = (deadline_ns - time.monotonic_ns()) / 1e9
+                if remaining <= 0:
+                    return False, None
+                readable, _, _ = select.select([icmp_socket], [], [], remaining)
+                if not readable:
+                    return False, None
+                
+                try:
+                    data, source = icmp_socket.sock.recvfrom(2048)
+                except BlockingIOError:
+                    continue
+                received_ns = time.monotonic_ns()
+                
+                # Raw-Sockets sehen alle ICMP-Pakete des Systems - nur eigene Antworten zählen
+                reply = parse_echo_reply(data, family, icmp_socket.raw)
+                if reply is None or source[0] != address:
+                    continue
+                identifier, reply_sequence = reply
+                if reply_sequence != sequence:
+                    continue
+                if icmp_socket.raw and identifier != icmp_socket.identifier:
+                    continue
+                
+                return True, round((received_ns - sent_ns) / 1e6, 3)
+    
+    async def ping_async(self, host, timeout=None):
+        """Sendet einen Echo-Request und wartet asynchron auf die Antwort"""
+        timeout = self.timeout if timeout is None else timeout
+        family, address = await self.resolve_async(host)
+        loop = asyncio.get_running_loop()
+        
+        icmp_socket = self._get_socket(family)
+        if family not in self._readers:
+            loop.add_reader(icmp_socket.fileno(), self._read_replies, icmp_socket)
+            self._readers.add(family)
+        
+        sequence = self.next_sequence()
+        key = (address, sequence)
+        future = loop.create_future()
+        self._pending[key] = future
+        packet = build_echo_request(icmp_socket.identifier, sequence, family)
+        
+        try:
+            sent_ns = time.monotonic_ns()
+            icmp_socket.sock.sendto(packet, (address, 0))
+            received_ns = await asyncio.wait_for(future, timeout)
+            return True, round((received_ns - sent_ns) / 1e6, 3)
+        except (asyncio.TimeoutError, BlockingIOError):
+            return False, None
+        finally:
+            self._pending.pop(key, None)
+    
+    def _read_replies(self, icmp_socket):
+        """Liest alle anstehenden Antworten und ordnet sie den wartenden Pings zu"""
+        while True:
+            try:
+                data, source = icmp_socket.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            received_ns = time.monotonic_ns()
+            
+            reply = parse_echo_reply(data, icmp_socket.family, icmp_socket.raw)
+            if reply is None:
+                continue
+            identifier, sequence = reply
+            if icmp_socket.raw and identifier != icmp_socket.identifier:
+                continue
+            future = self._pending.get((source[0], sequence))
+            if future is not None and not future.done():
+                future.set_result(received_ns)
+    
+    def remove_readers(self):
+        """Meldet die Sockets vom laufenden Event-Loop ab"""
+        loop = asyncio.get_running_loop()
+        for family in self._readers:
+            loop.remove_reader(self._sockets[family].fileno())
+        self._readers.clear()
+    
+    def close(self):
+        """Schließt alle Sockets"""
+        with self._lock:
+            for icmp_socket in self._sockets.values():
+                icmp_socket.close()
+            self._sockets.clear()
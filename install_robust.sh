@@ -28,6 +28,29 @@ REQUIRED_FILES=(
     "ping_monitor.py"
     "web_interface.py" 
     "config.py"
+    "call_quality.py"
+    "read_pool.py"
+    "collector.py"
+    "agent.py"
+    "archive.py"
+    "log_setup.py"
+    "alerts.py"
+    "hedging.py"
+    "report.py"
+    "loss_detector.py"
+    "export.py"
+    "shared_state.py"
+    "metrics.py"
+    "response_cache.py"
+    "downsample.py"
+    "ring_buffer.py"
+    "partitions.py"
+    "event_stream.py"
+    "latency_sketch.py"
+    "rolling_stats.py"
+    "rollups.py"
+    "db_writer.py"
+    "icmp_probe.py"
     "templates/index.html"
 )
 
@@ -55,6 +78,29 @@ echo "📋 Kopiere Dateien..."
 cp "$SCRIPT_DIR/ping_monitor.py" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/web_interface.py" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/config.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/call_quality.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/read_pool.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/collector.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/agent.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/archive.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/log_setup.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/alerts.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/hedging.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/report.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/loss_detector.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/export.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/shared_state.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/metrics.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/response_cache.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/downsample.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/ring_buffer.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/partitions.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/event_stream.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/latency_sketch.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/rolling_stats.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/rollups.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/db_writer.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/icmp_probe.py" "$INSTALL_DIR/"
 cp -r "$SCRIPT_DIR/templates" "$INSTALL_DIR/"
 
 # requirements.txt erstellen (falls nicht vorhanden)
@@ -214,6 +260,29 @@ REQUIRED_FILES=(
     "ping_monitor.py"
     "web_interface.py" 
     "config.py"
+    "call_quality.py"
+    "read_pool.py"
+    "collector.py"
+    "agent.py"
+    "archive.py"
+    "log_setup.py"
+    "alerts.py"
+    "hedging.py"
+    "report.py"
+    "loss_detector.py"
+    "export.py"
+    "shared_state.py"
+    "metrics.py"
+    "response_cache.py"
+    "downsample.py"
+    "ring_buffer.py"
+    "partitions.py"
+    "event_stream.py"
+    "latency_sketch.py"
+    "rolling_stats.py"
+    "rollups.py"
+    "db_writer.py"
+    "icmp_probe.py"
     "templates/index.html"
 )
 
@@ -241,6 +310,29 @@ echo "📋 Kopiere Dateien..."
 cp "$SCRIPT_DIR/ping_monitor.py" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/web_interface.py" "$INSTALL_DIR/"
 cp "$SCRIPT_DIR/config.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/call_quality.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/read_pool.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/collector.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/agent.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/archive.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/log_setup.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/alerts.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/hedging.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/report.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/loss_detector.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/export.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/shared_state.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/metrics.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/response_cache.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/downsample.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/ring_buffer.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/partitions.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/event_stream.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/latency_sketch.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/rolling_stats.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/rollups.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/db_writer.py" "$INSTALL_DIR/"
+cp "$SCRIPT_DIR/icmp_probe.py" "$INSTALL_DIR/"
 cp -r "$SCRIPT_DIR/templates" "$INSTALL_DIR/"
 
 # requirements.txt erstellen (falls nicht vorhanden)
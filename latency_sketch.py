@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Quantil-Sketch für Antwortzeiten
+Logarithmisches Histogramm mit fester relativer Genauigkeit (DDSketch-Prinzip):
+feste Speichergröße, serialisierbar und verlustfrei zusammenführbar
+"""
+
+import math
+import struct
+
+# Format-Version der Serialisierung
+_VERSION = 1
+_HEADER = struct.Struct('<BdII')
+_ENTRY = struct.Struct('<HI')
+
+class LatencySketch:
+    """Mergebarer Quantil-Sketch für Antwortzeiten in ms"""
+    
+    def __init__(self, relative_accuracy=0.01, min_value=0.001, max_value=600000.0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        # Indexbereich ist durch min/max begrenzt -> feste Obergrenze für den Speicher
+        self.offset = self._raw_index(min_value)
+        self.max_index = self._raw_index(max_value) - self.offset
+        self.counts = {}
+        self.zero_count = 0
+        self.count = 0
+    
+    def _raw_index(self, value):
+        return int(math.ceil(math.log(value) / self.log_gamma))
+    
+    def add(self, value, count=1):
+        """Nimmt einen Messwert auf"""
+        self.count += count
+        if value <= self.min_value:
+            self.zero_count += count
+            return
+        index = min(self._raw_index(value) - self.offset, self.max_index)
+        self.counts[index] = self.counts.get(index, 0) + count
+    
+    def merge(self, other):
+        """Führt einen anderen Sketch mit gleicher Genauigkeit hinzu"""
+        if other.gamma != self.gamma or other.offset != self.offset:
+            raise ValueError("Sketches mit unterschiedlicher Genauigkeit können nicht zusammengeführt werden")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+    
+    def quantile(self, q):
+        """Schätzt das q-Quantil (0..1), None bei leerem Sketch"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                # Mittelpunkt des Buckets (relativer Fehler <= relative_accuracy)
+                return 2 * self.gamma ** (index + self.offset) / (self.gamma + 1)
+        return 2 * self.gamma ** (max(self.counts) + self.offset) / (self.gamma + 1)
+    
+    def percentiles(self, digits=2):
+        """Liefert p50/p95/p99"""
+        result = {}
+        for name, q in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+            value = self.quantile(q)
+            result[name] = round(value, digits) if value is not None else None
+        return result
+    
+    def to_bytes(self):
+        """Serialisiert den Sketch für die Datenbank"""
+        parts = [_HEADER.pack(_VERSION, self.relative_accuracy, self.zero_count, len(self.counts))]
+        for index in sorted(self.counts):
+            parts.append(_ENTRY.pack(index, self.counts[index]))
+        return b''.join(parts)
+    
+    @classmethod
+    def from_bytes(cls, data):
+        """Liest einen serialisierten Sketch"""
+        version, relative_accuracy, zero_count, entries = _HEADER.unpack_from(data, 0)
+        if version != _VERSION:
+            raise ValueError(f"Unbekannte Sketch-Version: {version}")
+        sketch = cls(relative_accuracy)
+        sketch.zero_count = zero_count
+        sketch.count = zero_count
+        position = _HEADER.size
+        for _ in range(entries):
+            index, count = _ENTRY.unpack_from(data, position)
+            position += _ENTRY.size
+            sketch.counts[index] = count
+            sketch.count += count
+        return sketch
+    
+    @classmethod
+    def merge_all(cls, blobs):
+        """Führt serialisierte Sketches zusammen (leere Einträge werden übersprungen)"""
+        merged = cls()
+        for blob in blobs:
+            if blob:
+                merged.merge(cls.from_bytes(blob))
+        return merged
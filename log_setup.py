@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Logging für Ping Monitor
+Log-Einträge gehen über eine begrenzte Queue an einen Hintergrund-Thread,
+der in eine rotierende Datei und auf stderr schreibt; der Ping-Pfad wartet
+nie auf Datei- oder journald-Schreibzugriffe. Erfolgreiche Pings werden zu
+periodischen Zusammenfassungen gebündelt
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+import metrics
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, der bei voller Queue verwirft und mitzählt statt zu blockieren"""
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_DROPPED.inc()
+
+_listener = None
+
+def setup_logging(log_file, level='INFO', max_bytes=10 * 1024 * 1024, backup_count=5, queue_size=10000):
+    """Richtet das Root-Logging über Queue und Listener-Thread ein (mehrfacher Aufruf ohne Wirkung)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+    
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    try:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        ))
+    except OSError as e:
+        print(f"⚠️ Log-Datei {log_file} nicht beschreibbar: {e}")
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(getattr(logging, level.upper()))
+    
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def shutdown_logging():
+    """Schreibt ausstehende Einträge und beendet den Listener-Thread"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+class SuccessSummary:
+    """Bündelt erfolgreiche Pings pro Host zu einer Log-Zeile alle interval Sekunden"""
+    
+    def __init__(self, logger, interval=60.0, clock=time.monotonic):
+        self.logger = logger
+        self.interval = interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.started = clock()
+        # Host -> [Anzahl, Summe, Minimum, Maximum]
+        self.hosts = {}
+    
+    def add(self, host, response_time):
+        """Zählt einen erfolgreichen Ping; schreibt die Zusammenfassung, wenn das Intervall um ist"""
+        with self.lock:
+            entry = self.hosts.get(host)
+            if entry is None:
+                self.hosts[host] = [1, response_time or 0.0, response_time, response_time]
+            else:
+                entry[0] += 1
+                if response_time is not None:
+                    entry[1] += response_time
+                    entry[2] = response_time if entry[2] is None else min(entry[2], response_time)
+                    entry[3] = response_time if entry[3] is None else max(entry[3], response_time)
+            due = self.clock() - self.started >= self.interval
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Schreibt die Zusammenfassung aller Hosts seit dem letzten Aufruf"""
+        with self.lock:
+            hosts, self.hosts = self.hosts, {}
+            now = self.clock()
+            elapsed, self.started = now - self.started, now
+        for host, (count, total, minimum, maximum) in hosts.items():
+            if minimum is None:
+                self.logger.info(f"Pings erfolgreich: {host} - {count} in {elapsed:.0f}s")
+            else:
+                self.logger.info(
+                    f"Pings erfolgreich: {host} - {count} in {elapsed:.0f}s, "
+                    f"min/avg/max {minimum:.1f}/{total / count:.1f}/{maximum:.1f} ms"
+                )
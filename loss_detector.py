@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Loss-Raten-Erkennung für Ping Monitor
+Verfolgt die Verlustrate über mehrere gleitende Fenster (z.B. 10 s, 1 min,
+5 min) mit konstantem Aufwand pro Ping und öffnet/schließt Events über
+Schwellwerte mit Hysterese. Erkennt so auch verstreute Verluste, die nie
+mehrere Pings in Folge betreffen
+"""
+
+import threading
+import time
+
+class LossWindow:
+    """Gleitendes Zeitfenster mit Ping- und Fehlerzählern pro Teil-Bucket"""
+    
+    __slots__ = ('buckets', 'bucket_size', 'counts', 'failures', 'current', 'count', 'failed')
+    
+    def __init__(self, duration, buckets=20):
+        self.buckets = buckets
+        self.bucket_size = duration / buckets
+        self.counts = [0] * buckets
+        self.failures = [0] * buckets
+        self.current = None
+        self.count = 0
+        self.failed = 0
+    
+    def advance(self, now):
+        """Verwirft Teil-Buckets, die aus dem Fenster gefallen sind (amortisiert O(1))"""
+        index = int(now // self.bucket_size)
+        if self.current is None or index - self.current >= self.buckets:
+            for slot in range(self.buckets):
+                self.counts[slot] = 0
+                self.failures[slot] = 0
+            self.count = 0
+            self.failed = 0
+        elif index > self.current:
+            for step in range(self.current + 1, index + 1):
+                slot = step % self.buckets
+                self.count -= self.counts[slot]
+                self.failed -= self.failures[slot]
+                self.counts[slot] = 0
+                self.failures[slot] = 0
+        else:
+            return
+        self.current = index
+    
+    def add(self, now, failed):
+        """Zählt einen Ping"""
+        self.advance(now)
+        slot = self.current % self.buckets
+        self.counts[slot] += 1
+        self.count += 1
+        if failed:
+            self.failures[slot] += 1
+            self.failed += 1
+    
+    def rate(self):
+        """Verlustrate in Prozent"""
+        return (self.failed / self.count * 100) if self.count else 0.0
+
+def severity_for(loss_percent, levels):
+    """Schweregrad zu einer Verlustrate (levels: Name -> Untergrenze in Prozent)"""
+    for name, threshold in sorted(levels.items(), key=lambda item: item[1], reverse=True):
+        if loss_percent >= threshold:
+            return name
+    return None
+
+class LossRateDetector:
+    """Öffnet ein Event, sobald ein Fenster seine Öffnungsschwelle erreicht,
+    und schließt es erst, wenn alle Fenster unter ihrer Schließschwelle liegen
+    
+    windows: Name -> (Dauer in Sekunden, Öffnen ab %, Schließen bei höchstens %).
+    Fenster mit weniger als min_samples Pings werden nicht bewertet.
+    """
+    
+    def __init__(self, windows, min_samples=5, severity_levels=None, buckets=20, clock=time.monotonic):
+        self.windows = [
+            (name, LossWindow(duration, buckets), open_percent, close_percent)
+            for name, (duration, open_percent, close_percent) in windows.items()
+        ]
+        self.min_samples = min_samples
+        self.severity_levels = severity_levels or {'minor': 0.0}
+        self.clock = clock
+        # Die Web-Oberfläche liest die Fenster aus einem anderen Thread
+        self.lock = threading.Lock()
+        
+        # Zustand des laufenden Events
+        self.active = False
+        self.trigger = None
+        self.peak_percent = 0.0
+        self.severity = None
+        self.failed = 0
+    
+    def add(self, success, now=None):
+        """Nimmt ein Ping-Ergebnis auf
+        
+        Liefert 'open', 'close', 'escalate' (Schweregrad gestiegen) oder None.
+        """
+        now = self.clock() if now is None else now
+        failed = not success
+        worst = 0.0
+        opening = None
+        closing = True
+        with self.lock:
+            for name, window, open_percent, close_percent in self.windows:
+                window.add(now, failed)
+                if window.count < self.min_samples:
+                    continue
+                rate = window.rate()
+                if rate > worst:
+                    worst = rate
+                if rate >= open_percent and opening is None:
+                    opening = name
+                if rate > close_percent:
+                    closing = False
+        
+        if not self.active:
+            if opening is None:
+                return None
+            self.active = True
+            self.trigger = opening
+            self.peak_percent = worst
+            self.severity = severity_for(worst, self.severity_levels)
+            self.failed = 1 if failed else 0
+            return 'open'
+        
+        self.failed += failed
+        if closing:
+            self.active = False
+            return 'close'
+        if worst > self.peak_percent:
+            self.peak_percent = worst
+            severity = severity_for(worst, self.severity_levels)
+            if severity != self.severity:
+                self.severity = severity
+                return 'escalate'
+        return None
+    
+    def rates(self):
+        """Aktuelle Verlustrate pro Fenster (None bei zu wenigen Pings)"""
+        now = self.clock()
+        result = {}
+        with self.lock:
+            for name, window, _, _ in self.windows:
+                window.advance(now)
+                result[name] = round(window.rate(), 2) if window.count >= self.min_samples else None
+        return result
+    
+    def snapshot(self):
+        """Zustand für /api/stats"""
+        return {
+            'active': self.active,
+            'trigger': self.trigger if self.active else None,
+            'severity': self.severity if self.active else None,
+            'peak_loss_percent': round(self.peak_percent, 2) if self.active else None,
+            'rates': self.rates()
+        }
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Interne Metriken für Ping Monitor
+Leichtgewichtige Zähler, Messwerte und Histogramme, die im Prometheus-
+Textformat unter /metrics ausgegeben werden
+"""
+
+import threading
+from bisect import bisect_left
+
+# Standard-Buckets für Laufzeiten in Sekunden (100 µs bis 10 s)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+class _Metric:
+    """Gemeinsame Basis: Name, Hilfetext und Label-Namen"""
+    
+    metric_type = None
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+    
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+    
+    def clear(self):
+        """Entfernt alle Label-Kombinationen"""
+        with self.lock:
+            self.values.clear()
+
+class Counter(_Metric):
+    """Monoton steigender Zähler"""
+    
+    metric_type = 'counter'
+    
+    def inc(self, amount=1, labels=()):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def render(self):
+        with self.lock:
+            items = list(self.values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in items
+        ]
+
+class Gauge(_Metric):
+    """Momentaufnahme eines Werts"""
+    
+    metric_type = 'gauge'
+    
+    def set(self, value, labels=()):
+        with self.lock:
+            self.values[labels] = value
+    
+    def render(self):
+        with self.lock:
+            items = list(self.values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(float(value))}'
+            for labels, value in items
+        ]
+
+class Histogram(_Metric):
+    """Verteilung mit festen Buckets (kumulativ ausgegeben)"""
+    
+    metric_type = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value, labels=()):
+        # Pro Label-Kombination: [Zähler je Bucket + Überlauf, Summe, Anzahl]
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+    
+    def render(self):
+        with self.lock:
+            items = [(labels, list(state[0]), state[1], state[2]) for labels, state in self.values.items()]
+        lines = self.header()
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'{self.name}_bucket{_format_labels(self.labelnames, labels, ("le", _format_value(float(bound))))} {cumulative}'
+                )
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+class Registry:
+    """Sammlung aller Metriken eines Prozesses"""
+    
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+    
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+    
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+    
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self):
+        """Alle Metriken im Prometheus-Textformat"""
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# Pings
+PROBE_DURATION = REGISTRY.histogram(
+    'ping_monitor_probe_duration_seconds', 'Dauer eines Pings inklusive Prozessstart bzw. Socket-Wartezeit',
+    ('method', 'result'))
+PROBES = REGISTRY.counter(
+    'ping_monitor_probes_total', 'Ausgeführte Pings', ('target', 'result'))
+SCHEDULE_LAG = REGISTRY.histogram(
+    'ping_monitor_schedule_lag_seconds', 'Verspätung eines Ticks gegenüber seiner Frist', ())
+MISSED_TICKS = REGISTRY.counter(
+    'ping_monitor_missed_ticks_total', 'Ausgelassene Ticks (verspätet oder zu viele laufende Pings)', ('target',))
+HEDGE_PROBES = REGISTRY.counter(
+    'ping_monitor_hedge_probes_total', 'Absicherungs-Pings an den jeweils anderen Host', ('target', 'result'))
+FAILOVERS = REGISTRY.counter(
+    'ping_monitor_failovers_total', 'Wechsel zwischen primärem und sekundärem Host', ('target', 'reason'))
+
+# Benachrichtigungen
+ALERTS = REGISTRY.counter(
+    'ping_monitor_alerts_total', 'Benachrichtigungen nach Kanal und Ergebnis (sent, failed, suppressed)', ('sink', 'result'))
+
+# Agent und Collector
+AGENT_BATCHES = REGISTRY.counter(
+    'ping_monitor_agent_batches_total', 'Batches an den Collector (spooled, sent, failed, rejected, dropped)', ('result',))
+AGENT_DROPPED = REGISTRY.counter(
+    'ping_monitor_agent_dropped_total', 'Wegen voller Agent-Queue verworfene Einträge', ())
+AGENT_SPOOL_BYTES = REGISTRY.gauge(
+    'ping_monitor_agent_spool_bytes', 'Größe der noch nicht bestätigten Batches im Spool', ())
+COLLECTOR_BATCHES = REGISTRY.counter(
+    'ping_monitor_collector_batches_total', 'Empfangene Batches (accepted, duplicate, busy, rejected)', ('node', 'result'))
+COLLECTOR_ROWS = REGISTRY.counter(
+    'ping_monitor_collector_rows_total', 'Empfangene Pings, Statistiken und Events', ('node',))
+
+# Datenbank
+DB_FLUSH_DURATION = REGISTRY.histogram(
+    'ping_monitor_db_flush_duration_seconds', 'Dauer einer Schreib-Transaktion des Datenbank-Writers', ())
+DB_ROWS = REGISTRY.counter(
+    'ping_monitor_db_rows_written_total', 'Geschriebene Zeilen (Pings und Statistiken)', ())
+DB_DROPPED = REGISTRY.counter(
+    'ping_monitor_db_dropped_total', 'Wegen voller Queue verworfene Schreiboperationen', ())
+DB_ERRORS = REGISTRY.counter(
+    'ping_monitor_db_errors_total', 'Fehlgeschlagene Schreib-Transaktionen', ())
+LOG_DROPPED = REGISTRY.counter(
+    'ping_monitor_log_dropped_total', 'Wegen voller Log-Queue verworfene Log-Einträge', ())
+DB_QUEUE_DEPTH = REGISTRY.gauge(
+    'ping_monitor_db_queue_depth', 'Ausstehende Schreiboperationen in der Queue', ())
+
+# Zustand der Ziele (beim Abruf von /metrics aktualisiert)
+TARGET_PINGS = REGISTRY.gauge(
+    'ping_monitor_target_pings', 'Pings seit Start pro Ziel', ('target',))
+TARGET_FAILED = REGISTRY.gauge(
+    'ping_monitor_target_failed_pings', 'Fehlgeschlagene Pings seit Start pro Ziel', ('target',))
+TARGET_LOSS = REGISTRY.gauge(
+    'ping_monitor_target_packet_loss_percent', 'Packet Loss seit Start pro Ziel in Prozent', ('target',))
+
+# Web-Oberfläche
+HTTP_DURATION = REGISTRY.histogram(
+    'ping_monitor_http_request_duration_seconds', 'Bearbeitungsdauer von API-Anfragen',
+    ('route', 'method', 'status'))
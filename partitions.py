@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Tagespartitionen für Ping-Ergebnisse
+Rohdaten werden pro UTC-Tag in eigene Tabellen (ping_results_YYYYMMDD)
+geschrieben. Die Aufbewahrung entfernt ganze Tage per DROP TABLE statt
+Zeile für Zeile zu löschen; der Router verteilt Zeitraum-Abfragen auf
+die passenden Partitionen
+"""
+
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+PARTITION_PREFIX = 'ping_results_'
+LEGACY_TABLE = 'ping_results'
+DAY = 86400
+
+# Zeitstempel der Rohdaten als Unix-Zeit (Sekunden, UTC) für SELECT-Listen
+EPOCH_COLUMN = '(julianday(timestamp) - 2440587.5) * 86400.0'
+
+_PARTITION_PATTERN = re.compile(r'^ping_results_(\d{8})$')
+
+def partition_name(timestamp):
+    """Name der Partition für einen Unix-Zeitstempel"""
+    return PARTITION_PREFIX + datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y%m%d')
+
+def partition_day(name):
+    """Beginn des Tages einer Partition als Unix-Zeitstempel (None für die Alt-Tabelle)"""
+    match = _PARTITION_PATTERN.match(name)
+    if not match:
+        return None
+    return int(datetime.strptime(match.group(1), '%Y%m%d').replace(tzinfo=timezone.utc).timestamp())
+
+def ensure_partition(cursor, name):
+    """Legt eine Tagespartition samt Indizes an"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY,
+            timestamp DATETIME NOT NULL,
+            host TEXT NOT NULL,
+            success BOOLEAN NOT NULL,
+            response_time REAL,
+            packet_loss_percent REAL
+        )
+    ''')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_host_timestamp ON {name} (host, timestamp)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_timestamp ON {name} (timestamp)')
+
+def list_partitions(conn):
+    """Alle Tagespartitionen als sortierte Liste von (Tagesbeginn, Name)"""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'ping\\_results\\_%' ESCAPE '\\'"
+    ).fetchall()
+    partitions = []
+    for (name,) in rows:
+        day = partition_day(name)
+        if day is not None:
+            partitions.append((day, name))
+    partitions.sort()
+    return partitions
+
+def has_legacy_rows(conn):
+    """Prüft, ob die ursprüngliche ping_results-Tabelle noch Daten enthält"""
+    try:
+        return conn.execute(f'SELECT 1 FROM {LEGACY_TABLE} LIMIT 1').fetchone() is not None
+    except sqlite3.OperationalError:
+        return False
+
+def earliest_timestamp(conn):
+    """Beginn der noch vorhandenen Rohdaten als Unix-Zeitstempel (None ohne Rohdaten)
+    
+    Davor liegende Tage wurden von der Aufbewahrung gelöscht und lassen sich
+    nicht mehr aus Rohdaten berechnen.
+    """
+    if has_legacy_rows(conn):
+        return conn.execute(f'SELECT MIN({EPOCH_COLUMN}) FROM {LEGACY_TABLE}').fetchone()[0]
+    partitions = list_partitions(conn)
+    return partitions[0][0] if partitions else None
+
+def partitions_for_range(conn, start=None, end=None, descending=False):
+    """Tabellen, die den Zeitraum [start, end) abdecken, in zeitlicher Reihenfolge
+    
+    Die Alt-Tabelle ping_results wird als älteste Partition einbezogen,
+    solange sie noch Daten enthält.
+    """
+    tables = [
+        name for day, name in list_partitions(conn)
+        if (start is None or day + DAY > start) and (end is None or day < end)
+    ]
+    if has_legacy_rows(conn):
+        tables.insert(0, LEGACY_TABLE)
+    if descending:
+        tables.reverse()
+    return tables
+
+def iter_batches(conn, columns, start=None, end=None, host=None, descending=False, limit=None, batch_size=1000):
+    """Liest Rohdaten partitionsübergreifend in zeitlicher Reihenfolge als Listen von bis zu batch_size Zeilen
+    
+    Die Partitionen werden nacheinander abgefragt, so dass bei LIMIT nur
+    so viele Tage gelesen werden wie nötig. Zeitgrenzen sind Unix-Zeitstempel.
+    """
+    from db_writer import format_timestamp
+    
+    remaining = limit
+    for table in partitions_for_range(conn, start, end, descending):
+        sql = f'SELECT {columns} FROM {table} WHERE 1 = 1'
+        params = []
+        if start is not None:
+            sql += ' AND timestamp >= ?'
+            params.append(format_timestamp(start))
+        if end is not None:
+            sql += ' AND timestamp < ?'
+            params.append(format_timestamp(end))
+        if host:
+            sql += ' AND host = ?'
+            params.append(host)
+        sql += ' ORDER BY timestamp DESC' if descending else ' ORDER BY timestamp'
+        if remaining is not None:
+            sql += ' LIMIT ?'
+            params.append(remaining)
+        
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+            if remaining is not None:
+                remaining -= len(rows)
+        if remaining is not None and remaining <= 0:
+            return
+
+def iter_rows(conn, columns, start=None, end=None, host=None, descending=False, limit=None, batch_size=1000):
+    """Liest Rohdaten partitionsübergreifend in zeitlicher Reihenfolge (zeilenweise)"""
+    for rows in iter_batches(conn, columns, start, end, host, descending, limit, batch_size):
+        yield from rows
+
+def latest_row(conn, columns, host=None):
+    """Neueste Zeile über alle Partitionen"""
+    for row in iter_rows(conn, columns, host=host, descending=True, limit=1):
+        return row
+    return None
+
+def enforce_retention(conn, keep_days, chunk_size=10000, now=None, sealed=None):
+    """Entfernt Rohdaten, die älter als keep_days Tage sind
+    
+    Tagespartitionen werden als Ganzes gelöscht; mit sealed (Tagesbeginn ->
+    bool) nur Tage, die bereits archiviert sind. Die Alt-Tabelle wird in
+    kleinen Transaktionen bereinigt, damit der Writer nicht lange blockiert.
+    Liefert die Namen der gelöschten Partitionen.
+    """
+    from db_writer import format_timestamp
+    
+    now = time.time() if now is None else now
+    cutoff = now - keep_days * DAY
+    dropped = []
+    for day, name in list_partitions(conn):
+        if day + DAY <= cutoff and (sealed is None or sealed(day)):
+            with conn:
+                conn.execute(f'DROP TABLE IF EXISTS {name}')
+            dropped.append(name)
+    
+    if has_legacy_rows(conn):
+        cutoff_text = format_timestamp(cutoff)
+        while True:
+            with conn:
+                deleted = conn.execute(f'''
+                    DELETE FROM {LEGACY_TABLE} WHERE id IN (
+                        SELECT id FROM {LEGACY_TABLE} WHERE timestamp < ? LIMIT ?
+                    )
+                ''', (cutoff_text, chunk_size)).rowcount
+            if deleted < chunk_size:
+                break
+    return dropped
+
+if __name__ == "__main__":
+    # Aufruf: python3 partitions.py list|cleanup [datenbank] [tage]
+    if len(sys.argv) < 2 or sys.argv[1] not in ('list', 'cleanup'):
+        print("Verwendung: python3 partitions.py list|cleanup [datenbank] [tage]")
+        sys.exit(1)
+    
+    from config import Config
+    db_path = sys.argv[2] if len(sys.argv) > 2 else Config.DATABASE_PATH
+    conn = sqlite3.connect(db_path)
+    
+    if sys.argv[1] == 'list':
+        for day, name in list_partitions(conn):
+            count = conn.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]
+            print(f"   {name}: {count} Zeilen")
+        if has_legacy_rows(conn):
+            print(f"   {LEGACY_TABLE} (Altbestand): {conn.execute(f'SELECT COUNT(*) FROM {LEGACY_TABLE}').fetchone()[0]} Zeilen")
+    else:
+        keep_days = int(sys.argv[3]) if len(sys.argv) > 3 else Config.DATABASE_CLEANUP_DAYS
+        dropped = enforce_retention(conn, keep_days)
+        print(f"✅ {len(dropped)} Partitionen gelöscht")
+    conn.close()
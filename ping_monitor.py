@@ -2,59 +2,230 @@
 """
 Ping Monitor Service
 Überwacht kontinuierlich die Netzwerkverbindung durch Pings an 8.8.8.8 und 8.8.4.4
+sowie beliebig viele weitere Ziele aus Config.TARGETS
 """
 
 import time
+import asyncio
 import subprocess
 import threading
 import json
 import logging
 from datetime import datetime, timedelta
-from collections import deque
 import sqlite3
 import os
 import signal
+import socket
 import sys
 from config import Config
+from icmp_probe import IcmpProber
+from db_writer import DatabaseWriter
+from archive import Archiver
+from agent import AgentShipper
+from rollups import init_rollups, rollups_missing, rebuild_rollups
+from rolling_stats import RollingStats
+from loss_detector import LossRateDetector
+from hedging import HealthScores, hedge_delay, attribute, merge_scope
+from alerts import AlertDispatcher
+from log_setup import setup_logging, SuccessSummary
+from latency_sketch import LatencySketch
+from call_quality import JitterEstimator, assess
+from event_stream import EventPublisher
+from ring_buffer import PingRingBuffer
+from shared_state import SharedStateWriter
+import metrics
+
+class HostState:
+    """Zustand eines überwachten Ziels (Zähler, letzte Pings, Loss-Events)"""
+    
+    def __init__(self, key, primary_host, secondary_host=None, interval=None):
+        self.key = key
+        self.primary_host = primary_host
+        self.secondary_host = secondary_host
+        self.current_host = primary_host
+        self.interval = interval or Config.PING_INTERVAL
+        
+        # Statistiken
+        self.total_pings = 0
+        self.failed_pings = 0
+        self.recent_pings = PingRingBuffer(Config.MAX_RECENT_PINGS)
+        self.latency_sketch = LatencySketch()
+        # Schützt recent_pings und latency_sketch vor gleichzeitigem Lesen
+        self.lock = threading.Lock()
+        
+        # Gleitende Fenster (z.B. 1 min, 5 min, 1 h), einmal pro Ping aktualisiert
+        self.rolling = RollingStats(Config.ROLLING_WINDOWS)
+        # Jitter nach RFC 3550 für Sprachqualität (MOS)
+        self.jitter = JitterEstimator()
+        
+        # Packet Loss Event Tracking
+        self.current_loss_event = None
+        self.consecutive_failures = 0
+        
+        # Verstreute Verluste über gleitende Fenster erkennen (Events vom Typ 'rate')
+        self.loss_detector = LossRateDetector(
+            Config.LOSS_DETECTOR_WINDOWS, Config.LOSS_DETECTOR_MIN_SAMPLES, Config.LOSS_SEVERITY_LEVELS
+        ) if Config.ENABLE_LOSS_DETECTOR else None
+        self.rate_event = None
+        # Zuordnung des letzten fehlgeschlagenen Pings ('target', 'path' oder None)
+        self.scope = None
+        
+        # Hedged Probing: Gesundheitswerte beider Hosts steuern den Failover
+        self.health = HealthScores(
+            (primary_host, secondary_host), Config.HEALTH_ALPHA
+        ) if secondary_host and Config.HEDGE_MODE != 'off' else None
+        self.hedges = 0
+        
+        # Zeitplan: Ticks mit festen Fristen, Burst-Größe und laufende Pings
+        self.burst = Config.PROBE_BURST
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.in_flight = 0
+        self.tick_loss_percent = None
+    
+    def alternate_host(self, host=None):
+        """Der jeweils andere Host (primär/sekundär)"""
+        host = host or self.current_host
+        return self.secondary_host if host == self.primary_host else self.primary_host
+    
+    def calculate_packet_loss(self, window=None):
+        """Berechnet den Packet Loss seit Start oder im gleitenden Fenster"""
+        if window is not None:
+            return self.rolling.loss_percent(window)
+        if self.total_pings == 0:
+            return 0.0
+        return (self.failed_pings / self.total_pings) * 100
+    
+    def add_recent(self, timestamp, host, success, response_time, packet_loss):
+        """Hängt ein Ergebnis an die letzten Pings an und aktualisiert den Sketch"""
+        with self.lock:
+            self.recent_pings.append(timestamp, host, success, response_time, packet_loss)
+            if success and response_time is not None:
+                self.latency_sketch.add(response_time)
+    
+    def last_pings(self, count):
+        """Die letzten count Pings als Dicts (werden erst hier erzeugt)"""
+        with self.lock:
+            return self.recent_pings.to_dicts(count)
+    
+    def recent_summary(self, count=None):
+        """Kennzahlen über die letzten count Pings im Speicher"""
+        with self.lock:
+            return self.recent_pings.aggregate(count)
+    
+    def quality(self, windows=None, window=None):
+        """Jitter, R-Faktor und MOS für ein gleitendes Fenster (Standard: QUALITY_WINDOW)"""
+        windows = windows if windows is not None else self.rolling.snapshot()
+        return assess(self.jitter.value, windows.get(window or Config.QUALITY_WINDOW))
+    
+    def latency_percentiles(self):
+        """p50/p95/p99 der Antwortzeiten seit Start"""
+        with self.lock:
+            return self.latency_sketch.percentiles()
+
+def _default_target_attribute(name):
+    """Leitet ein Attribut an das Standardziel weiter (Kompatibilität)"""
+    return property(
+        lambda self: getattr(self.default_target, name),
+        lambda self, value: setattr(self.default_target, name, value)
+    )
 
 class PingMonitor:
-    def __init__(self, db_path=None):
+    # Zustand des Standardziels (primärer/sekundärer Host)
+    current_host = _default_target_attribute('current_host')
+    total_pings = _default_target_attribute('total_pings')
+    failed_pings = _default_target_attribute('failed_pings')
+    recent_pings = _default_target_attribute('recent_pings')
+    current_loss_event = _default_target_attribute('current_loss_event')
+    consecutive_failures = _default_target_attribute('consecutive_failures')
+    
+    def __init__(self, db_path=None, prober=None):
         # Konfiguration laden
         Config.validate()
         
         self.primary_host = Config.PRIMARY_HOST
         self.secondary_host = Config.SECONDARY_HOST
-        self.current_host = self.primary_host
         self.db_path = db_path or Config.DATABASE_PATH
         self.running = False
         self.ping_interval = Config.PING_INTERVAL
         self.ping_timeout = Config.PING_TIMEOUT
         self.failover_threshold = Config.FAILOVER_THRESHOLD
         
-        # Statistiken
-        self.total_pings = 0
-        self.failed_pings = 0
-        self.recent_pings = deque(maxlen=Config.MAX_RECENT_PINGS)
+        # Überwachte Ziele: Standardziel mit Failover plus zusätzliche Ziele
+        self.default_target = HostState(self.primary_host, self.primary_host, self.secondary_host, self.ping_interval)
+        self.targets = {self.default_target.key: self.default_target}
+        for host, interval in Config.TARGETS:
+            if host not in self.targets:
+                self.targets[host] = HostState(host, host, interval=interval)
         
-        # Packet Loss Event Tracking
-        self.current_loss_event = None
-        self.consecutive_failures = 0
+        # Live-Ereignisse für /api/stream
+        self.events = EventPublisher(Config.SSE_BUFFER_SIZE, Config.SSE_MAX_SUBSCRIBERS)
         
-        # Setup logging
-        log_level = getattr(logging, Config.LOG_LEVEL.upper())
-        logging.basicConfig(
-            level=log_level,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(Config.LOG_FILE),
-                logging.StreamHandler()
-            ]
-        )
+        # Logging über Queue und Hintergrund-Thread mit rotierender Log-Datei
+        setup_logging(Config.LOG_FILE, Config.LOG_LEVEL, Config.LOG_MAX_SIZE, Config.LOG_BACKUP_COUNT, Config.LOG_QUEUE_SIZE)
         self.logger = logging.getLogger(__name__)
+        # Erfolgreiche Pings nur periodisch zusammengefasst loggen
+        self.success_log = SuccessSummary(
+            self.logger, Config.LOG_SUMMARY_INTERVAL
+        ) if Config.LOG_SUMMARY_INTERVAL > 0 else None
+        
+        # ICMP-Engine mit dauerhaft geöffneten Sockets (Fallback: ping-Befehl);
+        # ein übergebener Prober (z.B. FakeProber für Benchmarks) hat Vorrang
+        self.prober = prober
+        if self.prober is None and Config.USE_NATIVE_ICMP:
+            self.prober = IcmpProber.create(self.ping_timeout)
+            if self.prober is None:
+                self.logger.warning("Keine ICMP-Sockets verfügbar, verwende ping-Befehl")
         
         # Setup database
         self.init_database()
         
+        # Agent-Modus: alle Schreiboperationen zusätzlich an den Collector senden
+        self.agent = AgentShipper.create(self.default_target.key, self.logger)
+        if self.agent is not None:
+            self.agent.start()
+        
+        # Write-Behind-Writer: bündelt alle Schreibzugriffe in einem Thread
+        self.writer = DatabaseWriter(
+            self.db_path,
+            batch_size=Config.DB_BATCH_SIZE,
+            flush_interval_ms=Config.DB_FLUSH_INTERVAL_MS,
+            queue_size=Config.DB_QUEUE_SIZE,
+            logger=self.logger,
+            retention_days=Config.DATABASE_CLEANUP_DAYS if Config.ENABLE_DATABASE_CLEANUP else None,
+            retention_interval=Config.DATABASE_CLEANUP_INTERVAL,
+            archive_dir=Config.ARCHIVE_DIR if Config.ENABLE_ARCHIVE else None,
+            mirror=self.agent.submit if self.agent is not None else None
+        )
+        self.writer.start()
+        
+        # Langzeitarchiv: versiegelt abgeschlossene Tage mit eigener Verbindung
+        self.archiver = None
+        if Config.ENABLE_ARCHIVE:
+            self.archiver = Archiver(
+                self.db_path, Config.ARCHIVE_DIR, after_days=Config.ARCHIVE_AFTER_DAYS,
+                interval=Config.ARCHIVE_INTERVAL, logger=self.logger
+            )
+            self.archiver.start()
+        
+        # Benachrichtigungen aus einem eigenen Thread (langsame SMTP-Server bremsen keine Pings)
+        self.alerts = AlertDispatcher.create(self.logger)
+        if self.alerts is not None:
+            self.alerts.start()
+        
+        # Live-Zustand für nur lesende Web-Worker in anderen Prozessen
+        self.shared_state = None
+        if Config.ENABLE_SHARED_STATE:
+            try:
+                self.shared_state = SharedStateWriter(
+                    Config.SHARED_STATE_PATH, self.targets.values(), Config.ROLLING_WINDOWS,
+                    capacity=Config.SHARED_RECENT_PINGS,
+                    refresh_interval=Config.SHARED_STATE_REFRESH,
+                    database=self.writer.get_stats
+                )
+            except OSError as e:
+                self.logger.warning(f"Geteilter Zustand nicht verfügbar ({Config.SHARED_STATE_PATH}): {e}")
+        
         # Signal handler für graceful shutdown
         signal.signal(signal.SIGTERM, self.signal_handler)
         signal.signal(signal.SIGINT, self.signal_handler)
@@ -65,6 +236,11 @@ class PingMonitor:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
+            # WAL erlaubt Lesezugriffe der Web-Oberfläche parallel zum Writer
+            cursor.execute('PRAGMA journal_mode=WAL')
+            
+            # Neue Rohdaten landen in Tagespartitionen (partitions.py); ping_results
+            # bleibt für Altbestände erhalten und wird von Abfragen mitgelesen
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS ping_results (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -83,7 +259,10 @@ class PingMonitor:
                     total_pings INTEGER,
                     failed_pings INTEGER,
                     packet_loss_percent REAL,
-                    current_host TEXT
+                    current_host TEXT,
+                    host TEXT,
+                    jitter_ms REAL,
+                    mos REAL
                 )
             ''')
             
@@ -95,18 +274,90 @@ class PingMonitor:
                     host TEXT NOT NULL,
                     consecutive_failures INTEGER,
                     duration_seconds INTEGER,
-                    is_active BOOLEAN DEFAULT 1
+                    is_active BOOLEAN DEFAULT 1,
+                    event_type TEXT NOT NULL DEFAULT 'outage',
+                    severity TEXT,
+                    loss_percent REAL,
+                    scope TEXT
                 )
             ''')
             
+            # Rollup-Tabellen und Indizes für Zeitraum-Abfragen
+            backfill_rollups = rollups_missing(cursor)
+            init_rollups(cursor)
+            
+            # Ältere Datenbanken um die Ziel-Spalte erweitern
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(statistics)')]
+            if 'host' not in columns:
+                cursor.execute('ALTER TABLE statistics ADD COLUMN host TEXT')
+            # ... und um Jitter und MOS
+            if 'jitter_ms' not in columns:
+                cursor.execute('ALTER TABLE statistics ADD COLUMN jitter_ms REAL')
+                cursor.execute('ALTER TABLE statistics ADD COLUMN mos REAL')
+            
+            # Ältere Datenbanken um Typ, Schweregrad und Loss-Rate der Events erweitern
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(packet_loss_events)')]
+            if 'event_type' not in columns:
+                cursor.execute("ALTER TABLE packet_loss_events ADD COLUMN event_type TEXT NOT NULL DEFAULT 'outage'")
+            if 'severity' not in columns:
+                cursor.execute('ALTER TABLE packet_loss_events ADD COLUMN severity TEXT')
+            if 'loss_percent' not in columns:
+                cursor.execute('ALTER TABLE packet_loss_events ADD COLUMN loss_percent REAL')
+            if 'scope' not in columns:
+                cursor.execute('ALTER TABLE packet_loss_events ADD COLUMN scope TEXT')
+            
             conn.commit()
+            
+            # Vorhandene Rohdaten einmalig in die neuen Rollups übernehmen
+            if backfill_rollups:
+                rebuild_rollups(conn)
+            
             conn.close()
             self.logger.info("Datenbank initialisiert")
         except Exception as e:
             self.logger.error(f"Fehler beim Initialisieren der Datenbank: {e}")
     
+    def get_target(self, host=None):
+        """Liefert das Ziel zu einem Schlüssel oder aktuell gepingten Host"""
+        if host is None:
+            return self.default_target
+        if host in self.targets:
+            return self.targets[host]
+        for target in self.targets.values():
+            if target.current_host == host:
+                return target
+        return None
+    
     def ping_host(self, host):
         """Führt einen Ping zu einem Host aus"""
+        if self.prober is None:
+            return self.ping_host_subprocess(host)
+        
+        try:
+            return self.prober.ping(host, self.ping_timeout)
+        except socket.gaierror as e:
+            self.logger.error(f"Host {host} nicht auflösbar: {e}")
+            return False, None
+        except Exception as e:
+            self.logger.error(f"Ping-Fehler für {host}: {e}")
+            return False, None
+    
+    async def ping_host_async(self, host):
+        """Führt einen Ping aus, ohne den Event-Loop zu blockieren"""
+        if self.prober is None:
+            return await self.ping_host_subprocess_async(host)
+        
+        try:
+            return await self.prober.ping_async(host, self.ping_timeout)
+        except socket.gaierror as e:
+            self.logger.error(f"Host {host} nicht auflösbar: {e}")
+            return False, None
+        except Exception as e:
+            self.logger.error(f"Ping-Fehler für {host}: {e}")
+            return False, None
+    
+    def ping_host_subprocess(self, host):
+        """Führt einen Ping über den ping-Befehl aus (Fallback)"""
         try:
             # Linux ping command
             result = subprocess.run(
@@ -117,16 +368,10 @@ class PingMonitor:
             )
             
             if result.returncode == 0:
-                # Parse response time from output
-                output = result.stdout
-                if 'time=' in output:
-                    time_str = output.split('time=')[1].split(' ')[0]
-                    response_time = float(time_str)
-                    return True, response_time
-                return True, 0.0
+                return True, self.parse_ping_output(result.stdout)
             else:
                 return False, None
-                
+        
         except subprocess.TimeoutExpired:
             self.logger.warning(f"Ping timeout für {host}")
             return False, None
@@ -134,197 +379,483 @@ class PingMonitor:
             self.logger.error(f"Ping-Fehler für {host}: {e}")
             return False, None
     
-    def switch_host(self):
+    async def ping_host_subprocess_async(self, host):
+        """Führt den ping-Befehl als asynchronen Prozess aus (Fallback)"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                'ping', '-c', '1', '-W', str(self.ping_timeout), host,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                stdout, _ = await asyncio.wait_for(process.communicate(), self.ping_timeout + 2)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                self.logger.warning(f"Ping timeout für {host}")
+                return False, None
+            
+            if process.returncode == 0:
+                return True, self.parse_ping_output(stdout.decode(errors='replace'))
+            return False, None
+        
+        except Exception as e:
+            self.logger.error(f"Ping-Fehler für {host}: {e}")
+            return False, None
+    
+    def parse_ping_output(self, output):
+        """Liest die Antwortzeit aus der Ausgabe des ping-Befehls"""
+        if 'time=' in output:
+            time_str = output.split('time=')[1].split(' ')[0]
+            return float(time_str)
+        return 0.0
+    
+    def switch_host(self, target=None):
         """Wechselt zwischen primärem und sekundärem Host"""
-        if self.current_host == self.primary_host:
-            self.current_host = self.secondary_host
-            self.logger.info(f"Wechsel zu sekundärem Host: {self.secondary_host}")
+        target = target or self.default_target
+        if not target.secondary_host:
+            return
+        if target.current_host == target.primary_host:
+            target.current_host = target.secondary_host
+            self.logger.info(f"Wechsel zu sekundärem Host: {target.secondary_host}")
         else:
-            self.current_host = self.primary_host
-            self.logger.info(f"Wechsel zu primärem Host: {self.primary_host}")
+            target.current_host = target.primary_host
+            self.logger.info(f"Wechsel zu primärem Host: {target.primary_host}")
+        # Antwortzeiten des neuen Hosts nicht mit denen des alten vergleichen
+        target.jitter.reset()
     
-    def calculate_packet_loss(self):
-        """Berechnet den aktuellen Packet Loss"""
-        if self.total_pings == 0:
-            return 0.0
-        return (self.failed_pings / self.total_pings) * 100
+    def calculate_packet_loss(self, target=None, window=None):
+        """Berechnet den Packet Loss seit Start oder im gleitenden Fenster ('1m', '5m', '1h')"""
+        return (target or self.default_target).calculate_packet_loss(window)
     
-    def save_ping_result(self, host, success, response_time):
-        """Speichert Ping-Ergebnis in der Datenbank"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            packet_loss = self.calculate_packet_loss()
-            
-            cursor.execute('''
-                INSERT INTO ping_results (host, success, response_time, packet_loss_percent)
-                VALUES (?, ?, ?, ?)
-            ''', (host, success, response_time, packet_loss))
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            self.logger.error(f"Fehler beim Speichern der Ping-Ergebnisse: {e}")
+    def save_ping_result(self, host, success, response_time, packet_loss=None, timestamp=None):
+        """Reiht ein Ping-Ergebnis zum Speichern in der Datenbank ein"""
+        if packet_loss is None:
+            packet_loss = self.calculate_packet_loss(self.get_target(host))
+        self.writer.submit_ping(timestamp or time.time(), host, success, response_time, packet_loss)
     
-    def save_statistics(self):
-        """Speichert aktuelle Statistiken"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            packet_loss = self.calculate_packet_loss()
-            
-            cursor.execute('''
-                INSERT INTO statistics (total_pings, failed_pings, packet_loss_percent, current_host)
-                VALUES (?, ?, ?, ?)
-            ''', (self.total_pings, self.failed_pings, packet_loss, self.current_host))
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            self.logger.error(f"Fehler beim Speichern der Statistiken: {e}")
+    def save_statistics(self, target=None):
+        """Reiht aktuelle Statistiken ein (ohne Ziel: für alle Ziele)"""
+        targets = [target] if target else list(self.targets.values())
+        rows = []
+        for t in targets:
+            quality = t.quality()
+            rows.append((t.total_pings, t.failed_pings, t.calculate_packet_loss(), t.current_host, t.key,
+                         quality['jitter_ms'], quality['mos']))
+        self.writer.submit_statistics(rows)
     
-    def start_packet_loss_event(self):
+    def start_packet_loss_event(self, target=None):
         """Startet ein neues Packet Loss Event"""
-        if self.current_loss_event is None:
-            self.current_loss_event = {
+        target = target or self.default_target
+        if target.current_loss_event is None:
+            target.current_loss_event = {
                 'start_time': datetime.now(),
-                'host': self.current_host,
-                'consecutive_failures': 1
+                'host': target.current_host,
+                'consecutive_failures': 1,
+                'type': 'outage',
+                'severity': self.outage_severity(1),
+                'loss_percent': 100.0,
+                'scope': target.scope
             }
             
-            try:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO packet_loss_events (start_time, host, consecutive_failures)
-                    VALUES (?, ?, ?)
-                ''', (self.current_loss_event['start_time'], self.current_loss_event['host'], 1))
-                
-                self.current_loss_event['id'] = cursor.lastrowid
-                conn.commit()
-                conn.close()
-                
-                self.logger.warning(f"Packet Loss Event gestartet für {self.current_host}")
-            except Exception as e:
-                self.logger.error(f"Fehler beim Starten des Packet Loss Events: {e}")
+            self.writer.start_event(target.current_loss_event)
+            self.notify_alerts(target, target.current_loss_event, 'start')
+            self.events.publish('loss_start', {
+                'host': target.key,
+                'current_host': target.current_host,
+                'start_time': target.current_loss_event['start_time'].isoformat(),
+                'type': 'outage',
+                'severity': target.current_loss_event['severity'],
+                'scope': target.scope
+            }, target.key)
+            self.logger.warning(f"Packet Loss Event gestartet für {target.current_host}")
     
-    def update_packet_loss_event(self):
+    def update_packet_loss_event(self, target=None):
         """Aktualisiert das aktuelle Packet Loss Event"""
-        if self.current_loss_event:
-            self.current_loss_event['consecutive_failures'] += 1
-            
-            try:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    UPDATE packet_loss_events 
-                    SET consecutive_failures = ?
-                    WHERE id = ?
-                ''', (self.current_loss_event['consecutive_failures'], self.current_loss_event['id']))
-                
-                conn.commit()
-                conn.close()
-            except Exception as e:
-                self.logger.error(f"Fehler beim Aktualisieren des Packet Loss Events: {e}")
+        target = target or self.default_target
+        if target.current_loss_event:
+            target.current_loss_event['consecutive_failures'] += 1
+            target.current_loss_event['severity'] = self.outage_severity(target.current_loss_event['consecutive_failures'])
+            target.current_loss_event['scope'] = merge_scope(target.current_loss_event.get('scope'), target.scope)
+            self.writer.update_event(target.current_loss_event)
+            self.notify_alerts(target, target.current_loss_event, 'update')
     
-    def end_packet_loss_event(self):
+    def end_packet_loss_event(self, target=None):
         """Beendet das aktuelle Packet Loss Event"""
-        if self.current_loss_event:
+        target = target or self.default_target
+        if target.current_loss_event:
             end_time = datetime.now()
-            duration = (end_time - self.current_loss_event['start_time']).total_seconds()
+            duration = (end_time - target.current_loss_event['start_time']).total_seconds()
             
-            try:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    UPDATE packet_loss_events 
-                    SET end_time = ?, duration_seconds = ?, is_active = 0
-                    WHERE id = ?
-                ''', (end_time, int(duration), self.current_loss_event['id']))
-                
-                conn.commit()
-                conn.close()
-                
-                self.logger.info(f"Packet Loss Event beendet. Dauer: {duration:.1f}s, Failures: {self.current_loss_event['consecutive_failures']}")
-            except Exception as e:
-                self.logger.error(f"Fehler beim Beenden des Packet Loss Events: {e}")
+            self.writer.end_event(target.current_loss_event, end_time, duration)
+            self.notify_alerts(target, target.current_loss_event, 'end')
+            self.events.publish('loss_end', {
+                'host': target.key,
+                'current_host': target.current_loss_event['host'],
+                'start_time': target.current_loss_event['start_time'].isoformat(),
+                'end_time': end_time.isoformat(),
+                'duration_seconds': int(duration),
+                'consecutive_failures': target.current_loss_event['consecutive_failures'],
+                'type': 'outage',
+                'severity': target.current_loss_event['severity'],
+                'scope': target.current_loss_event.get('scope')
+            }, target.key)
+            self.logger.info(f"Packet Loss Event beendet. Dauer: {duration:.1f}s, Failures: {target.current_loss_event['consecutive_failures']}")
             
-            self.current_loss_event = None
+            target.current_loss_event = None
     
-    def monitor_loop(self):
-        """Hauptschleife für das Ping-Monitoring"""
+    def notify_alerts(self, target, event, phase):
+        """Reicht Start, Änderung oder Ende eines Loss-Events an die Benachrichtigungen weiter"""
+        if self.alerts is not None:
+            self.alerts.event(target.key, event, phase)
+    
+    def outage_severity(self, consecutive_failures):
+        """Schweregrad eines Ausfall-Events: kritisch ab der Failover-Schwelle"""
+        return 'critical' if consecutive_failures >= self.failover_threshold else 'minor'
+    
+    def update_rate_event(self, target, transition, success):
+        """Öffnet, aktualisiert oder schließt das Loss-Raten-Event eines Ziels"""
+        detector = target.loss_detector
+        if transition == 'open':
+            target.rate_event = {
+                'start_time': datetime.now(),
+                'host': target.current_host,
+                'consecutive_failures': detector.failed,
+                'type': 'rate',
+                'severity': detector.severity,
+                'loss_percent': round(detector.peak_percent, 2),
+                'window': detector.trigger,
+                'scope': target.scope
+            }
+            self.writer.start_event(target.rate_event)
+            self.notify_alerts(target, target.rate_event, 'start')
+            self.events.publish('loss_start', {
+                'host': target.key,
+                'current_host': target.current_host,
+                'start_time': target.rate_event['start_time'].isoformat(),
+                'type': 'rate',
+                'severity': detector.severity,
+                'loss_percent': target.rate_event['loss_percent'],
+                'window': detector.trigger,
+                'scope': target.scope
+            }, target.key)
+            self.logger.warning(
+                f"Loss-Rate-Event gestartet für {target.key}: {detector.peak_percent:.1f}% im Fenster {detector.trigger} ({detector.severity})")
+            return
         
-        while self.running:
-            start_time = time.time()
+        event = target.rate_event
+        if event is None:
+            return
+        # Bei Rate-Events zählt consecutive_failures alle Fehlschläge während des Events
+        event['consecutive_failures'] = detector.failed
+        event['severity'] = detector.severity
+        event['loss_percent'] = round(detector.peak_percent, 2)
+        if not success:
+            event['scope'] = merge_scope(event.get('scope'), target.scope)
+        
+        if transition == 'close':
+            end_time = datetime.now()
+            duration = (end_time - event['start_time']).total_seconds()
+            self.writer.end_event(event, end_time, duration)
+            self.notify_alerts(target, event, 'end')
+            self.events.publish('loss_end', {
+                'host': target.key,
+                'current_host': event['host'],
+                'start_time': event['start_time'].isoformat(),
+                'end_time': end_time.isoformat(),
+                'duration_seconds': int(duration),
+                'consecutive_failures': event['consecutive_failures'],
+                'type': 'rate',
+                'severity': event['severity'],
+                'loss_percent': event['loss_percent'],
+                'scope': event.get('scope')
+            }, target.key)
+            self.logger.info(
+                f"Loss-Rate-Event beendet für {target.key}. Dauer: {duration:.1f}s, Spitze: {event['loss_percent']}%")
+            target.rate_event = None
+        elif transition == 'escalate' or not success:
+            self.writer.update_event(event)
+            if transition == 'escalate':
+                self.notify_alerts(target, event, 'update')
+    
+    def record_result(self, target, success, response_time, scope=None):
+        """Verarbeitet das Ergebnis eines Pings für ein Ziel
+        
+        scope: Zuordnung eines Fehlschlags durch Hedged Probing ('target', 'path' oder None).
+        """
+        host = target.current_host
+        timestamp = time.time()
+        target.scope = None if success else scope
+        
+        # Statistiken aktualisieren
+        target.total_pings += 1
+        ping_result = {
+            'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+            'host': host,
+            'success': success,
+            'response_time': response_time,
+            'packet_loss': target.calculate_packet_loss()
+        }
+        
+        if success:
+            # Erfolgreicher Ping - beende aktuelles Packet Loss Event falls vorhanden
+            if target.current_loss_event:
+                self.end_packet_loss_event(target)
+            target.consecutive_failures = 0
+            if self.success_log is not None:
+                self.success_log.add(host, response_time)
+            else:
+                self.logger.info(f"Ping erfolgreich: {host} - {response_time}ms")
+        else:
+            # Fehlgeschlagener Ping
+            target.failed_pings += 1
+            target.consecutive_failures += 1
             
-            # Ping ausführen
-            success, response_time = self.ping_host(self.current_host)
+            # Packet Loss Event Management
+            if target.current_loss_event:
+                self.update_packet_loss_event(target)
+            else:
+                self.start_packet_loss_event(target)
             
-            # Statistiken aktualisieren
-            self.total_pings += 1
-            ping_result = {
-                'timestamp': datetime.now().isoformat(),
-                'host': self.current_host,
-                'success': success,
-                'response_time': response_time,
-                'packet_loss': self.calculate_packet_loss()
-            }
+            self.logger.warning(f"Ping fehlgeschlagen: {host} (Consecutive: {target.consecutive_failures})")
             
-            if success:
-                # Erfolgreicher Ping - beende aktuelles Packet Loss Event falls vorhanden
-                if self.current_loss_event:
-                    self.end_packet_loss_event()
-                self.consecutive_failures = 0
-                self.logger.info(f"Ping erfolgreich: {self.current_host} - {response_time}ms")
-            else:
-                # Fehlgeschlagener Ping
-                self.failed_pings += 1
-                self.consecutive_failures += 1
-                
-                # Packet Loss Event Management
-                if self.current_loss_event:
-                    self.update_packet_loss_event()
-                else:
-                    self.start_packet_loss_event()
-                
-                self.logger.warning(f"Ping fehlgeschlagen: {self.current_host} (Consecutive: {self.consecutive_failures})")
-                
-                # Nach X aufeinanderfolgenden Fehlern zum anderen Host wechseln
-                if self.consecutive_failures >= self.failover_threshold:
-                    self.switch_host()
-                    # Beende aktuelles Event da wir den Host wechseln
-                    if self.current_loss_event:
-                        self.end_packet_loss_event()
-                    self.consecutive_failures = 0
+            # Nach X aufeinanderfolgenden Fehlern zum anderen Host wechseln
+            # (mit Hedged Probing entscheiden die Gesundheitswerte, siehe health_failover)
+            if target.secondary_host and target.health is None and target.consecutive_failures >= self.failover_threshold:
+                self.switch_host(target)
+                metrics.FAILOVERS.inc(1, (target.key, 'threshold'))
+                # Beende aktuelles Event da wir den Host wechseln
+                if target.current_loss_event:
+                    self.end_packet_loss_event(target)
+                target.consecutive_failures = 0
+        
+        # Ergebnis speichern
+        target.add_recent(timestamp, host, success, response_time, ping_result['packet_loss'])
+        target.rolling.add(success, response_time)
+        target.jitter.add(success, response_time)
+        if target.loss_detector is not None:
+            transition = target.loss_detector.add(success)
+            if transition is not None or target.rate_event is not None:
+                self.update_rate_event(target, transition, success)
+        self.save_ping_result(host, success, response_time, target.calculate_packet_loss(), timestamp)
+        self.publish_result(target, ping_result)
+        if self.shared_state is not None:
+            self.shared_state.publish(target, (timestamp, host, success, response_time, ping_result['packet_loss']))
+        if self.alerts is not None and self.alerts.due(target.key):
+            self.alerts.observe(target.key, target.rolling.snapshot(), target.jitter.value)
+        if self.agent is not None and self.agent.due(target.key):
+            self.agent.publish_stats(target.key, self.get_current_stats(target.key))
+        
+        # Regelmäßig Statistiken speichern
+        if target.total_pings % Config.STATS_SAVE_INTERVAL == 0:
+            self.save_statistics(target)
+    
+    def publish_result(self, target, ping_result):
+        """Veröffentlicht ein Ping-Ergebnis samt aktueller Kennzahlen im Live-Stream"""
+        windows = target.rolling.snapshot()
+        self.events.publish('ping', {
+            'host': target.key,
+            'current_host': ping_result['host'],
+            'timestamp': ping_result['timestamp'],
+            'success': ping_result['success'],
+            'response_time': ping_result['response_time'],
+            'total_pings': target.total_pings,
+            'failed_pings': target.failed_pings,
+            'packet_loss_percent': target.calculate_packet_loss(),
+            'avg_response_time': windows[Config.STATS_WINDOW]['avg_response_time'] if Config.STATS_WINDOW in windows else 0
+        }, target.key)
+    
+    async def target_loop(self, target, offset=0.0):
+        """Ping-Schleife für ein einzelnes Ziel mit absoluten Fristen auf der monotonen Uhr
+        
+        Tick k ist fällig um start + k * intervall. Pings laufen als eigene Tasks,
+        damit Timeouts den Takt nicht verschieben; verpasste Ticks werden gezählt
+        statt das Intervall zu strecken.
+        """
+        loop = asyncio.get_running_loop()
+        interval = target.interval
+        # Mehr laufende Pings als bis zum Timeout anfallen können deuten auf Überlast hin
+        max_in_flight = target.burst * (int(self.ping_timeout / interval) + 2)
+        pending = set()
+        
+        # Startzeitpunkte verteilen, damit nicht alle Ziele gleichzeitig pingen
+        start = loop.time() + offset
+        tick = 0
+        
+        while self.running:
+            deadline = start + tick * interval
+            now = loop.time()
+            if deadline > now:
+                await asyncio.sleep(deadline - now)
+                if not self.running:
+                    break
+                now = loop.time()
+            metrics.SCHEDULE_LAG.observe(max(0.0, now - deadline))
             
-            # Ergebnis speichern
-            self.recent_pings.append(ping_result)
-            self.save_ping_result(self.current_host, success, response_time)
+            # Zu spät aufgewacht: übersprungene Ticks zählen und zum aktuellen springen
+            late = int((now - deadline) / interval)
+            if late > 0:
+                tick += late
+                target.missed_ticks += late
+                metrics.MISSED_TICKS.inc(late, (target.key,))
             
-            # Regelmäßig Statistiken speichern
-            if self.total_pings % Config.STATS_SAVE_INTERVAL == 0:
-                self.save_statistics()
+            if target.in_flight >= max_in_flight:
+                target.missed_ticks += 1
+                metrics.MISSED_TICKS.inc(1, (target.key,))
+            else:
+                task = asyncio.create_task(self.probe_tick(target))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            target.ticks += 1
+            tick += 1
+        
+        # Laufende Pings abschließen lassen (höchstens bis zum Timeout)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def probe_tick(self, target):
+        """Führt die Pings eines Ticks aus (einer oder ein Burst) und verarbeitet die Ergebnisse"""
+        target.in_flight += target.burst
+        alternate = None
+        try:
+            host = target.current_host
+            if target.health is None:
+                results = await self.probe_host(target, host)
+            else:
+                results, alternate = await self.hedged_probe(target, host)
+        finally:
+            target.in_flight -= target.burst
+        
+        scope = None
+        if target.health is not None:
+            for success, _ in results:
+                target.health.update(host, success)
+            if alternate is not None:
+                target.health.update(target.alternate_host(host), alternate[0])
+                scope = attribute(alternate[0])
             
-            # Warten bis zum nächsten Intervall
-            elapsed = time.time() - start_time
-            sleep_time = max(0, self.ping_interval - elapsed)
-            time.sleep(sleep_time)
+            if host != target.current_host:
+                # Während des Ticks gewechselt: Ergebnisse des alten Hosts zählen nur für dessen Gesundheitswert
+                return
+        
+        for success, response_time in results:
+            try:
+                self.record_result(target, success, response_time, scope)
+            except Exception as e:
+                self.logger.error(f"Fehler beim Verarbeiten des Pings für {target.key}: {e}")
+        if target.health is not None:
+            self.health_failover(target)
+        # Packet Loss innerhalb dieses Intervalls (aussagekräftig im Burst-Modus)
+        target.tick_loss_percent = sum(1 for success, _ in results if not success) / len(results) * 100
+    
+    async def probe_host(self, target, host):
+        """Die Pings eines Ticks an einen Host (einer oder ein Burst)"""
+        if target.burst == 1:
+            return [await self.timed_probe(target, host)]
+        spacing = Config.BURST_SPACING_MS / 1000
+        return await asyncio.gather(*(
+            self.timed_probe(target, host, index * spacing) for index in range(target.burst)
+        ))
+    
+    async def hedged_probe(self, target, host):
+        """Pingt zusätzlich den anderen Host: sofort (parallel) oder erst, wenn der
+        aktuelle Host nicht innerhalb des Latenz-Perzentils erfolgreich antwortet (delayed)
+        
+        Liefert die Ergebnisse des aktuellen Hosts und (Erfolg, Antwortzeit) des
+        anderen Hosts bzw. None, wenn er nicht gepingt wurde.
+        """
+        probes = asyncio.ensure_future(self.probe_host(target, host))
+        if Config.HEDGE_MODE == 'delayed':
+            with target.lock:
+                delay = hedge_delay(
+                    target.latency_sketch, Config.HEDGE_QUANTILE,
+                    Config.HEDGE_MIN_DELAY_MS / 1000, Config.HEDGE_MAX_DELAY_MS / 1000
+                )
+            done, _ = await asyncio.wait({probes}, timeout=delay)
+            if done and all(success for success, _ in probes.result()):
+                return probes.result(), None
+        
+        target.hedges += 1
+        target.in_flight += 1
+        try:
+            alternate = await self.timed_probe(target, target.alternate_host(host))
+        finally:
+            target.in_flight -= 1
+        metrics.HEDGE_PROBES.inc(1, (target.key, 'success' if alternate[0] else 'failure'))
+        return await probes, alternate
+    
+    def health_failover(self, target):
+        """Wechselt den Host, sobald der andere um HEALTH_FAILOVER_MARGIN gesünder ist"""
+        if target.health.better(target.current_host, Config.HEALTH_FAILOVER_MARGIN) is None:
+            return
+        scores = target.health.snapshot()
+        self.logger.warning(f"Failover für {target.key} nach Gesundheitswerten {scores}")
+        self.switch_host(target)
+        metrics.FAILOVERS.inc(1, (target.key, 'health'))
+        # Beende aktuelles Event da wir den Host wechseln
+        if target.current_loss_event:
+            self.end_packet_loss_event(target)
+        target.consecutive_failures = 0
+    
+    async def timed_probe(self, target, host, delay=0.0):
+        """Ein Ping mit Laufzeit-Metrik (begrenzte Anzahl gleichzeitiger Pings)"""
+        if delay:
+            await asyncio.sleep(delay)
+        async with self.probe_slots:
+            started = time.perf_counter()
+            success, response_time = await self.ping_host_async(host)
+        result = 'success' if success else 'failure'
+        metrics.PROBE_DURATION.observe(time.perf_counter() - started, (self.probe_method, result))
+        metrics.PROBES.inc(1, (target.key, result))
+        return success, response_time
+    
+    async def run_targets(self):
+        """Überwacht alle Ziele gleichzeitig im Event-Loop"""
+        self.probe_slots = asyncio.Semaphore(Config.MAX_CONCURRENT_PROBES)
+        self.probe_method = self.prober.method if self.prober else 'subprocess'
+        count = len(self.targets)
+        tasks = [
+            asyncio.create_task(self.target_loop(target, target.interval * index / count))
+            for index, target in enumerate(self.targets.values())
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if self.prober:
+                self.prober.remove_readers()
+    
+    def monitor_loop(self):
+        """Hauptschleife für das Ping-Monitoring"""
+        asyncio.run(self.run_targets())
     
     def start(self):
         """Startet den Ping-Monitor"""
         self.running = True
-        self.logger.info("Ping-Monitor gestartet")
+        self.logger.info(f"Ping-Monitor gestartet ({len(self.targets)} Ziele)")
         self.monitor_loop()
     
     def stop(self):
         """Stoppt den Ping-Monitor"""
+        if not self.running and self.writer.thread is None:
+            return
         self.running = False
+        # Offene SSE-Verbindungen beenden, die Oberfläche fragt dann wieder regelmäßig ab
+        self.events.close()
         self.save_statistics()
+        if self.success_log is not None:
+            self.success_log.flush()
+        # Ausstehende Schreibzugriffe vollständig abschließen
+        self.writer.close()
+        if self.agent is not None:
+            self.agent.close()
+        if self.archiver is not None:
+            self.archiver.close()
+        if self.alerts is not None:
+            self.alerts.close()
+        if self.shared_state is not None:
+            self.shared_state.close()
+        if self.prober:
+            self.prober.close()
         self.logger.info("Ping-Monitor gestoppt")
     
     def signal_handler(self, signum, frame):
@@ -333,27 +864,55 @@ class PingMonitor:
         self.stop()
         sys.exit(0)
     
-    def get_current_stats(self):
-        """Gibt aktuelle Statistiken zurück"""
-        # Berechne durchschnittliche Response Time der letzten erfolgreichen Pings
-        recent_successful_pings = [p for p in self.recent_pings if p['success'] and p['response_time'] is not None]
-        avg_response_time = 0
-        if recent_successful_pings:
-            avg_response_time = sum(p['response_time'] for p in recent_successful_pings) / len(recent_successful_pings)
+    def get_current_stats(self, host=None):
+        """Gibt aktuelle Statistiken zurück (Standardziel oder angegebenes Ziel)"""
+        target = self.get_target(host)
+        if target is None:
+            return None
+        
+        # Durchschnittliche Response Time aus dem gleitenden Fenster (O(1))
+        windows = target.rolling.snapshot()
+        avg_response_time = windows[Config.STATS_WINDOW]['avg_response_time'] if Config.STATS_WINDOW in windows else 0
         
         return {
-            'total_pings': self.total_pings,
-            'failed_pings': self.failed_pings,
-            'packet_loss_percent': self.calculate_packet_loss(),
-            'current_host': self.current_host,
+            'host': target.key,
+            'total_pings': target.total_pings,
+            'failed_pings': target.failed_pings,
+            'packet_loss_percent': target.calculate_packet_loss(),
+            'current_host': target.current_host,
+            'interval': target.interval,
             'avg_response_time': round(avg_response_time, 2),
-            'recent_pings': list(self.recent_pings)[-100:],  # Letzte 100 Pings
+            'latency_percentiles': target.latency_percentiles(),
+            'windows': windows,
+            'quality': dict(target.quality(windows), window=Config.QUALITY_WINDOW),
+            'scheduler': {
+                'burst': target.burst,
+                'ticks': target.ticks,
+                'missed_ticks': target.missed_ticks,
+                'in_flight': target.in_flight,
+                'tick_loss_percent': target.tick_loss_percent
+            },
+            'recent_pings': target.last_pings(100),  # Letzte 100 Pings
+            'recent_summary': target.recent_summary(),
+            'loss_detector': target.loss_detector.snapshot() if target.loss_detector else None,
+            'hedging': {
+                'mode': Config.HEDGE_MODE,
+                'health': target.health.snapshot(),
+                'hedges': target.hedges
+            } if target.health is not None else None,
+            'database': self.writer.get_stats(),
+            'alerts': self.alerts.get_stats() if self.alerts is not None else None,
+            'agent': self.agent.get_stats() if self.agent is not None else None,
             'uptime': datetime.now().isoformat()
         }
+    
+    def get_all_stats(self):
+        """Gibt aktuelle Statistiken aller Ziele zurück"""
+        return {key: self.get_current_stats(key) for key in list(self.targets)}
 
 if __name__ == "__main__":
     monitor = PingMonitor()
     try:
         monitor.start()
     except KeyboardInterrupt:
-        monitor.stop()
\ No newline at end of file
+        monitor.stop()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Lese-Verbindungen für die Web-Oberfläche
+Hält langlebige, nur lesende SQLite-Verbindungen pro Datenbank vor, damit
+Anfragen weder Verbindungsaufbau noch Seiten- und Statement-Cache neu
+bezahlen. Im WAL-Modus lesen sie parallel zum Writer des Monitors
+"""
+
+import queue
+import sqlite3
+import threading
+
+class ReadPool:
+    """Pool nur lesender Verbindungen pro Datenbankpfad
+    
+    Eine Verbindung gehört immer nur einer Anfrage (acquire/release); zuletzt
+    zurückgegebene Verbindungen werden zuerst wiederverwendet, damit ihr
+    Seiten-Cache warm bleibt. Der eingebaute Flask-Server startet pro Anfrage
+    einen neuen Thread, daher werden Verbindungen nicht an Threads gebunden.
+    """
+    
+    def __init__(self, max_idle=8, cache_size_kb=8192, mmap_size_mb=256, cached_statements=256, timeout=5.0):
+        self.max_idle = max_idle
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size_mb * 1024 * 1024
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.pools = {}
+        self.lock = threading.Lock()
+        
+        # Kennzahlen
+        self.created = 0
+        self.reused = 0
+    
+    def connect(self, path):
+        """Öffnet eine neue, nur lesende Verbindung mit abgestimmten PRAGMAs"""
+        try:
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=self.timeout,
+                                   check_same_thread=False, cached_statements=self.cached_statements)
+        except sqlite3.OperationalError:
+            # Datenbank existiert noch nicht: normal öffnen, Schreiben trotzdem sperren
+            conn = sqlite3.connect(path, timeout=self.timeout, check_same_thread=False,
+                                   cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA query_only = ON')
+        conn.execute(f'PRAGMA cache_size = -{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        self.created += 1
+        return conn
+    
+    def acquire(self, path):
+        """Verbindung für eine Anfrage (aus dem Pool oder neu)"""
+        with self.lock:
+            pool = self.pools.setdefault(path, queue.LifoQueue())
+        try:
+            conn = pool.get_nowait()
+            self.reused += 1
+            return conn
+        except queue.Empty:
+            return self.connect(path)
+    
+    def release(self, path, conn):
+        """Gibt eine Verbindung zurück; überzählige werden geschlossen"""
+        try:
+            # Kein Lese-Snapshot darf über die Anfrage hinaus offen bleiben (blockiert Checkpoints)
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        pool = self.pools.get(path)
+        if pool is None or pool.qsize() >= self.max_idle:
+            conn.close()
+            return
+        pool.put(conn)
+    
+    def close(self):
+        """Schließt alle freien Verbindungen"""
+        with self.lock:
+            pools, self.pools = self.pools, {}
+        for pool in pools.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+    
+    def get_stats(self):
+        with self.lock:
+            idle = sum(pool.qsize() for pool in self.pools.values())
+        return {'created': self.created, 'reused': self.reused, 'idle': idle, 'databases': len(self.pools)}
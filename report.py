@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Offline-Berichte für Ping Monitor
+Liest Rohdaten und Loss-Events blockweise in NumPy-Arrays und berechnet pro
+Host Verfügbarkeit, MTBF/MTTR, Latenz-Perzentile, Heatmaps nach Stunde und
+Wochentag sowie eine Ausfall-Zeitleiste. Ausgabe als JSON oder HTML; der
+Speicherbedarf hängt nur von der Blockgröße ab, nicht vom Zeitraum
+"""
+
+import argparse
+import heapq
+import html
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+import partitions
+import rollups
+from export import parse_time
+from latency_sketch import LatencySketch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DAY = 86400
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+QUANTILES = (('p50', 0.50), ('p90', 0.90), ('p95', 0.95), ('p99', 0.99), ('p999', 0.999))
+
+def _keep_longest(heap, items, limit):
+    """Behält die limit größten Einträge (Schlüssel an erster Stelle) in einem Min-Heap"""
+    for item in items:
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+class HostReport:
+    """Sammelt die Kennzahlen eines Hosts über beliebig viele Blöcke"""
+    
+    def __init__(self, host, start, end, tz, min_failures=1, max_outages=20):
+        self.host = host
+        self.start = start
+        self.end = end
+        self.tz = tz
+        self.offset = tz.utcoffset(None).total_seconds()
+        self.min_failures = min_failures
+        self.max_outages = max_outages
+        
+        self.total = 0
+        self.failed = 0
+        self.first = None
+        self.last = None
+        self.rt_sum = 0.0
+        self.rt_count = 0
+        self.rt_min = None
+        self.rt_max = None
+        
+        # Antwortzeiten im Raster des LatencySketch (gleiche Genauigkeit wie /api/summary)
+        self.sketch = LatencySketch()
+        self.latency_counts = np.zeros(self.sketch.max_index + 1, dtype=np.int64)
+        self.latency_zero = 0
+        
+        # Heatmap Wochentag x Stunde (lokale Zeit mit festem Offset)
+        self.cell_total = np.zeros(7 * 24, dtype=np.int64)
+        self.cell_failed = np.zeros(7 * 24, dtype=np.int64)
+        self.cell_rt_sum = np.zeros(7 * 24)
+        self.cell_rt_count = np.zeros(7 * 24, dtype=np.int64)
+        
+        # Tageswerte für die Zeitleiste
+        self.first_day = int((start + self.offset) // DAY)
+        days = int((end + self.offset) // DAY) - self.first_day + 1
+        self.day_total = np.zeros(days, dtype=np.int64)
+        self.day_failed = np.zeros(days, dtype=np.int64)
+        self.day_downtime = np.zeros(days)
+        
+        # Ausfälle: Fehlschläge in Folge; ein laufender Ausfall wird über Blockgrenzen getragen
+        self.open_start = None
+        self.open_count = 0
+        self.outages = 0
+        self.downtime = 0.0
+        self.longest = []
+    
+    def add(self, timestamps, success, response_times):
+        """Verarbeitet einen Block (Arrays gleicher Länge, zeitlich sortiert)"""
+        if not len(timestamps):
+            return
+        failed = ~success
+        self.total += len(timestamps)
+        self.failed += int(failed.sum())
+        if self.first is None:
+            self.first = float(timestamps[0])
+        self.last = float(timestamps[-1])
+        
+        # Antwortzeiten erfolgreicher Pings
+        valid = success & ~np.isnan(response_times)
+        values = response_times[valid]
+        if len(values):
+            self.rt_sum += float(values.sum())
+            self.rt_count += len(values)
+            low, high = float(values.min()), float(values.max())
+            self.rt_min = low if self.rt_min is None else min(self.rt_min, low)
+            self.rt_max = high if self.rt_max is None else max(self.rt_max, high)
+            zero = values <= self.sketch.min_value
+            self.latency_zero += int(zero.sum())
+            indexes = np.ceil(np.log(values[~zero]) / self.sketch.log_gamma).astype(np.int64) - self.sketch.offset
+            np.minimum(indexes, self.sketch.max_index, out=indexes)
+            self.latency_counts += np.bincount(indexes, minlength=len(self.latency_counts))
+        
+        # Heatmap und Tageswerte
+        local = timestamps + self.offset
+        local_days = (local // DAY).astype(np.int64)
+        cells = ((local_days + 3) % 7) * 24 + ((local // 3600) % 24).astype(np.int64)
+        self.cell_total += np.bincount(cells, minlength=7 * 24)
+        self.cell_failed += np.bincount(cells, weights=failed, minlength=7 * 24).astype(np.int64)
+        self.cell_rt_sum += np.bincount(cells[valid], weights=response_times[valid], minlength=7 * 24)
+        self.cell_rt_count += np.bincount(cells[valid], minlength=7 * 24)
+        days = np.clip(local_days - self.first_day, 0, len(self.day_total) - 1)
+        self.day_total += np.bincount(days, minlength=len(self.day_total))
+        self.day_failed += np.bincount(days, weights=failed, minlength=len(self.day_total)).astype(np.int64)
+        
+        self._add_outages(timestamps, failed)
+    
+    def _add_outages(self, timestamps, failed):
+        """Findet Folgen von Fehlschlägen per Flankenerkennung"""
+        flags = failed.astype(np.int8)
+        edges = np.diff(np.concatenate(([1 if self.open_start is not None else 0], flags)))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        
+        run_starts = []
+        run_ends = []
+        run_counts = []
+        if self.open_start is not None and len(ends):
+            # Ausfall aus dem vorherigen Block endet mit dem ersten Erfolg
+            run_starts.append(np.array([self.open_start]))
+            run_ends.append(timestamps[ends[:1]])
+            run_counts.append(np.array([self.open_count + ends[0]]))
+            ends = ends[1:]
+            self.open_start = None
+        elif self.open_start is not None:
+            self.open_count += len(flags)
+            return
+        
+        closed = starts[:len(ends)]
+        run_starts.append(timestamps[closed])
+        run_ends.append(timestamps[ends])
+        run_counts.append(ends - closed)
+        if len(starts) > len(ends):
+            self.open_start = float(timestamps[starts[-1]])
+            self.open_count = len(flags) - starts[-1]
+        
+        self._record_outages(np.concatenate(run_starts), np.concatenate(run_ends), np.concatenate(run_counts))
+    
+    def _record_outages(self, starts, ends, counts, ongoing=False):
+        keep = counts >= self.min_failures
+        starts, ends, counts = starts[keep], ends[keep], counts[keep]
+        if not len(starts):
+            return
+        durations = ends - starts
+        self.outages += len(starts)
+        self.downtime += float(durations.sum())
+        days = np.clip(((starts + self.offset) // DAY).astype(np.int64) - self.first_day, 0, len(self.day_total) - 1)
+        self.day_downtime += np.bincount(days, weights=durations, minlength=len(self.day_total))
+        
+        # Vorauswahl in NumPy, damit nur wenige Kandidaten in Python landen (gleiche Reihenfolge wie der Heap)
+        top = np.lexsort((starts, durations))[-self.max_outages:]
+        _keep_longest(self.longest, (
+            (float(durations[i]), float(starts[i]), float(ends[i]), int(counts[i]), ongoing) for i in top
+        ), self.max_outages)
+    
+    def _format_time(self, timestamp):
+        return datetime.fromtimestamp(timestamp, self.tz).isoformat(timespec='seconds')
+    
+    def finish(self):
+        """Schließt einen noch laufenden Ausfall ab und liefert den Bericht des Hosts"""
+        if self.open_start is not None:
+            self._record_outages(np.array([self.open_start]), np.array([self.last]),
+                                 np.array([self.open_count]), ongoing=True)
+            self.open_start = None
+        
+        sketch = self.sketch
+        sketch.counts = {int(index): int(count) for index in np.flatnonzero(self.latency_counts)
+                         for count in (self.latency_counts[index],)}
+        sketch.zero_count = self.latency_zero
+        sketch.count = self.latency_zero + int(self.latency_counts.sum())
+        latency = {
+            'avg': round(self.rt_sum / self.rt_count, 3) if self.rt_count else None,
+            'min': self.rt_min,
+            'max': self.rt_max
+        }
+        for name, q in QUANTILES:
+            value = sketch.quantile(q)
+            latency[name] = round(value, 3) if value is not None else None
+        
+        observed = (self.last - self.first) if self.total else 0.0
+        outages = {
+            'count': self.outages,
+            'min_failures': self.min_failures,
+            'downtime_seconds': round(self.downtime, 1),
+            'uptime_percent': round((1 - self.downtime / observed) * 100, 4) if observed else None,
+            'mttr_seconds': round(self.downtime / self.outages, 1) if self.outages else None,
+            'mtbf_seconds': round((observed - self.downtime) / self.outages, 1) if self.outages else None,
+            'longest': [
+                {
+                    'start': self._format_time(start),
+                    'end': self._format_time(end),
+                    'duration_seconds': round(duration, 1),
+                    'failed_pings': count,
+                    'ongoing': ongoing
+                }
+                for duration, start, end, count, ongoing in sorted(self.longest, reverse=True)
+            ]
+        }
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            loss = np.where(self.cell_total > 0, self.cell_failed / np.maximum(self.cell_total, 1) * 100, np.nan)
+            response = np.where(self.cell_rt_count > 0, self.cell_rt_sum / np.maximum(self.cell_rt_count, 1), np.nan)
+        heatmaps = {
+            'weekdays': list(WEEKDAYS),
+            'loss_percent': _matrix(loss.reshape(7, 24)),
+            'avg_response_time': _matrix(response.reshape(7, 24)),
+            'pings': self.cell_total.reshape(7, 24).tolist()
+        }
+        
+        timeline = []
+        for index in np.flatnonzero(self.day_total):
+            day = datetime.fromtimestamp((self.first_day + int(index)) * DAY - self.offset, self.tz)
+            total, failed = int(self.day_total[index]), int(self.day_failed[index])
+            timeline.append({
+                'date': day.date().isoformat(),
+                'total_pings': total,
+                'failed_pings': failed,
+                'packet_loss_percent': round(failed / total * 100, 3),
+                'downtime_seconds': round(float(self.day_downtime[index]), 1)
+            })
+        
+        return {
+            'host': self.host,
+            'first_ping': self._format_time(self.first) if self.total else None,
+            'last_ping': self._format_time(self.last) if self.total else None,
+            'total_pings': self.total,
+            'failed_pings': self.failed,
+            'availability_percent': round((self.total - self.failed) / self.total * 100, 4) if self.total else None,
+            'latency': latency,
+            'outages': outages,
+            'heatmaps': heatmaps,
+            'timeline': timeline
+        }
+
+def _matrix(values):
+    return [[None if np.isnan(value) else round(float(value), 3) for value in row] for row in values]
+
+def list_hosts(conn, start, end):
+    """Hosts mit Daten im Zeitraum (aus den Tages-Rollups, sonst aus den Rohdaten)"""
+    try:
+        rows = conn.execute(
+            f'SELECT DISTINCT host FROM {rollups.table_name("1d")} WHERE bucket_start >= ? AND bucket_start < ?',
+            (int(start // DAY) * DAY, end)
+        ).fetchall()
+        if rows:
+            return sorted(row[0] for row in rows)
+    except sqlite3.OperationalError:
+        pass
+    hosts = set()
+    for table in partitions.partitions_for_range(conn, start, end):
+        hosts.update(row[0] for row in conn.execute(f'SELECT DISTINCT host FROM {table}'))
+    return sorted(hosts)
+
+def report_host(conn, host, start, end, tz, chunk_size, min_failures, max_outages):
+    """Liest die Rohdaten eines Hosts blockweise und berechnet seinen Bericht"""
+    host_report = HostReport(host, start, end, tz, min_failures, max_outages)
+    columns = f'{partitions.EPOCH_COLUMN}, success, response_time'
+    for rows in partitions.iter_batches(conn, columns, start, end, host, batch_size=chunk_size):
+        # None (fehlende Antwortzeit) wird zu NaN
+        block = np.array(rows, dtype=np.float64)
+        host_report.add(block[:, 0], block[:, 1] > 0, block[:, 2])
+    return host_report.finish()
+
+def report_events(conn, start, end, hosts, chunk_size, max_events):
+    """Fasst Packet Loss Events (nach Typ und Schweregrad) und die längsten Events zusammen"""
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(packet_loss_events)')]
+    if not columns:
+        return {}
+    event_type = 'event_type' if 'event_type' in columns else "'outage'"
+    severity = 'severity' if 'severity' in columns else 'NULL'
+    # Events werden in lokaler Zeit gespeichert
+    cursor = conn.execute(f'''
+        SELECT host, {event_type}, {severity}, start_time, end_time, COALESCE(duration_seconds, 0)
+        FROM packet_loss_events
+        WHERE start_time >= ? AND start_time < ?
+        ORDER BY start_time
+    ''', (datetime.fromtimestamp(start).strftime('%Y-%m-%d %H:%M:%S'),
+          datetime.fromtimestamp(end).strftime('%Y-%m-%d %H:%M:%S')))
+    
+    summary = {}
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for host, kind, level, started, ended, duration in rows:
+            if hosts and host not in hosts:
+                continue
+            entry = summary.setdefault(host, {}).setdefault(kind, {
+                'count': 0, 'duration_seconds': 0, 'by_severity': {}, 'longest': []
+            })
+            entry['count'] += 1
+            entry['duration_seconds'] += duration
+            key = level or 'unknown'
+            entry['by_severity'][key] = entry['by_severity'].get(key, 0) + 1
+            _keep_longest(entry['longest'], [(duration, started, ended, level)], max_events)
+    
+    for kinds in summary.values():
+        for entry in kinds.values():
+            entry['longest'] = [
+                {'start_time': started, 'end_time': ended, 'duration_seconds': duration, 'severity': level}
+                for duration, started, ended, level in sorted(entry['longest'], reverse=True)
+            ]
+    return summary
+
+def build_report(db_path, start, end, hosts=None, tz=None, chunk_size=500000, min_failures=1, max_outages=20):
+    """Erstellt den vollständigen Bericht als Dict"""
+    tz = tz or datetime.now().astimezone().tzinfo
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        hosts = hosts or list_hosts(conn, start, end)
+        started = time.perf_counter()
+        result = {
+            'generated_at': datetime.now(tz).isoformat(timespec='seconds'),
+            'database': db_path,
+            'range': {
+                'start': datetime.fromtimestamp(start, tz).isoformat(timespec='seconds'),
+                'end': datetime.fromtimestamp(end, tz).isoformat(timespec='seconds')
+            },
+            'utc_offset_hours': tz.utcoffset(None).total_seconds() / 3600,
+            'hosts': {
+                host: report_host(conn, host, start, end, tz, chunk_size, min_failures, max_outages)
+                for host in hosts
+            },
+            'events': report_events(conn, start, end, hosts, chunk_size, max_outages)
+        }
+        result['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+        return result
+    finally:
+        conn.close()
+
+def _cell_color(loss):
+    if loss is None:
+        return '#f1f3f5'
+    # Grün (0%) bis Rot (ab 5%)
+    ratio = min(loss / 5.0, 1.0)
+    return f'rgb({int(40 + 200 * ratio)}, {int(167 - 120 * ratio)}, 69)'
+
+def render_html(report):
+    """Stellt den Bericht als eigenständige HTML-Seite dar"""
+    escape = html.escape
+    parts = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Ping Monitor Report</title><style>',
+        'body{font-family:-apple-system,Segoe UI,Roboto,sans-serif;margin:2rem;color:#212529}',
+        'table{border-collapse:collapse;margin:0.5rem 0 1.5rem}td,th{border:1px solid #dee2e6;padding:4px 8px;'
+        'text-align:right}th{background:#f8f9fa}.heat td{width:22px;height:18px;padding:0}'
+        '.bar{background:#dc3545;height:10px}h2{border-bottom:2px solid #dee2e6;padding-bottom:4px}',
+        '</style></head><body>',
+        f'<h1>Ping Monitor Report</h1><p>{escape(report["range"]["start"])} &ndash; '
+        f'{escape(report["range"]["end"])} (generated {escape(report["generated_at"])})</p>'
+    ]
+    for host, data in report['hosts'].items():
+        outages = data['outages']
+        latency = data['latency']
+        parts.append(f'<h2>{escape(host)}</h2><table>')
+        for label, value in (
+            ('Pings', data['total_pings']), ('Failed', data['failed_pings']),
+            ('Availability %', data['availability_percent']), ('Uptime %', outages['uptime_percent']),
+            ('Outages', outages['count']), ('Downtime s', outages['downtime_seconds']),
+            ('MTTR s', outages['mttr_seconds']), ('MTBF s', outages['mtbf_seconds'])
+        ):
+            parts.append(f'<tr><th>{label}</th><td>{escape(str(value))}</td></tr>')
+        parts.append('</table><table><tr>' + ''.join(f'<th>{escape(name)}</th>' for name in latency) + '</tr><tr>')
+        parts.append(''.join(f'<td>{escape(str(value))}</td>' for value in latency.values()) + '</tr></table>')
+        
+        parts.append('<h3>Packet loss by weekday and hour</h3><table class="heat"><tr><th></th>')
+        parts.append(''.join(f'<th>{hour}</th>' for hour in range(24)) + '</tr>')
+        for weekday, row in zip(WEEKDAYS, data['heatmaps']['loss_percent']):
+            parts.append(f'<tr><th>{weekday}</th>' + ''.join(
+                f'<td style="background:{_cell_color(value)}" title="{value}%"></td>' for value in row) + '</tr>')
+        parts.append('</table>')
+        
+        if outages['longest']:
+            parts.append('<h3>Longest outages</h3><table><tr><th>Start</th><th>End</th><th>Duration s</th>'
+                         '<th>Failed pings</th></tr>')
+            for outage in outages['longest']:
+                parts.append(f'<tr><td>{escape(outage["start"])}</td><td>{escape(outage["end"])}'
+                             f'{" (ongoing)" if outage["ongoing"] else ""}</td><td>{outage["duration_seconds"]}</td>'
+                             f'<td>{outage["failed_pings"]}</td></tr>')
+            parts.append('</table>')
+        
+        parts.append('<h3>Daily timeline</h3><table><tr><th>Date</th><th>Pings</th><th>Loss %</th>'
+                     '<th>Downtime s</th><th></th></tr>')
+        worst = max((day['packet_loss_percent'] for day in data['timeline']), default=0) or 1
+        for day in data['timeline']:
+            width = int(day['packet_loss_percent'] / worst * 200)
+            parts.append(f'<tr><td>{day["date"]}</td><td>{day["total_pings"]}</td>'
+                         f'<td>{day["packet_loss_percent"]}</td><td>{day["downtime_seconds"]}</td>'
+                         f'<td style="text-align:left"><div class="bar" style="width:{width}px"></div></td></tr>')
+        parts.append('</table>')
+    
+    if report['events']:
+        parts.append('<h2>Packet loss events</h2><table><tr><th>Host</th><th>Type</th><th>Count</th>'
+                     '<th>Duration s</th><th>Severity</th></tr>')
+        for host, kinds in report['events'].items():
+            for kind, entry in kinds.items():
+                severities = ', '.join(f'{name}: {count}' for name, count in sorted(entry['by_severity'].items()))
+                parts.append(f'<tr><td>{escape(host)}</td><td>{escape(kind)}</td><td>{entry["count"]}</td>'
+                             f'<td>{entry["duration_seconds"]}</td><td>{escape(severities)}</td></tr>')
+        parts.append('</table>')
+    parts.append('</body></html>')
+    return '\n'.join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description='Verfügbarkeits- und Latenzbericht aus der Ping-Monitor-Datenbank')
+    parser.add_argument('--db', help='Datenbank (Standard: DATABASE_PATH)')
+    parser.add_argument('--start', help='Beginn (Unix-Zeit oder ISO-Datum, ohne Zeitzone UTC)')
+    parser.add_argument('--end', help='Ende (Standard: jetzt)')
+    parser.add_argument('--days', type=float, default=30.0, help='Zeitraum in Tagen, falls --start fehlt')
+    parser.add_argument('--host', action='append', help='Nur diesen Host (mehrfach möglich)')
+    parser.add_argument('--format', choices=('json', 'html'), help='Ausgabeformat (Standard: nach Dateiendung)')
+    parser.add_argument('--output', '-o', default='-', help='Ausgabedatei (Standard: stdout)')
+    parser.add_argument('--utc-offset', type=float, help='Zeitzone für Heatmaps und Tage in Stunden (Standard: lokal)')
+    parser.add_argument('--min-failures', type=int, default=1, help='Ausfall ab X Fehlschlägen in Folge')
+    parser.add_argument('--max-outages', type=int, default=20, help='Längste Ausfälle/Events im Bericht')
+    parser.add_argument('--chunk-size', type=int, default=500000, help='Zeilen pro Block')
+    args = parser.parse_args()
+    
+    if np is None:
+        print("❌ report.py benötigt NumPy: pip install numpy (bzw. apt install python3-numpy)", file=sys.stderr)
+        sys.exit(2)
+    
+    from config import Config
+    db_path = args.db or Config.DATABASE_PATH
+    try:
+        end = parse_time(args.end) if args.end else time.time()
+        start = parse_time(args.start) if args.start else end - args.days * DAY
+    except ValueError as e:
+        parser.error(f"Ungültiger Zeitpunkt: {e}")
+    if start >= end:
+        parser.error("--start muss vor --end liegen")
+    tz = timezone(timedelta(hours=args.utc_offset)) if args.utc_offset is not None else None
+    fmt = args.format or ('html' if args.output.endswith(('.html', '.htm')) else 'json')
+    
+    try:
+        report = build_report(db_path, start, end, args.host, tz, args.chunk_size, args.min_failures, args.max_outages)
+    except sqlite3.OperationalError as e:
+        print(f"❌ Datenbank {db_path} nicht lesbar: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    output = render_html(report) if fmt == 'html' else json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"✅ Bericht für {len(report['hosts'])} Hosts in {report['elapsed_seconds']}s: {args.output}",
+              file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Antwort-Cache für die Lese-API
+Hält serialisierte JSON-Antworten pro normalisierter Anfrage, solange sich
+die Schreib-Generation der Datenbank nicht geändert hat (LRU mit
+Größenbegrenzung). Liefert ETag/Last-Modified für bedingte Anfragen
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+
+class CacheEntry:
+    """Zwischengespeicherte Antwort"""
+    
+    __slots__ = ('generation', 'body', 'etag', 'last_modified')
+    
+    def __init__(self, generation, body, last_modified):
+        self.generation = generation
+        self.body = body
+        # Inhaltsbasiert, damit unveränderte Antworten auch über Generationen hinweg 304 liefern
+        self.etag = f'{zlib.crc32(body):08x}-{len(body):x}'
+        self.last_modified = last_modified
+
+class ResponseCache:
+    """LRU-Cache für Antworten, begrenzt nach Anzahl und Bytes"""
+    
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        
+        # Kennzahlen
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(path, args):
+        """Normalisierter Schlüssel aus Pfad und Query-Parametern (Reihenfolge egal)"""
+        return (path, tuple(sorted((name, tuple(values)) for name, values in args.lists())))
+    
+    def get(self, key, generation):
+        """Liefert die Antwort, falls sie zur aktuellen Generation gehört"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.generation != generation:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key, generation, body, last_modified):
+        """Speichert eine Antwort und verdrängt bei Bedarf die ältesten Einträge"""
+        entry = CacheEntry(generation, body, last_modified)
+        if len(body) > self.max_bytes:
+            return entry
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.body)
+            self.entries[key] = entry
+            self.size += len(body)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.body)
+                self.evictions += 1
+        return entry
+    
+    def clear(self):
+        """Leert den Cache"""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+    
+    def get_stats(self):
+        """Gibt Kennzahlen des Caches zurück"""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Spaltenbasierter Ringpuffer für die letzten Pings
+Zeitstempel, Antwortzeit, Packet Loss und Erfolg liegen in parallelen
+Arrays fester Größe, Hosts als internierte IDs. Dicts entstehen erst an
+der API-Grenze
+"""
+
+from array import array
+from datetime import datetime
+
+# Fehlende Antwortzeiten werden als NaN gespeichert; NaN ist mit nichts vergleichbar
+_MISSING = float('nan')
+_has_value = (0.0).__le__
+
+class PingRingBuffer:
+    """Ringpuffer fester Kapazität mit Spalten für Zeit, Host, Erfolg, RTT und Loss"""
+    
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("Kapazität muss größer als 0 sein")
+        self.capacity = capacity
+        # Vorab allokiert - Arrays werden nie vergrößert, Views bleiben gültig
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.response_times = array('d', bytes(8 * capacity))
+        self.packet_loss = array('d', bytes(8 * capacity))
+        self.success = array('b', bytes(capacity))
+        self.host_ids = array('H', bytes(2 * capacity))
+        # Internierte Hostnamen: ID -> Name und Name -> ID
+        self.hosts = []
+        self.host_index = {}
+        self.end = 0
+        self.size = 0
+    
+    def __len__(self):
+        return self.size
+    
+    def __iter__(self):
+        return iter(self.to_dicts())
+    
+    def intern(self, host):
+        """Liefert die ID eines Hosts und legt sie bei Bedarf an"""
+        host_id = self.host_index.get(host)
+        if host_id is None:
+            host_id = len(self.hosts)
+            self.hosts.append(host)
+            self.host_index[host] = host_id
+        return host_id
+    
+    def append(self, timestamp, host, success, response_time, packet_loss):
+        """Hängt einen Ping an und überschreibt bei voller Kapazität den ältesten"""
+        slot = self.end
+        self.timestamps[slot] = timestamp
+        self.host_ids[slot] = self.intern(host)
+        self.success[slot] = 1 if success else 0
+        self.response_times[slot] = response_time if success and response_time is not None else _MISSING
+        self.packet_loss[slot] = packet_loss if packet_loss is not None else 0.0
+        self.end = (slot + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+    
+    def clear(self):
+        """Leert den Puffer (Kapazität und Host-IDs bleiben erhalten)"""
+        self.end = 0
+        self.size = 0
+    
+    def segments(self, count=None):
+        """Zusammenhängende Indexbereiche der letzten count Pings (höchstens zwei)"""
+        count = self.size if count is None else max(0, min(count, self.size))
+        start = self.end - count
+        if start >= 0:
+            return [(start, self.end)] if count else []
+        return [(self.capacity + start, self.capacity), (0, self.end)]
+    
+    def column(self, name, count=None):
+        """Kopierfreie memoryview-Abschnitte einer Spalte für die letzten count Pings
+        
+        Die Views zeigen direkt in den Puffer und sind nur gültig, solange
+        nicht weiter angehängt wird (beim Besitzer unter dessen Lock verwenden).
+        """
+        view = memoryview(getattr(self, name))
+        return [view[start:stop] for start, stop in self.segments(count)]
+    
+    def aggregate(self, count=None):
+        """Kennzahlen der letzten count Pings, ohne Dicts zu erzeugen"""
+        success = self.column('success', count)
+        response_times = self.column('response_times', count)
+        total = sum(len(part) for part in success)
+        succeeded = sum(sum(part) for part in success)
+        # filter() mit eingebautem Vergleich läuft ohne Python-Funktionsaufrufe pro Wert
+        values = [list(filter(_has_value, part)) for part in response_times]
+        minimums = [min(part) for part in values if part]
+        maximums = [max(part) for part in values if part]
+        rt_count = sum(len(part) for part in values)
+        rt_sum = sum(sum(part) for part in values)
+        return {
+            'total_pings': total,
+            'failed_pings': total - succeeded,
+            'packet_loss_percent': round((total - succeeded) / total * 100, 2) if total else 0.0,
+            'avg_response_time': round(rt_sum / rt_count, 2) if rt_count else 0,
+            'min_response_time': min(minimums) if minimums else None,
+            'max_response_time': max(maximums) if maximums else None
+        }
+    
+    def to_dicts(self, count=None):
+        """Erzeugt API-Dicts der letzten count Pings (älteste zuerst)"""
+        results = []
+        for start, stop in self.segments(count):
+            for slot in range(start, stop):
+                response_time = self.response_times[slot]
+                results.append({
+                    'timestamp': datetime.fromtimestamp(self.timestamps[slot]).isoformat(),
+                    'host': self.hosts[self.host_ids[slot]],
+                    'success': bool(self.success[slot]),
+                    'response_time': response_time if _has_value(response_time) else None,
+                    'packet_loss': self.packet_loss[slot]
+                })
+        return results
+    
+    def memory_bytes(self):
+        """Speicherbedarf der Spalten in Bytes"""
+        return sum(column.itemsize * len(column) for column in (
+            self.timestamps, self.response_times, self.packet_loss, self.success, self.host_ids
+        ))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Gleitende Statistiken für Ping Monitor
+Hält laufende Summen, Zähler und Min/Max über feste Zeitfenster, damit
+Statistik-Abfragen nicht die letzten Pings erneut durchsuchen müssen
+"""
+
+import threading
+import time
+
+class RollingWindow:
+    """Gleitendes Zeitfenster aus einer festen Anzahl Teil-Buckets"""
+    
+    def __init__(self, duration, buckets=60):
+        self.duration = duration
+        self.buckets = buckets
+        self.bucket_size = duration / buckets
+        
+        # Werte pro Teil-Bucket (Ringpuffer)
+        self.counts = [0] * buckets
+        self.failures = [0] * buckets
+        self.rt_sums = [0.0] * buckets
+        self.rt_counts = [0] * buckets
+        self.rt_mins = [None] * buckets
+        self.rt_maxs = [None] * buckets
+        self.current = None
+        
+        # Laufende Summen über das ganze Fenster
+        self.count = 0
+        self.failed = 0
+        self.rt_sum = 0.0
+        self.rt_count = 0
+        self.rt_min = None
+        self.rt_max = None
+    
+    def advance(self, now):
+        """Verwirft Teil-Buckets, die aus dem Fenster gefallen sind"""
+        index = int(now // self.bucket_size)
+        if self.current is None:
+            self.current = index
+            return
+        if index <= self.current:
+            return
+        
+        # Höchstens einmal über alle Teil-Buckets laufen
+        for step in range(1, min(index - self.current, self.buckets) + 1):
+            slot = (self.current + step) % self.buckets
+            self.count -= self.counts[slot]
+            self.failed -= self.failures[slot]
+            self.rt_sum -= self.rt_sums[slot]
+            self.rt_count -= self.rt_counts[slot]
+            self.counts[slot] = 0
+            self.failures[slot] = 0
+            self.rt_sums[slot] = 0.0
+            self.rt_counts[slot] = 0
+            self.rt_mins[slot] = None
+            self.rt_maxs[slot] = None
+        self.current = index
+        if self.rt_count == 0:
+            # Rundungsfehler der laufenden Summe nicht ansammeln
+            self.rt_sum = 0.0
+        
+        # Min/Max nur beim Bucket-Wechsel neu bestimmen
+        mins = [value for value in self.rt_mins if value is not None]
+        maxs = [value for value in self.rt_maxs if value is not None]
+        self.rt_min = min(mins) if mins else None
+        self.rt_max = max(maxs) if maxs else None
+    
+    def add(self, now, success, response_time):
+        """Nimmt ein Ping-Ergebnis auf"""
+        self.advance(now)
+        slot = self.current % self.buckets
+        self.counts[slot] += 1
+        self.count += 1
+        if not success:
+            self.failures[slot] += 1
+            self.failed += 1
+        elif response_time is not None:
+            self.rt_sums[slot] += response_time
+            self.rt_sum += response_time
+            self.rt_counts[slot] += 1
+            self.rt_count += 1
+            if self.rt_mins[slot] is None or response_time < self.rt_mins[slot]:
+                self.rt_mins[slot] = response_time
+            if self.rt_maxs[slot] is None or response_time > self.rt_maxs[slot]:
+                self.rt_maxs[slot] = response_time
+            if self.rt_min is None or response_time < self.rt_min:
+                self.rt_min = response_time
+            if self.rt_max is None or response_time > self.rt_max:
+                self.rt_max = response_time
+    
+    def loss_percent(self):
+        """Packet Loss im Fenster in Prozent"""
+        return (self.failed / self.count * 100) if self.count else 0.0
+    
+    def summary(self):
+        """Kennzahlen des Fensters"""
+        return {
+            'total_pings': self.count,
+            'failed_pings': self.failed,
+            'packet_loss_percent': round(self.loss_percent(), 2),
+            'avg_response_time': round(self.rt_sum / self.rt_count, 2) if self.rt_count else 0,
+            'min_response_time': self.rt_min,
+            'max_response_time': self.rt_max
+        }
+
+class RollingStats:
+    """Thread-sichere Sammlung gleitender Fenster für ein Ziel"""
+    
+    def __init__(self, windows, buckets=60, clock=time.monotonic):
+        self.windows = {name: RollingWindow(duration, buckets) for name, duration in windows.items()}
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._snapshot = None
+    
+    def add(self, success, response_time, now=None):
+        """Aktualisiert alle Fenster mit einem Ping-Ergebnis"""
+        now = self.clock() if now is None else now
+        with self.lock:
+            for window in self.windows.values():
+                window.add(now, success, response_time)
+            self._snapshot = None
+    
+    def loss_percent(self, name):
+        """Packet Loss eines Fensters in Prozent"""
+        with self.lock:
+            window = self.windows[name]
+            window.advance(self.clock())
+            return window.loss_percent()
+    
+    def snapshot(self):
+        """Kennzahlen aller Fenster (zwischengespeichert bis zum nächsten Ping)"""
+        with self.lock:
+            now = self.clock()
+            stale = any(int(now // w.bucket_size) != w.current for w in self.windows.values())
+            if self._snapshot is None or stale:
+                for window in self.windows.values():
+                    window.advance(now)
+                self._snapshot = {name: window.summary() for name, window in self.windows.items()}
+            return self._snapshot
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+Rollup-Tabellen für Ping Monitor
+Verdichtet die Rohdaten-Partitionen zu Minuten-, Stunden- und Tageswerten pro Host,
+damit Zusammenfassungen und Verläufe nicht die Rohdaten scannen müssen
+"""
+
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from call_quality import JitterEstimator, mos, r_factor
+from latency_sketch import LatencySketch
+from partitions import earliest_timestamp, partitions_for_range
+
+# Auflösung -> Bucket-Größe in Sekunden (grob nach fein)
+RESOLUTIONS = {
+    '1d': 86400,
+    '1h': 3600,
+    '1m': 60,
+}
+
+# Bestehende Buckets beim Einfügen aufaddieren statt zu überschreiben
+_UPSERT_ADD = '''ON CONFLICT (host, bucket_start) DO UPDATE SET
+                total_pings = total_pings + excluded.total_pings,
+                failed_pings = failed_pings + excluded.failed_pings,
+                response_time_sum = response_time_sum + excluded.response_time_sum,
+                response_time_count = response_time_count + excluded.response_time_count,
+                jitter_sum = jitter_sum + excluded.jitter_sum,
+                jitter_count = jitter_count + excluded.jitter_count,
+                min_response_time = COALESCE(MIN(min_response_time, excluded.min_response_time),
+                                             min_response_time, excluded.min_response_time),
+                max_response_time = COALESCE(MAX(max_response_time, excluded.max_response_time),
+                                             max_response_time, excluded.max_response_time)'''
+
+def table_name(resolution):
+    """Tabellenname einer Rollup-Auflösung"""
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unbekannte Auflösung: {resolution}")
+    return f"ping_rollup_{resolution}"
+
+def init_rollups(cursor):
+    """Legt Rollup-Tabellen und Indizes an"""
+    for resolution in RESOLUTIONS:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table_name(resolution)} (
+                host TEXT NOT NULL,
+                bucket_start INTEGER NOT NULL,
+                total_pings INTEGER NOT NULL DEFAULT 0,
+                failed_pings INTEGER NOT NULL DEFAULT 0,
+                response_time_sum REAL NOT NULL DEFAULT 0,
+                response_time_count INTEGER NOT NULL DEFAULT 0,
+                min_response_time REAL,
+                max_response_time REAL,
+                latency_sketch BLOB,
+                jitter_sum REAL NOT NULL DEFAULT 0,
+                jitter_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (host, bucket_start)
+            ) WITHOUT ROWID
+        ''')
+        # Ältere Rollup-Tabellen um den Quantil-Sketch erweitern
+        columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table_name(resolution)})')]
+        if 'latency_sketch' not in columns:
+            cursor.execute(f'ALTER TABLE {table_name(resolution)} ADD COLUMN latency_sketch BLOB')
+        # ... und um den Jitter (Summe und Anzahl der RFC-3550-Werte)
+        if 'jitter_sum' not in columns:
+            cursor.execute(f'ALTER TABLE {table_name(resolution)} ADD COLUMN jitter_sum REAL NOT NULL DEFAULT 0')
+            cursor.execute(f'ALTER TABLE {table_name(resolution)} ADD COLUMN jitter_count INTEGER NOT NULL DEFAULT 0')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{table_name(resolution)}_bucket
+            ON {table_name(resolution)} (bucket_start)
+        ''')
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ping_results_host_timestamp ON ping_results (host, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ping_results_timestamp ON ping_results (timestamp)')
+
+def rollups_missing(cursor):
+    """Prüft, ob die Rollup-Tabellen noch nicht angelegt wurden"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name('1m'),))
+    return cursor.fetchone() is None
+
+def aggregate_rows(rows, jitter=None):
+    """Verdichtet (epoch, host, success, response_time) zu Buckets aller Auflösungen
+    
+    Jeder Bucket enthält [total, failed, rt_sum, rt_count, rt_min, rt_max, rt_werte,
+    jitter_sum, jitter_count]. jitter ist ein Dict Host -> JitterEstimator, das über
+    mehrere Aufrufe erhalten bleibt; ohne Dict wird kein Jitter erfasst.
+    """
+    aggregates = {}
+    for timestamp, host, success, response_time in rows:
+        value = None
+        if jitter is not None:
+            estimator = jitter.get(host)
+            if estimator is None:
+                estimator = jitter[host] = JitterEstimator()
+            value = estimator.add(success, response_time)
+        for resolution, size in RESOLUTIONS.items():
+            key = (resolution, host, int(timestamp // size) * size)
+            bucket = aggregates.get(key)
+            if bucket is None:
+                bucket = aggregates[key] = [0, 0, 0.0, 0, None, None, [], 0.0, 0]
+            bucket[0] += 1
+            if not success:
+                bucket[1] += 1
+            elif response_time is not None:
+                bucket[2] += response_time
+                bucket[3] += 1
+                bucket[4] = response_time if bucket[4] is None else min(bucket[4], response_time)
+                bucket[5] = response_time if bucket[5] is None else max(bucket[5], response_time)
+                bucket[6].append(response_time)
+                if value is not None:
+                    bucket[7] += value
+                    bucket[8] += 1
+    return aggregates
+
+def apply_rollups(cursor, aggregates):
+    """Addiert verdichtete Buckets per UPSERT in die Rollup-Tabellen"""
+    by_resolution = {}
+    for (resolution, host, bucket_start), values in aggregates.items():
+        by_resolution.setdefault(resolution, []).append((host, bucket_start, *values[:6], *values[7:9]))
+    
+    for resolution, rows in by_resolution.items():
+        cursor.executemany(f'''
+            INSERT INTO {table_name(resolution)}
+                (host, bucket_start, total_pings, failed_pings, response_time_sum,
+                 response_time_count, min_response_time, max_response_time, jitter_sum, jitter_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            {_UPSERT_ADD}
+        ''', rows)
+
+class SketchCache:
+    """Hält die Sketches der zuletzt beschriebenen Buckets im Speicher
+    
+    So muss beim Fortschreiben nicht jedes Mal der gespeicherte Sketch
+    gelesen werden - nur beim ersten Zugriff auf einen Bucket.
+    """
+    
+    def __init__(self):
+        self.current = {}
+    
+    def apply(self, cursor, aggregates):
+        """Ergänzt die Sketches der betroffenen Buckets und schreibt sie zurück"""
+        rows = {}
+        for (resolution, host, bucket_start), values in aggregates.items():
+            if not values[6]:
+                continue
+            cached = self.current.get((resolution, host))
+            if cached is None or cached[0] != bucket_start:
+                cursor.execute(f'''
+                    SELECT latency_sketch FROM {table_name(resolution)}
+                    WHERE host = ? AND bucket_start = ?
+                ''', (host, bucket_start))
+                row = cursor.fetchone()
+                sketch = LatencySketch.from_bytes(row[0]) if row and row[0] else LatencySketch()
+                cached = (bucket_start, sketch)
+                self.current[(resolution, host)] = cached
+            for value in values[6]:
+                cached[1].add(value)
+            rows.setdefault(resolution, []).append((cached[1].to_bytes(), host, bucket_start))
+        
+        for resolution, updates in rows.items():
+            cursor.executemany(f'''
+                UPDATE {table_name(resolution)} SET latency_sketch = ?
+                WHERE host = ? AND bucket_start = ?
+            ''', updates)
+    
+    def invalidate(self):
+        """Verwirft den Zwischenspeicher (z.B. nach zurückgerollter Transaktion)"""
+        self.current.clear()
+
+def rebuild_sketches(cursor, starts=None):
+    """Berechnet Sketches und Jitter der Rollup-Buckets aus den Rohdaten neu
+    
+    starts: erster neu zu berechnender Bucket pro Auflösung (None = alle).
+    """
+    since = min(starts.values()) if starts else None
+    # Pro Host und Auflösung ist immer nur ein Bucket offen (Partitionen aufsteigend, sortierte Rohdaten)
+    open_buckets = {}
+    updates = {resolution: [] for resolution in RESOLUTIONS}
+    jitter = {}
+    
+    def close_bucket(resolution, host, bucket_start, sketch, jitter_sum, jitter_count):
+        updates[resolution].append((sketch.to_bytes(), jitter_sum, jitter_count, host, bucket_start))
+    
+    read_cursor = cursor.connection.cursor()
+    for partition in partitions_for_range(cursor.connection, since):
+        sql = f'''
+            SELECT CAST(strftime('%s', timestamp) AS REAL), host, success, response_time
+            FROM {partition}
+        '''
+        params = ()
+        if since is not None:
+            sql += ' WHERE timestamp >= ?'
+            params = (format_bucket(since),)
+        sql += ' ORDER BY host, timestamp'
+        
+        for timestamp, host, success, response_time in read_cursor.execute(sql, params):
+            if not success or response_time is None:
+                continue
+            estimator = jitter.get(host)
+            if estimator is None:
+                estimator = jitter[host] = JitterEstimator()
+            value = estimator.add(success, response_time)
+            for resolution, size in RESOLUTIONS.items():
+                bucket_start = int(timestamp // size) * size
+                if starts and bucket_start < starts[resolution]:
+                    continue
+                current = open_buckets.get((resolution, host))
+                if current is None or current[0] != bucket_start:
+                    if current is not None:
+                        close_bucket(resolution, host, *current)
+                    current = [bucket_start, LatencySketch(), 0.0, 0]
+                    open_buckets[(resolution, host)] = current
+                current[1].add(response_time)
+                if value is not None:
+                    current[2] += value
+                    current[3] += 1
+            
+            for resolution, pending in updates.items():
+                if len(pending) >= 1000:
+                    _write_sketches(cursor, resolution, pending)
+                    pending.clear()
+    
+    for (resolution, host), current in open_buckets.items():
+        close_bucket(resolution, host, *current)
+    for resolution, pending in updates.items():
+        _write_sketches(cursor, resolution, pending)
+
+def _write_sketches(cursor, resolution, updates):
+    cursor.executemany(f'''
+        UPDATE {table_name(resolution)} SET latency_sketch = ?, jitter_sum = ?, jitter_count = ?
+        WHERE host = ? AND bucket_start = ?
+    ''', updates)
+
+def rebuild_rollups(conn, since=None):
+    """Berechnet die Rollups aus den Rohdaten neu (optional ab Unix-Zeitstempel)
+    
+    Buckets vor den ältesten noch vorhandenen Rohdaten bleiben unverändert,
+    damit die Aufbewahrung keine verdichteten Werte mitnimmt.
+    """
+    with conn:
+        cursor = conn.cursor()
+        init_rollups(cursor)
+        earliest = earliest_timestamp(conn)
+        if earliest is None:
+            return
+        start = earliest if since is None else max(since, earliest)
+        partitions = partitions_for_range(conn, start)
+        starts = {}
+        for resolution, size in RESOLUTIONS.items():
+            table = table_name(resolution)
+            # Nur Buckets, die vollständig durch Rohdaten abgedeckt sind
+            bucket_from = int(start // size) * size
+            if bucket_from < earliest:
+                bucket_from += size
+            starts[resolution] = bucket_from
+            cursor.execute(f'DELETE FROM {table} WHERE bucket_start >= ?', (bucket_from,))
+            where = 'WHERE timestamp >= ?'
+            params = (format_bucket(bucket_from),)
+            
+            # Pro Partition aggregieren; Buckets aus mehreren Tabellen werden addiert
+            for partition in partitions:
+                cursor.execute(f'''
+                    INSERT INTO {table}
+                        (host, bucket_start, total_pings, failed_pings, response_time_sum,
+                         response_time_count, min_response_time, max_response_time)
+                    SELECT host,
+                           CAST(strftime('%s', timestamp) AS INTEGER) / {size} * {size} AS bucket,
+                           COUNT(*),
+                           SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END),
+                           COALESCE(SUM(CASE WHEN success = 1 THEN response_time END), 0),
+                           COUNT(CASE WHEN success = 1 THEN response_time END),
+                           MIN(CASE WHEN success = 1 THEN response_time END),
+                           MAX(CASE WHEN success = 1 THEN response_time END)
+                    FROM {partition}
+                    {where}
+                    GROUP BY host, bucket
+                    {_UPSERT_ADD}
+                ''', params)
+        
+        rebuild_sketches(cursor, starts)
+
+def plan_segments(start, end):
+    """Zerlegt [start, end) in möglichst grobe, vollständig enthaltene Buckets
+    
+    Liefert eine Liste von (Auflösung, bucket_von, bucket_bis). Die Ränder
+    werden auf volle Minuten erweitert.
+    """
+    start = int(start // 60) * 60
+    end = -int(-end // 60) * 60
+    levels = list(RESOLUTIONS.items())
+    segments = []
+    
+    def split(segment_start, segment_end, level):
+        if segment_start >= segment_end:
+            return
+        resolution, size = levels[level]
+        first = -(-segment_start // size) * size
+        last = segment_end // size * size
+        if first < last or level == len(levels) - 1:
+            split(segment_start, first, level + 1)
+            segments.append((resolution, first, last))
+            split(last, segment_end, level + 1)
+        else:
+            split(segment_start, segment_end, level + 1)
+    
+    split(start, end, 0)
+    return segments
+
+def query_summary(conn, start, end, host=None):
+    """Fasst einen Zeitraum aus den Rollup-Tabellen zusammen (inkl. p50/p95/p99)"""
+    total = failed = response_count = jitter_count = 0
+    response_sum = jitter_sum = 0.0
+    minimum = maximum = None
+    sketch = LatencySketch()
+    
+    for resolution, bucket_from, bucket_to in plan_segments(start, end):
+        sql = f'''
+            SELECT SUM(total_pings), SUM(failed_pings), SUM(response_time_sum),
+                   SUM(response_time_count), MIN(min_response_time), MAX(max_response_time),
+                   SUM(jitter_sum), SUM(jitter_count)
+            FROM {table_name(resolution)}
+            WHERE bucket_start >= ? AND bucket_start < ?
+        '''
+        params = [bucket_from, bucket_to]
+        if host:
+            sql += ' AND host = ?'
+            params.append(host)
+        row = conn.execute(sql, params).fetchone()
+        if not row[0]:
+            continue
+        total += row[0]
+        failed += row[1]
+        response_sum += row[2]
+        response_count += row[3]
+        if row[4] is not None:
+            minimum = row[4] if minimum is None else min(minimum, row[4])
+        if row[5] is not None:
+            maximum = row[5] if maximum is None else max(maximum, row[5])
+        jitter_sum += row[6]
+        jitter_count += row[7]
+        
+        # Quantile aus den gespeicherten Bucket-Sketches zusammensetzen
+        sketch_sql = f'''
+            SELECT latency_sketch FROM {table_name(resolution)}
+            WHERE bucket_start >= ? AND bucket_start < ? AND latency_sketch IS NOT NULL
+        '''
+        if host:
+            sketch_sql += ' AND host = ?'
+        for (blob,) in conn.execute(sketch_sql, params):
+            sketch.merge(LatencySketch.from_bytes(blob))
+    
+    percentiles = sketch.percentiles()
+    loss_percent = (failed / total * 100) if total else 0
+    avg_jitter = jitter_sum / jitter_count if jitter_count else None
+    r = r_factor(response_sum / response_count, avg_jitter, loss_percent) if response_count else (0.0 if total else None)
+    return {
+        'total_pings': total,
+        'failed_pings': failed,
+        'packet_loss_percent': loss_percent,
+        'avg_response_time': round(response_sum / response_count, 2) if response_count else 0,
+        'min_response_time': minimum,
+        'max_response_time': maximum,
+        'p50_response_time': percentiles['p50'],
+        'p95_response_time': percentiles['p95'],
+        'p99_response_time': percentiles['p99'],
+        'avg_jitter_ms': round(avg_jitter, 3) if avg_jitter is not None else None,
+        'r_factor': round(r, 1) if r is not None else None,
+        'mos': round(mos(r), 2) if r is not None else None
+    }
+
+def choose_resolution(seconds, max_points=1000):
+    """Wählt die feinste Rollup-Auflösung mit höchstens max_points Buckets"""
+    for resolution, size in sorted(RESOLUTIONS.items(), key=lambda item: item[1]):
+        if seconds / size <= max_points:
+            return resolution
+    return '1d'
+
+def query_series(conn, start, end, resolution, host=None, limit=None):
+    """Liefert die Buckets einer Auflösung im Zeitraum (neueste zuerst)"""
+    size = RESOLUTIONS[resolution]
+    sql = f'''
+        SELECT host, bucket_start, total_pings, failed_pings, response_time_sum,
+               response_time_count, min_response_time, max_response_time, jitter_sum, jitter_count
+        FROM {table_name(resolution)}
+        WHERE bucket_start >= ? AND bucket_start < ?
+    '''
+    params = [int(start // size) * size, end]
+    if host:
+        sql += ' AND host = ?'
+        params.append(host)
+    sql += ' ORDER BY bucket_start DESC'
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    
+    series = []
+    for row in conn.execute(sql, params):
+        total, failed, response_sum, response_count = row[2], row[3], row[4], row[5]
+        loss_percent = (failed / total * 100) if total else 0
+        jitter = row[8] / row[9] if row[9] else None
+        r = r_factor(response_sum / response_count, jitter, loss_percent) if response_count else 0.0
+        series.append({
+            'timestamp': format_bucket(row[1]),
+            'host': row[0],
+            'success': failed == 0,
+            'response_time': round(response_sum / response_count, 3) if response_count else None,
+            'packet_loss_percent': loss_percent,
+            'total_pings': total,
+            'failed_pings': failed,
+            'min_response_time': row[6],
+            'max_response_time': row[7],
+            'jitter_ms': round(jitter, 3) if jitter is not None else None,
+            'mos': round(mos(r), 2)
+        })
+    return series
+
+def iter_buckets(conn, start, end, resolution, host=None):
+    """Liefert Buckets aufsteigend als (Beginn, Pings, Fehler, Summe, Anzahl, Min, Max)
+    
+    Ohne Host werden die Buckets aller Hosts zusammengefasst.
+    """
+    size = RESOLUTIONS[resolution]
+    sql = f'''
+        SELECT bucket_start, SUM(total_pings), SUM(failed_pings), SUM(response_time_sum),
+               SUM(response_time_count), MIN(min_response_time), MAX(max_response_time)
+        FROM {table_name(resolution)}
+        WHERE bucket_start >= ? AND bucket_start < ?
+    '''
+    params = [int(start // size) * size, end]
+    if host:
+        sql += ' AND host = ?'
+        params.append(host)
+    sql += ' GROUP BY bucket_start ORDER BY bucket_start'
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            break
+        yield from rows
+
+def iter_series(conn, start, end, resolution, host=None, batch_size=1000):
+    """Liefert Buckets pro Host aufsteigend als (Host, Beginn, Pings, Fehler, Summe, Anzahl, Min, Max)"""
+    size = RESOLUTIONS[resolution]
+    sql = f'''
+        SELECT host, bucket_start, total_pings, failed_pings, response_time_sum,
+               response_time_count, min_response_time, max_response_time
+        FROM {table_name(resolution)}
+        WHERE bucket_start >= ? AND bucket_start < ?
+    '''
+    params = [int(start // size) * size, end]
+    if host:
+        sql += ' AND host = ?'
+        params.append(host)
+    sql += ' ORDER BY bucket_start, host'
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+def format_bucket(bucket_start):
+    """Formatiert einen Bucket-Beginn wie die Zeitstempel in ping_results (UTC)"""
+    return datetime.fromtimestamp(bucket_start, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+if __name__ == "__main__":
+    # Aufruf: python3 rollups.py rebuild [datenbank] [stunden]
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print("Verwendung: python3 rollups.py rebuild [datenbank] [stunden]")
+        sys.exit(1)
+    
+    from config import Config
+    db_path = sys.argv[2] if len(sys.argv) > 2 else Config.DATABASE_PATH
+    since = time.time() - float(sys.argv[3]) * 3600 if len(sys.argv) > 3 else None
+    
+    started = time.time()
+    conn = sqlite3.connect(db_path)
+    rebuild_rollups(conn, since)
+    conn.close()
+    print(f"✅ Rollups neu berechnet in {time.time() - started:.1f}s")
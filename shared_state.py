@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Geteilter Live-Zustand für Ping Monitor
+Der Monitor-Prozess schreibt Zähler, Kennzahlen und die letzten Pings jedes
+Ziels in eine per mmap eingeblendete Datei. Beliebig viele Web-Worker lesen
+sie ohne IPC; konsistente Kopien sichert ein Seqlock pro Abschnitt (ungerade
+Sequenznummer = Schreibvorgang läuft)
+"""
+
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from config import Config
+from call_quality import assess
+
+MAGIC = b'PMSS'
+VERSION = 2
+
+# Kopf: Magic, Version, Ziele, Fenster, Kapazität der letzten Pings, PID, Startzeit
+_HEADER = struct.Struct('<4sHHHIId')
+_WINDOW_NAME = struct.Struct('<8s')
+_SEQ = struct.Struct('<Q')
+
+# Kennzahlen des Datenbank-Writers (Name, Format)
+DATABASE_FIELDS = (
+    ('generation', 'Q'), ('queue_depth', 'Q'), ('rows_written', 'Q'), ('flush_count', 'Q'),
+    ('dropped', 'Q'), ('errors', 'Q'), ('last_flush_ms', 'd'), ('avg_flush_ms', 'd'),
+    ('max_flush_ms', 'd'), ('partitions', 'Q'), ('partitions_dropped', 'Q'), ('last_flush_time', 'd'),
+)
+_DATABASE = struct.Struct('<' + ''.join(fmt for _, fmt in DATABASE_FIELDS))
+
+# Zustand eines Ziels: Schlüssel, primärer/sekundärer/aktueller Host, Intervall, Zähler,
+# Zeitplan, Perzentile, Jitter und Zeitpunkt der letzten Aktualisierung
+_TARGET = struct.Struct('<64s64s64sBdQQQIQQIdddddd')
+# Kennzahlen eines gleitenden Fensters (auch für die Zusammenfassung der letzten Pings)
+_WINDOW = struct.Struct('<QQdddd')
+# Ringpuffer: nächster Index, Füllstand; Einträge: Zeit, Antwortzeit, Loss, Erfolg, Host-Index
+_RING = struct.Struct('<II')
+_SAMPLE = struct.Struct('<dddBB')
+
+_NONE = float('nan')
+_MAX_RETRIES = 1000
+
+def _align(size):
+    # Sequenznummern auf 8 Byte ausrichten, damit sie in einem Zugriff gelesen werden
+    return (size + 7) & ~7
+
+def _text(value):
+    return (value or '').encode('utf-8')[:64]
+
+def _decode(raw):
+    return raw.rstrip(b'\0').decode('utf-8', 'replace') or None
+
+def _number(value):
+    return _NONE if value is None else float(value)
+
+def _optional(value):
+    return None if math.isnan(value) else value
+
+class _Layout:
+    """Offsets der Abschnitte im Segment"""
+    
+    def __init__(self, target_count, window_names, capacity):
+        self.target_count = target_count
+        self.window_names = list(window_names)
+        self.capacity = capacity
+        self.database_offset = _align(_HEADER.size + _WINDOW_NAME.size * len(self.window_names))
+        self.targets_offset = _align(self.database_offset + _SEQ.size + _DATABASE.size)
+        # Eine Zusammenfassung pro Fenster plus eine für die letzten Pings
+        self.windows_size = _WINDOW.size * (len(self.window_names) + 1)
+        self.slot_size = _align(_SEQ.size + _TARGET.size + self.windows_size + _RING.size + _SAMPLE.size * capacity)
+        self.size = self.targets_offset + self.slot_size * target_count
+    
+    def slot(self, index):
+        return self.targets_offset + index * self.slot_size
+
+class SharedStateWriter:
+    """Schreibt den Live-Zustand (nur ein schreibender Thread pro Segment)
+    
+    Zähler und der jeweils neue Ping werden bei jedem Aufruf geschrieben,
+    Fenster, Perzentile und Datenbank-Kennzahlen höchstens alle
+    refresh_interval Sekunden.
+    """
+    
+    def __init__(self, path, targets, window_names, capacity=100, refresh_interval=0.5, database=None):
+        self.path = path
+        self.targets = list(targets)
+        self.index = {target.key: number for number, target in enumerate(self.targets)}
+        self.layout = _Layout(len(self.targets), window_names, capacity)
+        self.refresh_interval = refresh_interval
+        # Liefert die Kennzahlen des Datenbank-Writers (z.B. DatabaseWriter.get_stats)
+        self.database = database
+        self.next_refresh = [0.0] * len(self.targets)
+        self.next_database_refresh = 0.0
+        self.percentiles = [(_NONE, _NONE, _NONE)] * len(self.targets)
+        self.rings = [[0, 0] for _ in self.targets]
+        
+        # Neue Datei anlegen und atomar ersetzen, damit Leser nie ein halbes Segment sehen
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.truncate(self.layout.size)
+        self.file = open(temporary, 'r+b')
+        self.mm = mmap.mmap(self.file.fileno(), self.layout.size)
+        _HEADER.pack_into(self.mm, 0, MAGIC, VERSION, len(self.targets), len(self.layout.window_names),
+                          capacity, os.getpid(), time.time())
+        for number, name in enumerate(self.layout.window_names):
+            _WINDOW_NAME.pack_into(self.mm, _HEADER.size + number * _WINDOW_NAME.size, name.encode('utf-8')[:8])
+        os.replace(temporary, path)
+    
+    @staticmethod
+    def _begin(mm, offset):
+        sequence = _SEQ.unpack_from(mm, offset)[0] + 1
+        _SEQ.pack_into(mm, offset, sequence)
+        return sequence
+    
+    @staticmethod
+    def _end(mm, offset, sequence):
+        _SEQ.pack_into(mm, offset, sequence + 1)
+    
+    def publish(self, target, sample=None, force=False):
+        """Aktualisiert ein Ziel und hängt optional einen Ping (Zeit, Host, Erfolg, RTT, Loss) an"""
+        # Lokale Referenz, damit close() aus einem anderen Thread nicht mitten im Schreiben stört
+        mm = self.mm
+        number = self.index.get(target.key)
+        if mm is None or number is None:
+            return
+        now = time.monotonic()
+        refresh = force or now >= self.next_refresh[number]
+        summaries = None
+        if refresh:
+            self.next_refresh[number] = now + self.refresh_interval
+            windows = target.rolling.snapshot()
+            summaries = [windows.get(name) for name in self.layout.window_names] + [target.recent_summary()]
+            percentiles = target.latency_percentiles()
+            self.percentiles[number] = tuple(_number(percentiles[name]) for name in ('p50', 'p95', 'p99'))
+        
+        offset = self.layout.slot(number)
+        sequence = self._begin(mm, offset)
+        position = offset + _SEQ.size
+        _TARGET.pack_into(
+            mm, position,
+            _text(target.key), _text(target.primary_host), _text(target.secondary_host),
+            0 if target.current_host == target.primary_host else 1,
+            target.interval, target.total_pings, target.failed_pings, target.consecutive_failures,
+            target.burst, target.ticks, target.missed_ticks, target.in_flight,
+            _number(target.tick_loss_percent), *self.percentiles[number], _number(target.jitter.value), time.time()
+        )
+        position += _TARGET.size
+        if summaries is not None:
+            for index, summary in enumerate(summaries):
+                if summary is not None:
+                    _WINDOW.pack_into(
+                        mm, position + index * _WINDOW.size,
+                        summary['total_pings'], summary['failed_pings'],
+                        summary['packet_loss_percent'], summary['avg_response_time'],
+                        _number(summary['min_response_time']), _number(summary['max_response_time'])
+                    )
+        position += self.layout.windows_size
+        
+        if sample is not None:
+            ring = self.rings[number]
+            timestamp, host, success, response_time, packet_loss = sample
+            _SAMPLE.pack_into(
+                mm, position + _RING.size + ring[0] * _SAMPLE.size,
+                timestamp, _number(response_time if success else None), _number(packet_loss),
+                1 if success else 0, 0 if host == target.primary_host else 1
+            )
+            ring[0] = (ring[0] + 1) % self.layout.capacity
+            ring[1] = min(ring[1] + 1, self.layout.capacity)
+            _RING.pack_into(mm, position, ring[0], ring[1])
+        self._end(mm, offset, sequence)
+        
+        if self.database is not None and (force or now >= self.next_database_refresh):
+            self.next_database_refresh = now + self.refresh_interval
+            self.publish_database(self.database())
+    
+    def publish_database(self, stats):
+        """Aktualisiert die Kennzahlen des Datenbank-Writers"""
+        mm = self.mm
+        if mm is None:
+            return
+        offset = self.layout.database_offset
+        sequence = self._begin(mm, offset)
+        _DATABASE.pack_into(mm, offset + _SEQ.size, *(
+            stats.get(name) or 0 for name, _ in DATABASE_FIELDS
+        ))
+        self._end(mm, offset, sequence)
+    
+    def close(self, remove=True):
+        """Beendet das Veröffentlichen und entfernt die Datei (Leser melden dann 'Monitor nicht aktiv')"""
+        if self.mm is None:
+            return
+        # Das Mapping selbst wird freigegeben, sobald keine Referenz mehr besteht
+        self.mm = None
+        self.file.close()
+        if remove:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+class SharedStateReader:
+    """Liest den Live-Zustand aus einem anderen Prozess (nur lesend)"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.mm = None
+        self.inode = None
+        self.layout = None
+        self.pid = None
+        self.started = None
+        # Eine Instanz für alle Anfrage-Threads: Öffnen, Schließen und Lesen nie gleichzeitig
+        self.lock = threading.RLock()
+    
+    def _open(self):
+        """Öffnet das Segment (neu), wenn der Monitor es ersetzt hat; False wenn keins existiert"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._close()
+            return False
+        if self.mm is not None and stat.st_ino == self.inode:
+            return True
+        
+        self._close()
+        try:
+            with open(self.path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Zwischen stat und open entfernt oder noch leer
+            return False
+        magic, version, target_count, window_count, capacity, pid, started = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            return False
+        names = [
+            _decode(_WINDOW_NAME.unpack_from(mm, _HEADER.size + number * _WINDOW_NAME.size)[0])
+            for number in range(window_count)
+        ]
+        self.layout = _Layout(target_count, names, capacity)
+        if len(mm) < self.layout.size:
+            mm.close()
+            return False
+        self.mm = mm
+        self.inode = stat.st_ino
+        self.pid = pid
+        self.started = started
+        return True
+    
+    def _close(self):
+        if self.mm is not None:
+            self.mm.close()
+        self.mm = None
+        self.inode = None
+    
+    def available(self):
+        """Prüft, ob ein Monitor-Prozess den Zustand veröffentlicht"""
+        with self.lock:
+            return self._open()
+    
+    def _read(self, offset, size):
+        """Konsistente Kopie eines Abschnitts (Seqlock: wiederholen, solange geschrieben wird)"""
+        for attempt in range(_MAX_RETRIES):
+            before = _SEQ.unpack_from(self.mm, offset)[0]
+            if before % 2 == 0:
+                data = self.mm[offset + _SEQ.size:offset + _SEQ.size + size]
+                if _SEQ.unpack_from(self.mm, offset)[0] == before:
+                    return data
+            if attempt > 10:
+                time.sleep(0)
+        raise RuntimeError("Geteilter Zustand wird dauerhaft beschrieben")
+    
+    def database(self):
+        """Kennzahlen des Datenbank-Writers"""
+        with self.lock:
+            if not self._open():
+                return None
+            data = self._read(self.layout.database_offset, _DATABASE.size)
+        stats = dict(zip((name for name, _ in DATABASE_FIELDS), _DATABASE.unpack(data)))
+        stats['last_flush_time'] = stats['last_flush_time'] or None
+        return stats
+    
+    def generation(self):
+        """Schreib-Generation des Monitors (None ohne Monitor)"""
+        with self.lock:
+            stats = self.database()
+            if stats is None:
+                return None
+            return (self.pid, self.started, stats['generation']), stats['last_flush_time'] or self.started
+    
+    def keys(self):
+        """Schlüssel aller veröffentlichten Ziele"""
+        with self.lock:
+            if not self._open():
+                return []
+            return [
+                _decode(_TARGET.unpack_from(self.mm, self.layout.slot(number) + _SEQ.size)[0])
+                for number in range(self.layout.target_count)
+            ]
+    
+    def target(self, key=None, recent=100):
+        """Statistiken eines Ziels im Format von PingMonitor.get_current_stats
+        
+        Ohne key das Standardziel; wie PingMonitor.get_target auch über den
+        aktuell gepingten Host auffindbar.
+        """
+        with self.lock:
+            keys = self.keys()
+            if not keys:
+                return None
+            if key is None or key in keys:
+                numbers = [0 if key is None else keys.index(key)]
+            else:
+                numbers = range(self.layout.target_count)
+            for number in numbers:
+                stats = self._decode_target(self._read(self.layout.slot(number), self.layout.slot_size - _SEQ.size), recent)
+                if key in (None, stats['host'], stats['current_host']):
+                    break
+            else:
+                return None
+            stats['database'] = self.database()
+        stats['uptime'] = datetime.now().isoformat()
+        return stats
+    
+    def all_targets(self, recent=100):
+        """Statistiken aller Ziele"""
+        with self.lock:
+            return {key: self.target(key, recent) for key in self.keys()}
+    
+    def _decode_target(self, data, recent):
+        layout = self.layout
+        fields = _TARGET.unpack_from(data, 0)
+        (key, primary, secondary, host_index, interval, total, failed, consecutive,
+         burst, ticks, missed, in_flight, tick_loss, p50, p95, p99, jitter, updated) = fields
+        hosts = (_decode(primary), _decode(secondary))
+        position = _TARGET.size
+        
+        summaries = []
+        for _ in range(len(layout.window_names) + 1):
+            count, window_failed, loss, average, minimum, maximum = _WINDOW.unpack_from(data, position)
+            summaries.append({
+                'total_pings': count,
+                'failed_pings': window_failed,
+                'packet_loss_percent': loss,
+                'avg_response_time': average,
+                'min_response_time': _optional(minimum),
+                'max_response_time': _optional(maximum)
+            })
+            position += _WINDOW.size
+        windows = dict(zip(layout.window_names, summaries))
+        position = _TARGET.size + layout.windows_size
+        
+        head, size = _RING.unpack_from(data, position)
+        position += _RING.size
+        count = min(recent, size)
+        pings = []
+        for step in range(count, 0, -1):
+            slot = (head - step) % layout.capacity
+            timestamp, response_time, packet_loss, success, sample_host = _SAMPLE.unpack_from(
+                data, position + slot * _SAMPLE.size)
+            pings.append({
+                'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+                'host': hosts[sample_host],
+                'success': bool(success),
+                'response_time': _optional(response_time),
+                'packet_loss': _optional(packet_loss)
+            })
+        
+        return {
+            'host': _decode(key),
+            'total_pings': total,
+            'failed_pings': failed,
+            'packet_loss_percent': (failed / total * 100) if total else 0.0,
+            'current_host': hosts[host_index],
+            'interval': interval,
+            'avg_response_time': round(windows[Config.STATS_WINDOW]['avg_response_time'], 2)
+            if Config.STATS_WINDOW in windows else 0,
+            'windows': windows,
+            'latency_percentiles': {'p50': _optional(p50), 'p95': _optional(p95), 'p99': _optional(p99)},
+            'quality': dict(assess(_optional(jitter), windows.get(Config.QUALITY_WINDOW)), window=Config.QUALITY_WINDOW),
+            'scheduler': {
+                'burst': burst,
+                'ticks': ticks,
+                'missed_ticks': missed,
+                'in_flight': in_flight,
+                'tick_loss_percent': _optional(tick_loss)
+            },
+            'consecutive_failures': consecutive,
+            'recent_pings': pings,
+            'recent_summary': summaries[-1],
+            'updated_at': datetime.fromtimestamp(updated).isoformat() if updated else None,
+            # Leser haben keinen Live-Stream, die Oberfläche fragt stattdessen regelmäßig ab
+            'live_stream': False
+        }
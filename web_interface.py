@@ -4,14 +4,29 @@ Web Interface für Ping Monitor
 Flask-basierte Web-Oberfläche auf Port 4000
 """
 
-from flask import Flask, render_template, jsonify, request
-import sqlite3
+from flask import Flask, render_template, jsonify, request, Response, g
 import json
-from datetime import datetime, timedelta
 import threading
+import time
 import os
+import functools
+import hmac
+import itertools
+import logging
+import zlib
 from ping_monitor import PingMonitor
 from config import Config
+import archive
+from collector import Collector, IngestError
+import downsample
+import export
+import partitions
+import rollups
+from read_pool import ReadPool
+from response_cache import ResponseCache
+from shared_state import SharedStateReader
+from log_setup import setup_logging
+import metrics
 
 app = Flask(__name__)
 
@@ -19,11 +34,139 @@ app = Flask(__name__)
 monitor = None
 monitor_thread = None
 
+# Zentrale Sammelstelle der Agents (nur WEB_ROLE=collector)
+collector = None
+
+# Routen, die auch im Collector-Modus ohne ?node= auskommen
+NODELESS_ROUTES = ('/api/ingest', '/api/nodes', '/api/control/')
+
+# Antworten der Lese-API bis zum nächsten Schreibvorgang
+response_cache = ResponseCache(Config.RESPONSE_CACHE_ENTRIES, Config.RESPONSE_CACHE_MAX_BYTES)
+
+# Langlebige, nur lesende Datenbankverbindungen für die API
+read_pool = ReadPool(Config.READ_POOL_SIZE, Config.READ_CACHE_SIZE_KB, Config.READ_MMAP_SIZE_MB,
+                     Config.READ_CACHED_STATEMENTS)
+
+# Live-Zustand eines Monitors in einem anderen Prozess (nur lesend)
+shared_state = SharedStateReader(Config.SHARED_STATE_PATH)
+
+def database_path():
+    """Datenbank der Anfrage: lokal oder im Collector-Modus die des Knotens"""
+    node = g.get('node')
+    return node.db_path if node is not None else Config.DATABASE_PATH
+
 def get_db_connection():
-    """Erstellt eine Datenbankverbindung"""
-    conn = sqlite3.connect(Config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Nur lesende Verbindung aus dem Pool für die Dauer der Anfrage (wird am Ende zurückgegeben)"""
+    checkout = g.get('db')
+    if checkout is None:
+        path = database_path()
+        checkout = g.db = (path, read_pool.acquire(path))
+    return checkout[1]
+
+@app.teardown_request
+def release_db_connection(exc):
+    """Gibt die Verbindung der Anfrage an den Pool zurück"""
+    checkout = g.pop('db', None)
+    if checkout is not None:
+        read_pool.release(*checkout)
+
+def current_generation():
+    """Schreib-Generation der Datenbank und Zeitpunkt der letzten Änderung"""
+    writer = g.node.writer if g.get('node') is not None else monitor.writer if monitor is not None else None
+    if writer is not None:
+        return (id(writer), writer.generation), writer.last_flush_time or time.time()
+    
+    # Monitor in einem anderen Prozess: Generation aus dem geteilten Zustand
+    if Config.ENABLE_SHARED_STATE:
+        generation = shared_state.generation()
+        if generation is not None:
+            return generation
+    
+    # Ohne Monitor im Prozess: Größe und Änderungszeit der Datenbankdateien
+    stamps = []
+    for suffix in ('', '-wal'):
+        try:
+            stat = os.stat(Config.DATABASE_PATH + suffix)
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stamps.append(None)
+    modified = max((stamp[0] for stamp in stamps if stamp), default=time.time_ns())
+    return tuple(stamps), modified / 1e9
+
+def cached_response(view):
+    """Cacht JSON-Antworten pro Anfrage bis zur nächsten Schreib-Generation (mit ETag/304)"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        generation, last_modified = current_generation()
+        key = ResponseCache.make_key(request.path, request.args)
+        entry = response_cache.get(key, generation)
+        if entry is None:
+            response = app.make_response(view(*args, **kwargs))
+            # Fehler werden nicht zwischengespeichert
+            if response.status_code != 200 or response.mimetype != 'application/json':
+                return response
+            entry = response_cache.put(key, generation, response.get_data(), last_modified)
+        
+        response = Response(entry.body, mimetype='application/json')
+        response.set_etag(entry.etag)
+        response.last_modified = entry.last_modified
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return wrapper
+
+@app.before_request
+def start_request_timer():
+    """Merkt sich den Beginn der Anfrage für die Laufzeit-Metrik"""
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def resolve_node():
+    """Collector-Modus: ordnet /api/*-Anfragen über ?node= der Datenbank eines Knotens zu"""
+    if collector is None or not request.path.startswith('/api/') or request.path.startswith(NODELESS_ROUTES):
+        return None
+    name = request.args.get('node')
+    if not name:
+        return jsonify({'error': 'Parameter node fehlt (Knoten siehe /api/nodes)'}), 400
+    g.node = collector.node(name)
+    if g.node is None:
+        return jsonify({'error': f'Unbekannter Knoten: {name}'}), 404
+    return None
+
+@app.after_request
+def observe_request(response):
+    """Erfasst die Bearbeitungsdauer von API-Anfragen pro Route"""
+    started = g.get('request_started')
+    if started is not None and request.url_rule is not None and request.path.startswith('/api/'):
+        metrics.HTTP_DURATION.observe(
+            time.perf_counter() - started,
+            (request.url_rule.rule, request.method, str(response.status_code))
+        )
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Interne Metriken im Prometheus-Textformat"""
+    if not Config.ENABLE_METRICS:
+        return jsonify({'error': 'Metriken deaktiviert'}), 404
+    
+    # Zustandswerte erst beim Abruf übernehmen
+    if monitor is not None:
+        metrics.DB_QUEUE_DEPTH.set(monitor.writer.queue.qsize())
+        for key, target in list(monitor.targets.items()):
+            metrics.TARGET_PINGS.set(target.total_pings, (key,))
+            metrics.TARGET_FAILED.set(target.failed_pings, (key,))
+            metrics.TARGET_LOSS.set(target.calculate_packet_loss(), (key,))
+    elif Config.ENABLE_SHARED_STATE and shared_state.available():
+        # Der Monitor kann das Segment inzwischen entfernt haben
+        database = shared_state.database()
+        if database is not None:
+            metrics.DB_QUEUE_DEPTH.set(database['queue_depth'])
+        for key, stats in shared_state.all_targets(recent=0).items():
+            metrics.TARGET_PINGS.set(stats['total_pings'], (key,))
+            metrics.TARGET_FAILED.set(stats['failed_pings'], (key,))
+            metrics.TARGET_LOSS.set(stats['packet_loss_percent'], (key,))
+    
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -32,16 +175,67 @@ def index():
 
 @app.route('/api/stats')
 def api_stats():
-    """API-Endpunkt für aktuelle Statistiken"""
-    if monitor:
-        return jsonify(monitor.get_current_stats())
+    """API-Endpunkt für aktuelle Statistiken (?host=<ziel> oder ?host=all)"""
+    host = request.args.get('host')
+    node = g.get('node')
+    if node is not None:
+        # Collector: zuletzt vom Agent gemeldete Statistiken (kein Live-Stream)
+        if host == 'all':
+            stats = {key: dict(value, node=node.name, live_stream=False) for key, value in node.stats.items()}
+        else:
+            stats = node.stats.get(host or node.default_host)
+            stats = dict(stats, node=node.name, live_stream=False) if stats is not None else None
+    elif monitor:
+        stats = monitor.get_all_stats() if host == 'all' else monitor.get_current_stats(host)
+    elif Config.ENABLE_SHARED_STATE and shared_state.available():
+        # Monitor in einem anderen Prozess (z.B. WEB_ROLE=reader): aus dem geteilten Zustand lesen
+        stats = shared_state.all_targets() if host == 'all' else shared_state.target(host)
     else:
         return jsonify({'error': 'Monitor nicht aktiv'}), 500
+    
+    if host == 'all':
+        return jsonify({'hosts': stats})
+    if stats is None:
+        return jsonify({'error': f'Unbekannter Host: {host}'}), 404
+    return jsonify(stats)
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent-Events-Stream mit Ping-Ergebnissen und Loss-Events (?host=<ziel>)"""
+    owner = monitor
+    if not owner or not owner.running:
+        return jsonify({'error': 'Monitor nicht aktiv'}), 500
+    
+    # Fortsetzung nach Verbindungsabbruch (Header vom Browser oder Query-Parameter)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    events = owner.events
+    if not events.try_subscribe():
+        return jsonify({'error': 'Zu viele Stream-Verbindungen'}), 503
+    
+    stream = events.stream(
+        last_event_id,
+        host=request.args.get('host'),
+        heartbeat=Config.SSE_HEARTBEAT,
+        running=lambda: owner.running and monitor is owner
+    )
+    response = Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(events.unsubscribe)
+    return response
 
 @app.route('/api/packet-loss-events')
+@cached_response
 def api_packet_loss_events():
-    """API-Endpunkt für Packet Loss Events"""
+    """API-Endpunkt für Packet Loss Events (?hours=24&type=outage|rate)"""
     hours = request.args.get('hours', 24, type=int)
+    event_type = request.args.get('type')
     
     try:
         conn = get_db_connection()
@@ -50,11 +244,12 @@ def api_packet_loss_events():
         # Packet Loss Events der letzten X Stunden abrufen
         cursor.execute('''
             SELECT id, start_time, end_time, host, consecutive_failures, 
-                   duration_seconds, is_active
+                   duration_seconds, is_active, event_type, severity, loss_percent, scope
             FROM packet_loss_events 
-            WHERE start_time >= datetime('now', '-{} hours')
+            WHERE start_time >= datetime('now', ?)
+              AND (? IS NULL OR event_type = ?)
             ORDER BY start_time DESC
-        '''.format(hours))
+        ''', (f'-{hours} hours', event_type, event_type))
         
         events = []
         for row in cursor.fetchall():
@@ -65,40 +260,83 @@ def api_packet_loss_events():
                 'host': row['host'],
                 'consecutive_failures': row['consecutive_failures'],
                 'duration_seconds': row['duration_seconds'],
-                'is_active': bool(row['is_active'])
+                'is_active': bool(row['is_active']),
+                'type': row['event_type'],
+                'severity': row['severity'],
+                'loss_percent': row['loss_percent'],
+                'scope': row['scope']
             }
             events.append(event)
         
-        conn.close()
         return jsonify({
             'events': events,
             'total_events': len(events)
         })
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/history')
+@cached_response
 def api_history():
-    """API-Endpunkt für historische Daten"""
-    hours = request.args.get('hours', 24, type=int)
+    """API-Endpunkt für historische Daten (?hours=24&resolution=auto|raw|1m|1h|1d&host=&points=N&method=lttb|minmax)"""
+    hours = request.args.get('hours', 24, type=float)
+    resolution = request.args.get('resolution', 'auto')
+    host = request.args.get('host')
+    points = request.args.get('points', type=int)
+    method = request.args.get('method', 'lttb')
     
     try:
+        end = time.time()
+        start = end - hours * 3600
+        
+        # Gleichmäßig verteilte Reihe mit höchstens N Punkten über den ganzen Zeitraum
+        if points is not None:
+            if points < 3 or points > Config.HISTORY_MAX_POINTS:
+                return jsonify({'error': f'points muss zwischen 3 und {Config.HISTORY_MAX_POINTS} liegen'}), 400
+            if method not in downsample.METHODS:
+                return jsonify({'error': f'Unbekannte Methode: {method}'}), 400
+            if resolution == 'auto':
+                resolution = downsample.choose_source(end - start, points)
+            if resolution != 'raw' and resolution not in rollups.RESOLUTIONS:
+                return jsonify({'error': f'Unbekannte Auflösung: {resolution}'}), 400
+            
+            conn = get_db_connection()
+            if resolution == 'raw':
+                rows = partitions.iter_rows(
+                    conn, f'{partitions.EPOCH_COLUMN}, success, response_time',
+                    start=start, host=host
+                )
+                if Config.ENABLE_ARCHIVE and g.get('node') is None:
+                    # Bereits gelöschte Tage aus dem Langzeitarchiv voranstellen
+                    archived = archive.iter_before_database(conn, Config.ARCHIVE_DIR, start, end, host)
+                    rows = itertools.chain((row[:1] + row[2:4] for row in archived), rows)
+                results = downsample.downsample_raw(rows, start, end, points, method, host)
+            else:
+                rows = rollups.iter_buckets(conn, start, end, resolution, host)
+                results = downsample.downsample_buckets(rows, start, end, points, method, host)
+            return jsonify(results)
+        
+        # Längere Zeiträume aus der passenden Rollup-Tabelle lesen
+        if resolution == 'auto':
+            resolution = 'raw' if hours * 3600 <= Config.HISTORY_RAW_SECONDS else rollups.choose_resolution(end - start)
+        if resolution != 'raw':
+            if resolution not in rollups.RESOLUTIONS:
+                return jsonify({'error': f'Unbekannte Auflösung: {resolution}'}), 400
+            conn = get_db_connection()
+            results = rollups.query_series(conn, start, end, resolution, host, limit=1000)
+            return jsonify(results)
+        
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        # Daten der letzten X Stunden abrufen
-        since = datetime.now() - timedelta(hours=hours)
-        cursor.execute('''
-            SELECT timestamp, host, success, response_time, packet_loss_percent
-            FROM ping_results
-            WHERE timestamp > ?
-            ORDER BY timestamp DESC
-            LIMIT 1000
-        ''', (since,))
+        # Rohdaten der letzten X Stunden über die Tagespartitionen abrufen
+        rows = partitions.iter_rows(
+            conn, 'timestamp, host, success, response_time, packet_loss_percent',
+            start=start, host=host, descending=True, limit=1000
+        )
         
         results = []
-        for row in cursor.fetchall():
+        for row in rows:
             results.append({
                 'timestamp': row['timestamp'],
                 'host': row['host'],
@@ -107,67 +345,118 @@ def api_history():
                 'packet_loss_percent': row['packet_loss_percent']
             })
         
-        conn.close()
         return jsonify(results)
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/summary')
+@cached_response
 def api_summary():
-    """API-Endpunkt für Zusammenfassung"""
+    """API-Endpunkt für Zusammenfassung (?hours=24&host=)"""
+    hours = request.args.get('hours', 24, type=float)
+    host = request.args.get('host')
+    
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Statistiken der letzten 24 Stunden
-        since_24h = datetime.now() - timedelta(hours=24)
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_pings,
-                SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed_pings,
-                AVG(response_time) as avg_response_time,
-                MIN(response_time) as min_response_time,
-                MAX(response_time) as max_response_time
-            FROM ping_results
-            WHERE timestamp > ? AND success = 1
-        ''', (since_24h,))
-        
-        stats_24h = cursor.fetchone()
-        
-        # Aktuelle Packet Loss Rate
-        cursor.execute('''
-            SELECT packet_loss_percent
-            FROM ping_results
-            ORDER BY timestamp DESC
-            LIMIT 1
-        ''')
         
-        current_loss = cursor.fetchone()
+        # Statistiken der letzten X Stunden aus den Rollup-Tabellen
+        end = time.time()
+        stats_24h = rollups.query_summary(conn, end - hours * 3600, end, host)
         
-        conn.close()
+        # Aktuelle Packet Loss Rate aus der neuesten Partition
+        current_loss = partitions.latest_row(conn, 'packet_loss_percent', host)
         
         return jsonify({
-            'last_24h': {
-                'total_pings': stats_24h['total_pings'],
-                'failed_pings': stats_24h['failed_pings'],
-                'packet_loss_percent': (stats_24h['failed_pings'] / stats_24h['total_pings'] * 100) if stats_24h['total_pings'] > 0 else 0,
-                'avg_response_time': round(stats_24h['avg_response_time'] or 0, 2),
-                'min_response_time': stats_24h['min_response_time'],
-                'max_response_time': stats_24h['max_response_time']
-            },
+            'last_24h': stats_24h,
             'current_packet_loss': current_loss['packet_loss_percent'] if current_loss else 0
         })
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/export')
+def api_export():
+    """Streamt Roh- oder Rollup-Daten (?format=csv|ndjson&granularity=raw|1m|1h|1d&host=&start=&end=&hours=&gzip=1)"""
+    fmt = request.args.get('format', 'csv')
+    granularity = request.args.get('granularity', 'raw')
+    host = request.args.get('host')
+    compress = request.args.get('gzip', 'false').lower() in ('1', 'true', 'yes')
+    
+    if fmt not in export.FORMATS:
+        return jsonify({'error': f'Unbekanntes Format: {fmt}'}), 400
+    if granularity not in export.GRANULARITIES:
+        return jsonify({'error': f'Unbekannte Granularität: {granularity}'}), 400
+    
+    # Zeitraum: start/end (Unix-Zeit oder ISO, ohne Zeitzone UTC), sonst die letzten X Stunden
+    try:
+        end = export.parse_time(request.args['end']) if 'end' in request.args else time.time()
+        if 'start' in request.args:
+            start = export.parse_time(request.args['start'])
+        else:
+            start = end - request.args.get('hours', 24, type=float) * 3600
+    except ValueError as e:
+        return jsonify({'error': f'Ungültiger Zeitpunkt: {e}'}), 400
+    if start >= end:
+        return jsonify({'error': 'start muss vor end liegen'}), 400
+    
+    filename = f"ping_export_{granularity}_{time.strftime('%Y%m%d%H%M', time.gmtime(start))}.{fmt}"
+    chunks = export.stream_export(
+        database_path(), fmt, granularity, start, end, host, compress,
+        archive_dir=Config.ARCHIVE_DIR if Config.ENABLE_ARCHIVE and g.get('node') is None else None
+    )
+    response = Response(chunks, mimetype='application/gzip' if compress else export.MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}{".gz" if compress else ""}"'
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/api/ingest', methods=['POST'])
+def api_ingest():
+    """Nimmt gzip-komprimierte Batches der Agents entgegen (nur WEB_ROLE=collector)"""
+    if collector is None:
+        return jsonify({'error': 'Kein Collector (WEB_ROLE=collector)'}), 404
+    if Config.COLLECTOR_TOKEN and not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {Config.COLLECTOR_TOKEN}'):
+        return jsonify({'error': 'Ungültiges Token'}), 401
+    
+    max_bytes = Config.COLLECTOR_MAX_BATCH_MB * 1024 * 1024
+    if (request.content_length or 0) > max_bytes:
+        return jsonify({'error': 'Batch zu groß'}), 413
+    body = request.get_data()
+    try:
+        if request.headers.get('Content-Encoding') == 'gzip':
+            # Entpackte Größe ebenfalls begrenzen
+            body = zlib.decompressobj(31).decompress(body, max_bytes + 1)
+            if len(body) > max_bytes:
+                return jsonify({'error': 'Batch zu groß'}), 413
+        batch = json.loads(body)
+        accepted = collector.ingest(batch)
+    except IngestError as e:
+        response = jsonify({'error': str(e)})
+        if e.status == 503:
+            response.headers['Retry-After'] = '1'
+        return response, e.status
+    except (ValueError, zlib.error) as e:
+        return jsonify({'error': f'Ungültige Batch: {e}'}), 400
+    return jsonify({'accepted': accepted, 'seq': batch.get('seq')})
+
+@app.route('/api/nodes')
+def api_nodes():
+    """Knoten des Collectors mit Empfangskennzahlen"""
+    if collector is None:
+        return jsonify({'error': 'Kein Collector (WEB_ROLE=collector)'}), 404
+    return jsonify({'nodes': collector.get_stats()})
+
 @app.route('/api/control/<action>')
 def api_control(action):
     """API-Endpunkt für Monitor-Kontrolle"""
     global monitor, monitor_thread
     
     if action == 'start':
+        if Config.WEB_ROLE == 'reader':
+            return jsonify({'error': 'Nur lesender Worker (WEB_ROLE=reader), Monitor läuft als eigener Prozess'}), 409
+        if Config.WEB_ROLE == 'collector':
+            return jsonify({'error': 'Collector (WEB_ROLE=collector) pingt nicht selbst'}), 409
         if not monitor or not monitor.running:
             monitor = PingMonitor()
             monitor_thread = threading.Thread(target=monitor.start)
@@ -187,6 +476,8 @@ def api_control(action):
     elif action == 'status':
         if monitor and monitor.running:
             return jsonify({'status': 'running', 'stats': monitor.get_current_stats()})
+        elif not monitor and Config.ENABLE_SHARED_STATE and shared_state.available():
+            return jsonify({'status': 'running', 'stats': shared_state.target()})
         else:
             return jsonify({'status': 'stopped'})
     
@@ -205,8 +496,15 @@ if __name__ == '__main__':
     # Konfiguration ausgeben
     Config.print_config()
     
-    # Monitor automatisch starten
-    start_monitor_background()
+    # Monitor automatisch starten (nicht als nur lesender Worker)
+    if Config.WEB_ROLE == 'reader':
+        Config.validate()
+    elif Config.WEB_ROLE == 'collector':
+        Config.validate()
+        setup_logging(Config.LOG_FILE, Config.LOG_LEVEL, Config.LOG_MAX_SIZE, Config.LOG_BACKUP_COUNT, Config.LOG_QUEUE_SIZE)
+        collector = Collector.create(logging.getLogger('collector'))
+    else:
+        start_monitor_background()
     
     # Flask-App starten
     app.run(host=Config.WEB_HOST, port=Config.WEB_PORT, debug=Config.DEBUG_MODE)
\ No newline at end of file